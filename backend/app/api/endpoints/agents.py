@@ -1,32 +1,36 @@
-import asyncio
+import os
 import json
-import random
-from fastapi import APIRouter
+from datetime import datetime
+from fastapi import APIRouter, HTTPException
 from sse_starlette.sse import EventSourceResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 
 from app.services.ai_service import ai_service
+from app.services.agent_status_service import agent_status_service
+from app.services.event_bus import event_bus
+from app.services.agent_pipeline import agent_pipeline, PIPELINE_MAX_EMAILS
 
 router = APIRouter()
 
-# Mock Agent Registry
-AGENTS = [
-    {"agent_id": "coordinator", "name": "Coordinator Agent", "role": "Orchestrator", "status": "idle", "progress": 0, "logs": [], "current_task": "Waiting for workflow"},
-    {"agent_id": "email-reader", "name": "Email Reader", "role": "Ingestion", "status": "idle", "progress": 0, "logs": [], "current_task": "Idle"},
-    {"agent_id": "summarizer", "name": "Summarizer Agent", "role": "Analysis", "status": "idle", "progress": 0, "logs": [], "current_task": "Idle"},
-    {"agent_id": "reply-writer", "name": "Reply Writer", "role": "Generation", "status": "idle", "progress": 0, "logs": [], "current_task": "Idle"},
-]
+# Seconds of silence before an idle stream gets a heartbeat
+HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
 
 class ReplyRequest(BaseModel):
     email_subject: str
     email_body: str
     sender: str
     tone: str = "professional"
+    regenerate: bool = False
+
+class PipelineRequest(BaseModel):
+    max_emails: int = Field(100, ge=1, le=PIPELINE_MAX_EMAILS)
+    tone: str = "professional"
+    draft_replies: bool = True
 
 @router.get("/status")
 async def get_agent_status():
-    return {"status": "success", "agents": AGENTS}
+    return {"status": "success", "agents": await agent_status_service.list()}
 
 @router.post("/reply/generate")
 async def generate_reply(request: ReplyRequest):
@@ -34,48 +38,99 @@ async def generate_reply(request: ReplyRequest):
     import asyncio
     
     # Simulate agent work
-    AGENTS[3]["status"] = "working" # Reply Writer
-    AGENTS[3]["current_task"] = f"Drafting reply to {request.sender}"
-    AGENTS[3]["progress"] = 20
+    await agent_status_service.update("reply-writer", "working", f"Drafting reply to {request.sender}", 20)
     
     # Generate content
     reply = await ai_service.generate_email_reply(
         request.email_subject,
         request.email_body,
         request.sender,
-        request.tone
+        request.tone,
+        regenerate=request.regenerate
     )
     
-    AGENTS[3]["progress"] = 100
-    AGENTS[3]["status"] = "idle"
-    AGENTS[3]["current_task"] = "Reply generated"
+    await agent_status_service.update("reply-writer", "idle", "Reply generated", 100)
     
     return {"status": "success", "reply": reply}
 
+@router.post("/reply/generate/stream")
+async def generate_reply_stream(request: ReplyRequest):
+    """Stream an AI reply token by token over SSE"""
+    async def event_generator():
+        await agent_status_service.update("reply-writer", "working", f"Drafting reply to {request.sender}", 20)
+        
+        chunks = []
+        try:
+            async for token in ai_service.stream_email_reply(
+                request.email_subject,
+                request.email_body,
+                request.sender,
+                request.tone,
+                regenerate=request.regenerate
+            ):
+                chunks.append(token)
+                yield {"event": "token", "data": json.dumps({"token": token})}
+        finally:
+            await agent_status_service.update("reply-writer", "idle", "Reply generated", 100)
+        
+        yield {"event": "done", "data": json.dumps({"reply": "".join(chunks)})}
+    
+    return EventSourceResponse(event_generator())
+
+@router.post("/pipeline/run")
+async def run_pipeline(request: PipelineRequest):
+    """Read, summarize and draft replies for the newest inbox emails in the background"""
+    job = await agent_pipeline.submit(request.max_emails, request.tone, request.draft_replies)
+    return {"status": "success", "job": job.to_dict()}
+
+@router.get("/pipeline")
+async def get_pipeline_status():
+    """Queue depth, busy workers and throughput per stage, plus recent jobs"""
+    return {"status": "success", **agent_pipeline.stats()}
+
+@router.get("/pipeline/jobs/{job_id}")
+async def get_pipeline_job(job_id: str):
+    job = agent_pipeline.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Pipeline job not found")
+    return {"status": "success", "job": job.to_dict(include_results=True)}
+
 @router.get("/events/stream")
 async def message_stream():
-    """Real-time SSE stream for agent updates"""
+    """Real-time SSE stream for agent updates: a snapshot, then events as they are published"""
+    def message(payload):
+        return {"event": "message", "data": json.dumps(payload)}
+
     async def event_generator():
-        while True:
-            # Check for disconnected client
-            if await asyncio.sleep(1): # Heartbeat every 1s
-                yield {
-                    "event": "heartbeat",
-                    "data": json.dumps({"type": "heartbeat", "timestamp": str(asyncio.get_event_loop().time())})
-                }
-            
-            # Simulate random agent activity occasionally
-            if random.random() < 0.1:
-                agent = random.choice(AGENTS)
-                update = {
-                    "type": "status",
-                    "data": {
-                        "agents": AGENTS
-                    }
-                }
-                yield {
-                    "event": "message",
-                    "data": json.dumps(update)
+        # Subscribe first so nothing published while building the snapshot is missed
+        subscription = event_bus.subscribe()
+        try:
+            yield message({
+                "type": "init",
+                "data": {
+                    "agents": await agent_status_service.list(),
+                    "events": event_bus.recent(),
+                    "timestamp": datetime.utcnow().isoformat()
                 }
+            })
+            while True:
+                event = await subscription.get(HEARTBEAT_SECONDS)
+                if event is None:
+                    yield message({"type": "heartbeat", "timestamp": datetime.utcnow().isoformat()})
+                elif subscription.dropped:
+                    # This client fell behind and lost events; resend the whole state
+                    subscription.clear()
+                    yield message({
+                        "type": "status",
+                        "data": {
+                            "agents": await agent_status_service.list(),
+                            "events": event_bus.recent(),
+                            "timestamp": datetime.utcnow().isoformat()
+                        }
+                    })
+                else:
+                    yield message({"type": "event", "data": event})
+        finally:
+            event_bus.unsubscribe(subscription)
     
     return EventSourceResponse(event_generator())
@@ -1,6 +1,9 @@
 from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import RedirectResponse
 from app.services.gmail_service import gmail_service
+from app.services.gmail_sync_service import gmail_sync_service
+from app.services.inbox_snapshot_service import inbox_snapshot_service
+from app.services.draft_prefetcher import draft_prefetcher
 import os
 
 router = APIRouter()
@@ -20,6 +23,10 @@ async def gmail_callback(code: str = Query(...)):
     result = await gmail_service.handle_oauth_callback(code)
     
     if result.get("success"):
+        # The connected account may have changed - resync from scratch
+        await gmail_sync_service.reset()
+        inbox_snapshot_service.invalidate()
+        await draft_prefetcher.clear()
         # Redirect to frontend with success
         return RedirectResponse(url=f"{FRONTEND_URL}/settings?gmail=connected")
     else:
@@ -29,7 +36,7 @@ async def gmail_callback(code: str = Query(...)):
 @router.get("/gmail/status")
 async def gmail_status():
     """Check Gmail connection status"""
-    connected = gmail_service.is_connected()
+    connected = await gmail_service.is_connected()
     return {
         "connected": connected,
         "mock_mode": gmail_service.mock_mode
@@ -39,4 +46,7 @@ async def gmail_status():
 async def gmail_disconnect():
     """Disconnect Gmail account"""
     result = await gmail_service.disconnect()
+    await gmail_sync_service.reset()
+    inbox_snapshot_service.invalidate()
+    await draft_prefetcher.clear()
     return result
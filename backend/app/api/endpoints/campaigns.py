@@ -1,21 +1,21 @@
-import csv
-import io
-import asyncio
 from datetime import datetime
-from typing import List
-from fastapi import APIRouter, HTTPException, UploadFile, File, BackgroundTasks, Depends
+from typing import Dict, List, Optional
+from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Query
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, delete, func
 from sqlalchemy.orm import selectinload
 
-from app.database import get_db, async_session_maker
+from app.database import get_db
 from app.models import Campaign, Recipient, CampaignLog
-from app.services.gmail_service import gmail_service
-from app.services.ai_service import ai_service
+from app.services.campaign_worker import campaign_worker
+from app.services.recipient_importer import recipient_importer
 
 router = APIRouter()
 
+# "summary" returns recipient counts; "full" embeds every recipient and log
+VIEW_PATTERN = "^(summary|full)$"
+
 
 class CampaignCreate(BaseModel):
     name: str
@@ -26,6 +26,27 @@ class CampaignCreate(BaseModel):
     type: str = "email"
 
 
+async def recipient_counts(db: AsyncSession, campaign_ids: List[str]) -> Dict[str, Dict[str, int]]:
+    """Recipient counts by status for each campaign, aggregated in SQL"""
+    counts: Dict[str, Dict[str, int]] = {cid: {"total": 0} for cid in campaign_ids}
+    if not campaign_ids:
+        return counts
+    result = await db.execute(
+        select(Recipient.campaign_id, Recipient.status, func.count())
+        .where(Recipient.campaign_id.in_(campaign_ids))
+        .group_by(Recipient.campaign_id, Recipient.status)
+    )
+    for campaign_id, status, count in result.all():
+        counts[campaign_id][status] = count
+        counts[campaign_id]["total"] += count
+    return counts
+
+
+async def campaign_summary(db: AsyncSession, campaign: Campaign) -> dict:
+    counts = await recipient_counts(db, [campaign.id])
+    return campaign.to_summary_dict(counts[campaign.id])
+
+
 @router.post("/create")
 async def create_campaign(campaign: CampaignCreate, db: AsyncSession = Depends(get_db)):
     """Create a new email campaign"""
@@ -46,35 +67,97 @@ async def create_campaign(campaign: CampaignCreate, db: AsyncSession = Depends(g
     await db.commit()
     await db.refresh(new_campaign)
     
-    return {"status": "success", "campaign": new_campaign.to_dict()}
+    return {"status": "success", "campaign": new_campaign.to_summary_dict()}
 
 
 @router.get("")
-async def list_campaigns(db: AsyncSession = Depends(get_db)):
+async def list_campaigns(
+    view: str = Query("summary", pattern=VIEW_PATTERN),
+    db: AsyncSession = Depends(get_db)
+):
     """List all campaigns"""
-    result = await db.execute(
-        select(Campaign)
-        .options(selectinload(Campaign.recipients), selectinload(Campaign.logs))
-        .order_by(Campaign.created_at.desc())
-    )
+    query = select(Campaign).order_by(Campaign.created_at.desc())
+    if view == "full":
+        query = query.options(selectinload(Campaign.recipients), selectinload(Campaign.logs))
+    result = await db.execute(query)
     campaigns = result.scalars().all()
-    return {"status": "success", "campaigns": [c.to_dict() for c in campaigns]}
+
+    if view == "full":
+        return {"status": "success", "campaigns": [c.to_dict() for c in campaigns]}
+
+    counts = await recipient_counts(db, [c.id for c in campaigns])
+    return {"status": "success", "campaigns": [c.to_summary_dict(counts[c.id]) for c in campaigns]}
 
 
 @router.get("/{campaign_id}")
-async def get_campaign(campaign_id: str, db: AsyncSession = Depends(get_db)):
+async def get_campaign(
+    campaign_id: str,
+    view: str = Query("summary", pattern=VIEW_PATTERN),
+    db: AsyncSession = Depends(get_db)
+):
     """Get a specific campaign"""
-    result = await db.execute(
-        select(Campaign)
-        .options(selectinload(Campaign.recipients), selectinload(Campaign.logs))
-        .where(Campaign.id == campaign_id)
-    )
+    query = select(Campaign).where(Campaign.id == campaign_id)
+    if view == "full":
+        query = query.options(selectinload(Campaign.recipients), selectinload(Campaign.logs))
+    result = await db.execute(query)
     campaign = result.scalar_one_or_none()
     
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
     
-    return {"status": "success", "campaign": campaign.to_dict()}
+    if view == "full":
+        return {"status": "success", "campaign": campaign.to_dict()}
+    return {"status": "success", "campaign": await campaign_summary(db, campaign)}
+
+
+@router.get("/{campaign_id}/recipients")
+async def list_recipients(
+    campaign_id: str,
+    after: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    status: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Page through a campaign's recipients; pass next_after back as after"""
+    query = (
+        select(Recipient)
+        .where(Recipient.campaign_id == campaign_id, Recipient.id > after)
+        .order_by(Recipient.id)
+        .limit(limit)
+    )
+    if status:
+        query = query.where(Recipient.status == status)
+    result = await db.execute(query)
+    recipients = result.scalars().all()
+    
+    return {
+        "status": "success",
+        "recipients": [r.to_dict() for r in recipients],
+        "next_after": recipients[-1].id if len(recipients) == limit else None
+    }
+
+
+@router.get("/{campaign_id}/logs")
+async def list_logs(
+    campaign_id: str,
+    after: int = 0,
+    limit: int = Query(200, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db)
+):
+    """Page through a campaign's logs, oldest first; pass next_after back as after"""
+    result = await db.execute(
+        select(CampaignLog)
+        .where(CampaignLog.campaign_id == campaign_id, CampaignLog.id > after)
+        .order_by(CampaignLog.id)
+        .limit(limit)
+    )
+    logs = result.scalars().all()
+    
+    return {
+        "status": "success",
+        "logs": [l.to_dict() for l in logs],
+        "next_after": logs[-1].id if len(logs) == limit else None
+    }
 
 
 @router.post("/{campaign_id}/upload")
@@ -84,11 +167,7 @@ async def upload_recipients(
     db: AsyncSession = Depends(get_db)
 ):
     """Upload CSV file with recipient emails"""
-    result = await db.execute(
-        select(Campaign)
-        .options(selectinload(Campaign.recipients), selectinload(Campaign.logs))
-        .where(Campaign.id == campaign_id)
-    )
+    result = await db.execute(select(Campaign).where(Campaign.id == campaign_id))
     campaign = result.scalar_one_or_none()
     
     if not campaign:
@@ -97,30 +176,12 @@ async def upload_recipients(
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Only CSV files are supported")
     
-    content = await file.read()
-    decoded = content.decode('utf-8')
-    
-    # Clear existing recipients
-    for recipient in campaign.recipients:
-        await db.delete(recipient)
-    
-    # Parse CSV and add new recipients
-    reader = csv.DictReader(io.StringIO(decoded))
-    recipients_count = 0
-    
-    for row in reader:
-        email = row.get('email', row.get('Email', '')).strip()
-        name = row.get('name', row.get('Name', '')).strip()
-        
-        if email and '@' in email:
-            new_recipient = Recipient(
-                campaign_id=campaign_id,
-                email=email,
-                name=name or email.split('@')[0].capitalize(),
-                status="pending"
-            )
-            db.add(new_recipient)
-            recipients_count += 1
+    # Replaces existing recipients; nothing is kept unless we commit below
+    try:
+        counts = await recipient_importer.import_csv(db, campaign_id, file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    recipients_count = counts["imported"]
     
     # Add log entry
     log = CampaignLog(
@@ -131,40 +192,26 @@ async def upload_recipients(
     
     await db.commit()
     
-    # Refresh to get updated data
-    await db.refresh(campaign)
-    result = await db.execute(
-        select(Campaign)
-        .options(selectinload(Campaign.recipients), selectinload(Campaign.logs))
-        .where(Campaign.id == campaign_id)
-    )
-    campaign = result.scalar_one()
-    
     return {
         "status": "success",
         "recipients_count": recipients_count,
-        "campaign": campaign.to_dict()
+        "duplicates": counts["duplicates"],
+        "invalid": counts["invalid"],
+        "campaign": await campaign_summary(db, campaign)
     }
 
 
 @router.post("/{campaign_id}/start")
-async def start_campaign(
-    campaign_id: str, 
-    background_tasks: BackgroundTasks,
-    db: AsyncSession = Depends(get_db)
-):
+async def start_campaign(campaign_id: str, db: AsyncSession = Depends(get_db)):
     """Start sending emails for a campaign"""
-    result = await db.execute(
-        select(Campaign)
-        .options(selectinload(Campaign.recipients), selectinload(Campaign.logs))
-        .where(Campaign.id == campaign_id)
-    )
+    result = await db.execute(select(Campaign).where(Campaign.id == campaign_id))
     campaign = result.scalar_one_or_none()
     
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
     
-    if len(campaign.recipients) == 0:
+    total = (await recipient_counts(db, [campaign_id]))[campaign_id]["total"]
+    if total == 0:
         raise HTTPException(status_code=400, detail="No recipients uploaded. Please upload a CSV file first.")
     
     if campaign.status == "active":
@@ -173,116 +220,21 @@ async def start_campaign(
     campaign.status = "active"
     log = CampaignLog(
         campaign_id=campaign_id,
-        message=f"Campaign started. Sending to {len(campaign.recipients)} recipients."
+        message=f"Campaign started. Sending to {total} recipients."
     )
     db.add(log)
     await db.commit()
     
-    # Start background task to send emails
-    background_tasks.add_task(send_campaign_emails, campaign_id)
-    
-    await db.refresh(campaign)
-    result = await db.execute(
-        select(Campaign)
-        .options(selectinload(Campaign.recipients), selectinload(Campaign.logs))
-        .where(Campaign.id == campaign_id)
-    )
-    campaign = result.scalar_one()
+    # Pending recipients are picked up by the campaign worker(s)
+    campaign_worker.wake(campaign_id)
     
-    return {"status": "success", "message": "Campaign started", "campaign": campaign.to_dict()}
-
-
-async def send_campaign_emails(campaign_id: str):
-    """Background task to send emails for a campaign"""
-    async with async_session_maker() as db:
-        result = await db.execute(
-            select(Campaign)
-            .options(selectinload(Campaign.recipients), selectinload(Campaign.logs))
-            .where(Campaign.id == campaign_id)
-        )
-        campaign = result.scalar_one_or_none()
-        
-        if not campaign:
-            return
-        
-        for recipient in campaign.recipients:
-            # Check if campaign is still active
-            await db.refresh(campaign)
-            if campaign.status != "active":
-                break
-            
-            if recipient.status != "pending":
-                continue
-            
-            try:
-                # Replace template variables
-                final_content = campaign.template.replace("{{name}}", recipient.name or "there")
-                final_content = final_content.replace("{{email}}", recipient.email)
-                
-                # Send email via Gmail
-                result = await gmail_service.send_email(
-                    to=recipient.email,
-                    subject=campaign.subject,
-                    body=final_content
-                )
-                
-                if result.get("success"):
-                    recipient.status = "sent"
-                    recipient.sent_at = datetime.utcnow()
-                    campaign.sent += 1
-                    
-                    log = CampaignLog(
-                        campaign_id=campaign_id,
-                        message=f"✅ Sent to {recipient.email}"
-                    )
-                    db.add(log)
-                else:
-                    recipient.status = "failed"
-                    recipient.error = result.get("error", "Unknown error")
-                    campaign.failed += 1
-                    
-                    log = CampaignLog(
-                        campaign_id=campaign_id,
-                        message=f"❌ Failed to send to {recipient.email}: {recipient.error}"
-                    )
-                    db.add(log)
-            
-            except Exception as e:
-                recipient.status = "failed"
-                recipient.error = str(e)
-                campaign.failed += 1
-                
-                log = CampaignLog(
-                    campaign_id=campaign_id,
-                    message=f"❌ Error sending to {recipient.email}: {str(e)}"
-                )
-                db.add(log)
-            
-            await db.commit()
-            
-            # Small delay between emails to avoid rate limiting
-            await asyncio.sleep(1)
-        
-        # Mark campaign as completed
-        await db.refresh(campaign)
-        if campaign.status == "active":
-            campaign.status = "completed"
-            log = CampaignLog(
-                campaign_id=campaign_id,
-                message=f"Campaign completed. Sent: {campaign.sent}, Failed: {campaign.failed}"
-            )
-            db.add(log)
-            await db.commit()
+    return {"status": "success", "message": "Campaign started", "campaign": await campaign_summary(db, campaign)}
 
 
 @router.post("/{campaign_id}/pause")
 async def pause_campaign(campaign_id: str, db: AsyncSession = Depends(get_db)):
     """Pause a running campaign"""
-    result = await db.execute(
-        select(Campaign)
-        .options(selectinload(Campaign.recipients), selectinload(Campaign.logs))
-        .where(Campaign.id == campaign_id)
-    )
+    result = await db.execute(select(Campaign).where(Campaign.id == campaign_id))
     campaign = result.scalar_one_or_none()
     
     if not campaign:
@@ -299,9 +251,10 @@ async def pause_campaign(campaign_id: str, db: AsyncSession = Depends(get_db)):
     db.add(log)
     await db.commit()
     
-    await db.refresh(campaign)
+    # Stop in-flight sends without the worker polling the campaign row
+    campaign_worker.halt(campaign_id)
     
-    return {"status": "success", "message": "Campaign paused", "campaign": campaign.to_dict()}
+    return {"status": "success", "message": "Campaign paused", "campaign": await campaign_summary(db, campaign)}
 
 
 @router.delete("/{campaign_id}")
@@ -313,6 +266,10 @@ async def delete_campaign(campaign_id: str, db: AsyncSession = Depends(get_db)):
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
     
+    campaign_worker.halt(campaign_id)
+    # Bulk-delete children so the ORM cascade has nothing left to load
+    await db.execute(delete(Recipient).where(Recipient.campaign_id == campaign_id))
+    await db.execute(delete(CampaignLog).where(CampaignLog.campaign_id == campaign_id))
     await db.delete(campaign)
     await db.commit()
     
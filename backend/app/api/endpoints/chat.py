@@ -1,13 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
+from sse_starlette.sse import EventSourceResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, delete
 from datetime import datetime
+import json
 import uuid
 from app.services.ai_service import ai_service
 from app.services.gmail_service import gmail_service
+from app.services.inbox_snapshot_service import inbox_snapshot_service
+from app.services.intent_router import intent_router
+from app.services.session_state_service import session_state_service
 from app.services.web_search_service import web_search_service
 from app.services.history_service import history_service
+from app.services.draft_prefetcher import draft_prefetcher
 from app.database import get_db
 from app.models import ChatSession, ChatMessage
 
@@ -54,6 +60,9 @@ async def create_session(request: SessionRequest = None, db: AsyncSession = Depe
 @router.delete("/sessions/{session_id}")
 async def delete_session(session_id: str, db: AsyncSession = Depends(get_db)):
     """Delete a chat session and its messages"""
+    history_service.discard_session(session_id)
+    inbox_snapshot_service.invalidate(session_id)
+    await session_state_service.clear(session_id)
     # Delete all messages in this session
     await db.execute(
         delete(ChatMessage).where(ChatMessage.session_id == session_id)
@@ -98,138 +107,129 @@ async def update_session_title(session_id: str, request: SessionRequest, db: Asy
 @router.get("/history")
 async def get_history():
     """Get chat history (legacy)"""
-    return history_service.load_history()
+    return await history_service.get_history()
 
 @router.delete("/history")
 async def clear_history():
     """Clear chat history (legacy)"""
-    history_service.clear_history()
+    await history_service.clear()
     return {"status": "success", "message": "History cleared"}
 
 @router.post("/")
 async def chat(request: ChatRequest):
     """AI-powered chat endpoint with email context"""
+    return await dispatch_chat(request)
+
+
+@router.post("/stream")
+async def chat_stream(request: ChatRequest):
+    """Streaming variant of the chat endpoint.
+
+    Sends `token` events as the model produces text and a final `done` event
+    with the full response. Commands answered without the model arrive as a
+    single token.
+    """
+    result = await dispatch_chat(request, stream=True)
+    
+    async def event_generator():
+        if "stream" in result:
+            chunks = []
+            async for token in result["stream"]:
+                chunks.append(token)
+                yield {"event": "token", "data": json.dumps({"token": token})}
+            response = "".join(chunks)
+            history_service.save_message("assistant", response, request.session_id)
+        else:
+            response = result["response"]
+            yield {"event": "token", "data": json.dumps({"token": response})}
+        yield {"event": "done", "data": json.dumps({"response": response})}
     
-    # Save user message
-    history_service.save_message("user", request.message, request.session_id)
-    
-    message_lower = request.message.lower()
-    
-    # Fetch emails for any email-related query
-    emails = []
-    try:
-        emails = await gmail_service.fetch_emails(max_results=20)
-    except Exception as e:
-        print(f"Error fetching emails: {e}")
-    
-    # Handle specific commands
-    
-    # Read/Show specific email (e.g., "show me 1st email", "read email 2")
-    if any(word in message_lower for word in ["read", "show", "open", "full"]) and any(word in message_lower for word in ["1st", "2nd", "3rd", "first", "second", "third", "email 1", "email 2", "email 3", "#1", "#2", "#3", "one", "two", "three"]):
-        return await handle_read_email(emails, request.message)
-    
-    # Reply to email with tone options
-    reply_triggers = ["reply", "draft", "respond", "write to", "answer"]
-    if any(trigger in message_lower for trigger in reply_triggers):
-        return await handle_reply_draft(emails, request.message)
-    
-    # Send confirmation / Send with specific tone
-    send_triggers = ["send", "continue", "use", "confirm", "yes"]
-    if any(t in message_lower for t in send_triggers):
-        # Check if it's a specific tone request OR a general confirmation
-        has_tone = any(tone in message_lower for tone in ["professional", "friendly", "casual", "formal", "urgent"])
-        is_confirmation = any(c in message_lower for c in ["it", "now", "email", "reply", "draft", "yes", "good"])
-        
-        if has_tone or is_confirmation:
-             return await handle_send_reply(emails, request.message)
-    
-    # Important emails (View Only)
-    # Exclude if trying to send/draft/reply
-    if any(k in message_lower for k in ["urgent", "important", "priority", "critical"]) and not any(k in message_lower for k in ["send", "draft", "write", "reply", "compose"]):
-        return await handle_urgent(emails)
-    
-    # Autonomous Task / Planning
-    if any(k in message_lower for k in ["task", "sub task", "plan", "checklist", "workflow"]):
-        return await handle_autonomous_task(request.message)
+    return EventSourceResponse(event_generator())
 
-    # Summarize (Priority over Compose because "emails" contains "mail")
-    if "summarize" in message_lower or "summary" in message_lower:
-        return await handle_summarize(emails, request.message)
 
-    # Compose/Send new email
-    # Triggers: "send email", "write mail", "draft message", "compose to", "mail to"
-    import re
-    # Check for "mail" as a whole word to avoid matching "emails", "gmail" etc.
-    is_mail_verb = bool(re.search(r'\bmail\b', message_lower))
-    
-    compose_keywords = ["send", "write", "draft", "compose", "create"]
-    noun_keywords = ["email", "mail", "message", "note"]
-    
-    has_compose_verb = any(k in message_lower for k in compose_keywords) or is_mail_verb
-    
-    if has_compose_verb and (
-        any(n in message_lower for n in noun_keywords) or " to " in message_lower or is_mail_verb
-    ):
-        # Exclude "reply" intent
-        if "reply" not in message_lower:
-            return await handle_compose_email(request.message)
+async def dispatch_chat(request: ChatRequest, stream: bool = False):
+    """Route a chat message to its handler.
 
-    if "statistic" in message_lower or "stats" in message_lower:
-        return await handle_statistics(emails)
-    
-    elif "work" in message_lower and ("find" in message_lower or "show" in message_lower):
-        return await handle_work_emails(emails)
+    With stream=True, replies generated by the model are returned as
+    {"stream": <async iterator of tokens>} instead of {"response": str}.
+    """
     
-    # Web search / Jobs / Platforms
-    # Triggers: "job", "web", "google", "linkedin", "naukri", etc.
-    web_keywords = ["job", "web", "google", "internet", "linkedin", "naukri", "indeed", "glassdoor", "hiring", "vacancy", "platform", "online", "jon"]
+    # Save user message
+    history_service.save_message("user", request.message, request.session_id)
     
-    if any(k in message_lower for k in web_keywords):
-         return await handle_web_search(request.message)
-
-    elif "find" in message_lower or "search" in message_lower:
-        return await handle_search(emails, request.message)
+    # Emails are only loaded by the handlers that need them
+    async def load_emails():
+        try:
+            return await inbox_snapshot_service.get(request.session_id, max_results=20)
+        except Exception as e:
+            print(f"Error fetching emails: {e}")
+            return []
+    
+    # Handle specific commands (see INTENTS for the precedence between them)
+    intent = intent_router.classify(request.message)
+    
+    if intent == "read_email":
+        return await handle_read_email(await load_emails(), request.message)
+    if intent in ("reply_draft", "send_reply", "compose"):
+        return await handle_stateful(intent, request, load_emails)
+    if intent == "urgent":
+        return await handle_urgent(await load_emails())
+    if intent == "autonomous_task":
+        return await handle_autonomous_task(request.message)
+    if intent == "summarize":
+        return await handle_summarize(await load_emails(), request.message)
+    if intent == "statistics":
+        return await handle_statistics(await load_emails())
+    if intent == "work_emails":
+        return await handle_work_emails(await load_emails())
+    if intent == "web_search":
+        return await handle_web_search(request.message)
+    if intent == "search":
+        return await handle_search(await load_emails(), request.message)
     
     # General email query with context
-    elif any(keyword in message_lower for keyword in ["email", "emails", "inbox", "mail", "unread"]):
-        email_context = build_email_context(emails)
+    if intent == "email_chat":
+        email_context = build_email_context(await load_emails())
         
         # Add chat history context to help AI understand if "mails" refers to inbox or previous search results
-        chat_context = history_service.get_recent_context(limit=3)
+        chat_context = await history_service.get_recent_context(limit=3)
         full_context = f"PREVIOUS CHAT:\n{chat_context}\n\nUSER'S INBOX CONTEXT:\n{email_context}"
         
+        if stream:
+            return {"stream": ai_service.stream_chat_with_context(request.message, full_context)}
         response = await ai_service.chat_with_context(request.message, full_context)
         
         history_service.save_message("assistant", response, request.session_id)
         return {"response": response}
     
     # Regular chat without email context
+    if stream:
+        return {"stream": ai_service.stream_chat(request.message)}
     response = await ai_service.chat(request.message)
     history_service.save_message("assistant", response, request.session_id)
     return {"response": response}
 
 
+async def handle_stateful(intent: str, request: ChatRequest, load_emails):
+    """Run a handler that continues the session's conversation (draft, compose, send)"""
+    state = await session_state_service.get(request.session_id)
+    if intent == "reply_draft":
+        result = await handle_reply_draft(await load_emails(), request.message, state)
+    elif intent == "send_reply":
+        result = await handle_send_reply(load_emails, request.message, state)
+    else:
+        result = await handle_compose_email(request.message, state)
+    await session_state_service.save(request.session_id, state)
+    return result
+
+
 async def handle_read_email(emails: list, message: str):
     """Handle reading a specific email"""
     if not emails:
         return {"response": "📭 No emails found. Please connect your Gmail account in Settings."}
     
-    # Parse which email number
-    message_lower = message.lower()
-    email_index = 0  # Default to first
-    
-    number_map = {
-        '1st': 0, 'first': 0, 'one': 0, '#1': 0, 'email 1': 0, '1': 0,
-        '2nd': 1, 'second': 1, 'two': 1, '#2': 1, 'email 2': 1, '2': 1,
-        '3rd': 2, 'third': 2, 'three': 2, '#3': 2, 'email 3': 2, '3': 2,
-        '4th': 3, 'fourth': 3, 'four': 3, '#4': 3, 'email 4': 3, '4': 3,
-        '5th': 4, 'fifth': 4, 'five': 4, '#5': 4, 'email 5': 4, '5': 4,
-    }
-    
-    for key, idx in number_map.items():
-        if key in message_lower:
-            email_index = idx
-            break
+    # Parse which email number (default to first)
+    email_index = intent_router.parse_ordinal(message, allow_digits=True) or 0
     
     if email_index >= len(emails):
         return {"response": f"❌ Email #{email_index + 1} not found. You have {len(emails)} emails."}
@@ -277,19 +277,9 @@ async def handle_read_email(emails: list, message: str):
     return {"response": response}
 
 
-# Store last viewed email for reply context
-_last_email_context = {"email": None, "index": 0}
-# Store compose context
-_compose_context = {"to": None, "subject": None, "body": None, "tone": "professional"}
-# Active mode: 'reply' or 'compose'
-_active_mode = "reply"
-
-
-async def handle_reply_draft(emails: list, message: str):
+async def handle_reply_draft(emails: list, message: str, state: dict):
     """Handle reply drafting with tone options"""
-    global _last_email_context, _active_mode
-    _active_mode = "reply"
-    global _last_email_context
+    state["mode"] = "reply"
     
     if not emails:
         return {"response": "📭 No emails found. Please connect your Gmail account in Settings."}
@@ -300,18 +290,7 @@ async def handle_reply_draft(emails: list, message: str):
     email = None
     
     # First try to match by number
-    number_map = {
-        '1st': 0, 'first': 0, 'one': 0, '#1': 0, 'email 1': 0,
-        '2nd': 1, 'second': 1, 'two': 1, '#2': 1, 'email 2': 1,
-        '3rd': 2, 'third': 2, 'three': 2, '#3': 2, 'email 3': 2,
-        '4th': 3, 'fourth': 3, 'four': 3, '#4': 3, 'email 4': 3,
-        '5th': 4, 'fifth': 4, 'five': 4, '#5': 4, 'email 5': 4,
-    }
-    
-    for key, idx in number_map.items():
-        if key in message_lower:
-            email_index = idx
-            break
+    email_index = intent_router.parse_ordinal(message)
     
     # If no number found, try to match by sender name
     if email_index is None:
@@ -330,21 +309,17 @@ async def handle_reply_draft(emails: list, message: str):
     
     # If still no match, use last viewed or first email
     if email_index is None:
-        email_index = _last_email_context.get("index", 0)
+        email_index = state.get("last_email_index", 0)
     
     if email_index >= len(emails):
         email_index = 0
     
     email = emails[email_index]
-    _last_email_context = {"email": email, "index": email_index}
-    
-    # Generate preview draft with AI
-    preview_reply = await ai_service.generate_email_reply(
-        email.get('subject', ''),
-        email.get('body', email.get('snippet', '')),
-        email.get('from', ''),
-        'professional'  # Default tone for preview
-    )
+    state["last_email"] = email
+    state["last_email_index"] = email_index
+    
+    # Preview draft, usually prepared in the background already
+    preview_reply = await draft_prefetcher.get_or_generate(email, 'professional')  # Default tone for preview
     
     response = f"""✉️ **Draft Reply to Email #{email_index + 1}**
 
@@ -374,32 +349,28 @@ Or type: **"send professional reply"** to send immediately!
     return {"response": response}
 
 
-async def handle_send_reply(emails: list, message: str):
-    """Handle sending email (reply or new)"""
-    global _last_email_context, _active_mode, _compose_context
+async def handle_send_reply(load_emails, message: str, state: dict):
+    """Handle sending email (reply or new); load_emails is only awaited if needed"""
+    compose = state["compose"]
     
     tone_icons = {'professional': '💼', 'friendly': '😊', 'urgent': '⚡', 'casual': '🎯'}
 
     # Determine tone from message
     message_lower = message.lower()
-    tone = "professional"
-    if "friendly" in message_lower: tone = "friendly"
-    elif "casual" in message_lower: tone = "casual"
-    elif "urgent" in message_lower: tone = "urgent"
-    elif "formal" in message_lower: tone = "professional"
+    tone = intent_router.parse_tone(message)
     
     # === COMPOSE MODE ===
-    if _active_mode == "compose":
-        to = _compose_context.get("to")
-        subject = _compose_context.get("subject")
-        body = _compose_context.get("body")
+    if state.get("mode") == "compose":
+        to = compose.get("to")
+        subject = compose.get("subject")
+        body = compose.get("body")
         
         if not to:
              return {"response": "⚠️ I don't know who to send this to. Please say **'Send email to [Name]'** to start."}
             
         # If tone changed in this step, regenerate
         # Or if body is missing
-        if not body or (any(t in message_lower for t in tone_icons.keys()) and tone != _compose_context.get("tone")):
+        if not body or (any(t in message_lower for t in tone_icons.keys()) and tone != compose.get("tone")):
              ai_result = await ai_service.generate_new_email(
                 to, 
                 subject,
@@ -410,9 +381,9 @@ async def handle_send_reply(emails: list, message: str):
              subject = ai_result.get("subject", subject)
              
              # Update context
-             _compose_context["body"] = body
-             _compose_context["subject"] = subject
-             _compose_context["tone"] = tone
+             compose["body"] = body
+             compose["subject"] = subject
+             compose["tone"] = tone
              
         if not body:
             return {"response": "⚠️ I couldn't generate an email body. Please try again with more details."}
@@ -422,8 +393,8 @@ async def handle_send_reply(emails: list, message: str):
         
         if result.get('success'):
             # Clear context to prevent resending same email later
-            _compose_context = {}
-            _active_mode = None
+            state["compose"] = {}
+            state["mode"] = None
             
             return {"response": f"""✅ **Email Sent Successfully!**
 
@@ -455,23 +426,21 @@ I couldn't send the email. Error: {result.get('error')}
 """}
 
     # === REPLY MODE (Default) ===
-    email = _last_email_context.get("email")
+    email = state.get("last_email")
     
     if not email:
+        emails = await load_emails()
         if not emails:
             return {"response": "📭 No emails found. Please first view an email using 'show me 1st email'."}
         email = emails[0]
     
     # Generate the full reply
-    reply_content = await ai_service.generate_email_reply(
-        email.get('subject', ''),
-        email.get('body', email.get('snippet', '')),
-        email.get('from', ''),
-        tone
-    )
+    reply_content = await draft_prefetcher.get_or_generate(email, tone)
     
     # Send the reply
     result = await gmail_service.send_reply(email.get('id'), reply_content)
+    if result.get('success'):
+        await draft_prefetcher.discard(email.get('id'))
     
     if result.get('success'):
         response = f"""✅ **Reply Sent Successfully!**
@@ -515,10 +484,9 @@ Since Gmail is not fully connected, here's the reply that would be sent:
     return {"response": response}
 
 
-async def handle_compose_email(message: str):
+async def handle_compose_email(message: str, state: dict):
     """Handle composing and sending a new email"""
-    global _compose_context, _active_mode
-    _active_mode = "compose"
+    state["mode"] = "compose"
     
     # Extract recipient and subject using regex for better precision
     import re
@@ -587,7 +555,7 @@ async def handle_compose_email(message: str):
     final_subject = ai_result.get("subject", subject)
     final_body = ai_result.get("body", "")
     
-    _compose_context = {
+    state["compose"] = {
         "to": recipient,
         "subject": final_subject,
         "body": final_body,
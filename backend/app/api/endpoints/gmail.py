@@ -1,28 +1,57 @@
+import os
+import json
+import asyncio
 from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from sse_starlette.sse import EventSourceResponse
+from typing import Optional, List, Dict, Any
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.services.gmail_service import gmail_service
-from app.services.ai_service import ai_service
-from app.database import get_db
+from app.services.gmail_sync_service import gmail_sync_service
+from app.services.event_bus import event_bus
+from app.services.draft_prefetcher import draft_prefetcher
+from app.database import get_db, async_session_maker
 from app.models import SentEmail
 
 router = APIRouter()
 
+# Most emails one batch request may reply to
+REPLY_BATCH_MAX = int(os.getenv("REPLY_BATCH_MAX", "200"))
+# Within a batch: replies generated at the same time, and sends in flight
+REPLY_BATCH_LLM_CONCURRENCY = int(os.getenv("REPLY_BATCH_LLM_CONCURRENCY", "8"))
+REPLY_BATCH_SEND_CONCURRENCY = int(os.getenv("REPLY_BATCH_SEND_CONCURRENCY", "4"))
+
+# Running batches, so they are not garbage collected if the client goes away
+_batches = set()
+
 class ReplyRequest(BaseModel):
     email_id: str
     content: Optional[str] = None
     tone: Optional[str] = "professional"
+    # Bypass the completion cache and ask the model for a fresh draft
+    regenerate: bool = False
     # Optional fields for saving to database
     original_from: Optional[str] = None
     original_subject: Optional[str] = None
 
+class BatchReplyItem(BaseModel):
+    email_id: str
+    # Send this text instead of generating a reply
+    content: Optional[str] = None
+    # Defaults to the batch tone
+    tone: Optional[str] = None
+
+class BatchReplyRequest(BaseModel):
+    items: List[BatchReplyItem] = Field(..., min_length=1, max_length=REPLY_BATCH_MAX)
+    tone: str = "professional"
+    regenerate: bool = False
+
 @router.get("/emails")
 async def get_emails(db: AsyncSession = Depends(get_db)):
     """Fetch emails from Gmail (or mock if not connected) with sent status"""
-    emails = await gmail_service.fetch_emails()
+    emails = await gmail_sync_service.get_emails()
     
     # Get list of sent email IDs from database
     result = await db.execute(select(SentEmail.email_id))
@@ -53,8 +82,7 @@ async def reply_email(request: ReplyRequest, db: AsyncSession = Depends(get_db))
     print(f"Reply request received - email_id: {request.email_id}, content: '{request.content}', tone: {request.tone}")
     
     # Get the email to reply to for context
-    emails = await gmail_service.fetch_emails()
-    email = next((e for e in emails if e["id"] == request.email_id), None)
+    email = await gmail_sync_service.get_email(request.email_id)
     
     original_from = request.original_from or (email.get("from", "") if email else "")
     original_subject = request.original_subject or (email.get("subject", "") if email else "")
@@ -63,15 +91,15 @@ async def reply_email(request: ReplyRequest, db: AsyncSession = Depends(get_db))
     if not request.content or request.content.strip() == "":
         if email:
             print(f"Generating AI reply for email from: {email.get('from')}")
-            # Generate AI reply
-            generated_content = await ai_service.generate_email_reply(
-                email_subject=email.get("subject", ""),
-                email_body=email.get("body", email.get("snippet", "")),
-                sender=email.get("from", ""),
-                tone=request.tone or "professional"
+            # Generate AI reply (or use the one drafted ahead of time)
+            generated_content = await draft_prefetcher.get_or_generate(
+                email,
+                request.tone or "professional",
+                regenerate=request.regenerate
             )
             request.content = generated_content
             print(f"Generated content: {request.content[:200]}...")
+            event_bus.publish("reply_generated", "reply-writer", {"email_id": request.email_id, "tone": request.tone})
         else:
             request.content = "Thank you for your email. I have received it and will respond shortly.\n\nBest regards,\nAbhishek"
     
@@ -101,6 +129,9 @@ async def reply_email(request: ReplyRequest, db: AsyncSession = Depends(get_db))
             print(f"Error saving sent email: {e}")
             # Don't fail the request if db save fails
         
+        await draft_prefetcher.discard(request.email_id)
+        event_bus.publish("reply_sent", "reply-writer", {"email_id": request.email_id}, target=original_from)
+        
         return {
             "status": "success", 
             "message": "Reply sent", 
@@ -110,21 +141,120 @@ async def reply_email(request: ReplyRequest, db: AsyncSession = Depends(get_db))
     else:
         raise HTTPException(status_code=400, detail=result.get("error", "Failed to send reply"))
 
+@router.post("/reply/batch")
+async def reply_batch(request: BatchReplyRequest):
+    """Generate and send replies to many emails, streaming a "result" event per email.
+
+    Originals are loaded once, replies are generated REPLY_BATCH_LLM_CONCURRENCY
+    at a time and sends are paced by the Gmail quota bucket. The batch keeps
+    running if the client disconnects.
+    """
+    items, seen = [], set()
+    for item in request.items:
+        if item.email_id not in seen:
+            seen.add(item.email_id)
+            items.append(item)
+
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def run_batch():
+        sent_rows = []
+        try:
+            emails = await gmail_sync_service.get_emails_by_id([item.email_id for item in items])
+            generate_slots = asyncio.Semaphore(REPLY_BATCH_LLM_CONCURRENCY)
+            send_slots = asyncio.Semaphore(REPLY_BATCH_SEND_CONCURRENCY)
+
+            async def reply_to(item: BatchReplyItem):
+                try:
+                    outcome = await _reply_one(
+                        item, emails.get(item.email_id), item.tone or request.tone, request.regenerate,
+                        generate_slots, send_slots
+                    )
+                except Exception as e:
+                    print(f"Error replying to {item.email_id}: {e}")
+                    outcome = {"email_id": item.email_id, "status": "failed", "error": str(e)}
+                if outcome["status"] == "sent":
+                    email = emails[item.email_id]
+                    sent_rows.append({
+                        "email_id": item.email_id,
+                        "original_from": email.get("from", ""),
+                        "original_subject": email.get("subject", ""),
+                        "reply_content": outcome["reply_content"]
+                    })
+                await results.put(outcome)
+
+            await asyncio.gather(*(reply_to(item) for item in items))
+        finally:
+            if sent_rows:
+                await _record_sent(sent_rows)
+            await results.put(None)
+
+    task = asyncio.create_task(run_batch())
+    _batches.add(task)
+    task.add_done_callback(_batches.discard)
+
+    async def event_generator():
+        counts = {"sent": 0, "failed": 0}
+        while True:
+            outcome = await results.get()
+            if outcome is None:
+                break
+            counts[outcome["status"]] += 1
+            yield {"event": "result", "data": json.dumps(outcome)}
+        # Items never reported were lost to an error while loading the originals
+        counts["failed"] += len(items) - counts["sent"] - counts["failed"]
+        yield {"event": "done", "data": json.dumps(counts)}
+
+    return EventSourceResponse(event_generator())
+
+async def _reply_one(item: BatchReplyItem, email: Optional[Dict[str, Any]], tone: str, regenerate: bool,
+                     generate_slots: asyncio.Semaphore, send_slots: asyncio.Semaphore) -> Dict[str, Any]:
+    if email is None:
+        return {"email_id": item.email_id, "status": "failed", "error": "Email not found"}
+
+    content = item.content
+    if not content or not content.strip():
+        async with generate_slots:
+            content = await draft_prefetcher.get_or_generate(email, tone, regenerate=regenerate)
+
+    async with send_slots:
+        result = await gmail_service.send_reply(item.email_id, content)
+    if not result.get("success"):
+        return {
+            "email_id": item.email_id,
+            "status": "failed",
+            "error": result.get("error", "Failed to send reply"),
+            "rate_limited": result.get("rate_limited", False)
+        }
+
+    await draft_prefetcher.discard(item.email_id)
+    event_bus.publish("reply_sent", "reply-writer", {"email_id": item.email_id}, target=email.get("from"))
+    return {"email_id": item.email_id, "status": "sent", "reply_content": content}
+
+async def _record_sent(rows: List[Dict[str, Any]]):
+    """Save SentEmail rows for the replies not recorded yet, in one transaction"""
+    try:
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(SentEmail.email_id).where(SentEmail.email_id.in_([r["email_id"] for r in rows]))
+            )
+            existing = set(result.scalars().all())
+            session.add_all([SentEmail(**r) for r in rows if r["email_id"] not in existing])
+            await session.commit()
+    except Exception as e:
+        print(f"Error saving sent emails: {e}")
+
 @router.post("/generate-reply")
-async def generate_reply(email_id: str, tone: str = "professional"):
+async def generate_reply(email_id: str, tone: str = "professional", regenerate: bool = False):
     """Generate an AI reply without sending"""
-    emails = await gmail_service.fetch_emails()
-    email = next((e for e in emails if e["id"] == email_id), None)
+    email = await gmail_sync_service.get_email(email_id)
     
     if not email:
         raise HTTPException(status_code=404, detail="Email not found")
     
-    reply_content = await ai_service.generate_email_reply(
-        email_subject=email.get("subject", ""),
-        email_body=email.get("body", email.get("snippet", "")),
-        sender=email.get("from", ""),
-        tone=tone
-    )
+    # Usually already drafted in the background
+    reply_content = await draft_prefetcher.get_or_generate(email, tone, regenerate=regenerate)
+    event_bus.publish("reply_generated", "reply-writer", {"email_id": email_id, "tone": tone})
     
     return {
         "status": "success",
@@ -136,7 +266,7 @@ async def generate_reply(email_id: str, tone: str = "professional"):
 async def gmail_status():
     """Check if Gmail is connected"""
     return {
-        "connected": gmail_service.is_connected(),
+        "connected": await gmail_service.is_connected(),
         "mock_mode": gmail_service.mock_mode
     }
 
@@ -1,5 +1,6 @@
 import os
 import ssl
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from dotenv import load_dotenv
@@ -59,9 +60,14 @@ async def get_db():
             await session.close()
 
 async def init_db():
-    """Initialize database tables"""
+    """Initialize database tables and apply pending migrations"""
+    from app.migrations import MIGRATION_LOCK_ID, run_migrations
+
     async with engine.begin() as conn:
+        # Held until commit, so only one process creates/migrates at a time
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
         await conn.run_sync(Base.metadata.create_all)
+        await run_migrations(conn)
     print("✅ Database tables created successfully")
 
 async def close_db():
@@ -0,0 +1,203 @@
+"""
+Migrations - Versioned schema changes applied at startup.
+
+create_all only creates missing tables, so changes to existing tables (new
+columns, new indexes) are listed here. Each migration runs once, in order,
+and is recorded in the schema_migrations table. init_db holds a Postgres
+advisory lock while migrating so concurrent workers do not race.
+
+To change the schema, update the model and append a migration with the next
+version number. Statements should be idempotent (IF NOT EXISTS) because
+create_all may already have built the object on a fresh database.
+
+Print the plans of the hot queries with:
+    python -m app.migrations --explain
+Check that each one uses the index it was given (exits 1 if not) with:
+    python -m app.migrations --check
+The same check runs in the test suite when TEST_DATABASE_URL points at a
+scratch Postgres database.
+"""
+from typing import Dict, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# Any constant shared by every process of this app
+MIGRATION_LOCK_ID = 42_0713
+
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "Send-queue lease columns on recipients", [
+        "ALTER TABLE recipients ADD COLUMN IF NOT EXISTS lease_owner VARCHAR(100)",
+        "ALTER TABLE recipients ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP WITHOUT TIME ZONE",
+        "ALTER TABLE recipients ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP WITHOUT TIME ZONE",
+        "ALTER TABLE recipients ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0",
+    ]),
+    (2, "Indexes for campaign, chat and inbox lookups", [
+        "CREATE INDEX IF NOT EXISTS ix_campaigns_created_at ON campaigns (created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_recipients_campaign_id_id ON recipients (campaign_id, id)",
+        "CREATE INDEX IF NOT EXISTS ix_recipients_campaign_id_status ON recipients (campaign_id, status)",
+        "CREATE INDEX IF NOT EXISTS ix_recipients_pending ON recipients (id) WHERE status = 'pending'",
+        "CREATE INDEX IF NOT EXISTS ix_recipients_lease_owner ON recipients (lease_owner) WHERE lease_owner IS NOT NULL",
+        "CREATE INDEX IF NOT EXISTS ix_campaign_logs_campaign_id_id ON campaign_logs (campaign_id, id)",
+        "CREATE INDEX IF NOT EXISTS ix_chat_sessions_updated_at ON chat_sessions (updated_at)",
+        "CREATE INDEX IF NOT EXISTS ix_chat_messages_session_id_timestamp ON chat_messages (session_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_chat_messages_timestamp ON chat_messages (timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_gmail_messages_internal_date ON gmail_messages (internal_date)",
+    ]),
+    (3, "Message-ID header on synced Gmail messages", [
+        "ALTER TABLE gmail_messages ADD COLUMN IF NOT EXISTS message_id_header VARCHAR(1000)",
+    ]),
+    (4, "Index for purging expired completion cache rows", [
+        "CREATE INDEX IF NOT EXISTS ix_completion_cache_created_at ON completion_cache (created_at)",
+    ]),
+]
+
+# Queries that run on every page load or send, and the index each must use;
+# used by --explain and --check
+HOT_QUERIES = {
+    "campaign list": (
+        "SELECT * FROM campaigns ORDER BY created_at DESC",
+        {"ix_campaigns_created_at"}
+    ),
+    "recipient counts": (
+        "SELECT campaign_id, status, count(*) FROM recipients "
+        "WHERE campaign_id = 'camp' GROUP BY campaign_id, status",
+        {"ix_recipients_campaign_id_status", "ix_recipients_campaign_id_id"}
+    ),
+    "recipient page": (
+        "SELECT * FROM recipients WHERE campaign_id = 'camp' AND id > 0 ORDER BY id LIMIT 100",
+        {"ix_recipients_campaign_id_id"}
+    ),
+    "send-queue claim": (
+        "SELECT recipients.id FROM recipients JOIN campaigns ON campaigns.id = recipients.campaign_id "
+        "WHERE campaigns.status = 'active' AND recipients.status = 'pending' "
+        "ORDER BY recipients.id LIMIT 20 FOR UPDATE OF recipients SKIP LOCKED",
+        {"ix_recipients_pending"}
+    ),
+    "lease heartbeat": (
+        "SELECT id FROM recipients WHERE lease_owner = 'worker' AND status = 'pending'",
+        {"ix_recipients_lease_owner"}
+    ),
+    "campaign logs": (
+        "SELECT * FROM campaign_logs WHERE campaign_id = 'camp' AND id > 0 ORDER BY id LIMIT 200",
+        {"ix_campaign_logs_campaign_id_id"}
+    ),
+    "session list": (
+        "SELECT * FROM chat_sessions ORDER BY updated_at DESC",
+        {"ix_chat_sessions_updated_at"}
+    ),
+    "session messages": (
+        "SELECT * FROM chat_messages WHERE session_id = 'session' ORDER BY timestamp",
+        {"ix_chat_messages_session_id_timestamp"}
+    ),
+    "inbox": (
+        "SELECT * FROM gmail_messages ORDER BY internal_date DESC LIMIT 20",
+        {"ix_gmail_messages_internal_date"}
+    ),
+    "completion cache purge": (
+        "SELECT key FROM completion_cache WHERE created_at < now()",
+        {"ix_completion_cache_created_at"}
+    ),
+}
+
+
+def _plan_indexes(plan: dict) -> set:
+    """Names of the indexes scanned anywhere in an EXPLAIN (FORMAT JSON) plan"""
+    found = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        found |= _plan_indexes(child)
+    return found
+
+
+async def run_migrations(conn: AsyncConnection):
+    """Apply pending migrations; the caller holds MIGRATION_LOCK_ID"""
+    await conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, "
+        "description VARCHAR(255) NOT NULL, "
+        "applied_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() at time zone 'utc'))"
+    ))
+    result = await conn.execute(text("SELECT version FROM schema_migrations"))
+    applied = set(result.scalars().all())
+
+    for version, description, statements in MIGRATIONS:
+        if version in applied:
+            continue
+        for statement in statements:
+            await conn.execute(text(statement))
+        await conn.execute(
+            text("INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"),
+            {"version": version, "description": description}
+        )
+        print(f"🗄️ Applied migration {version}: {description}")
+
+
+async def explain_hot_queries():
+    from app.database import engine
+
+    async with engine.connect() as conn:
+        for name, (query, _) in HOT_QUERIES.items():
+            result = await conn.execute(text(f"EXPLAIN {query}"))
+            print(f"-- {name}")
+            for line in result.scalars().all():
+                print(f"   {line}")
+    await engine.dispose()
+
+
+async def hot_query_indexes(conn: AsyncConnection) -> Dict[str, set]:
+    """Indexes each hot query's plan uses.
+
+    Sequential scans are disabled while planning, so the answer is the same
+    on an empty development database as on a full one: a query that still
+    cannot use its index has no usable index at all.
+    """
+    import json
+
+    used = {}
+    for name, (query, _) in HOT_QUERIES.items():
+        transaction = await conn.begin()
+        try:
+            await conn.execute(text("SET LOCAL enable_seqscan = off"))
+            result = await conn.execute(text(f"EXPLAIN (FORMAT JSON) {query}"))
+            plan = result.scalar()
+        finally:
+            await transaction.rollback()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        used[name] = _plan_indexes(plan[0]["Plan"])
+    return used
+
+
+async def check_hot_queries() -> bool:
+    """Check that every hot query's plan uses its index (see hot_query_indexes)"""
+    from app.database import engine
+
+    ok = True
+    async with engine.connect() as conn:
+        plans = await hot_query_indexes(conn)
+        for name, (_, indexes) in HOT_QUERIES.items():
+            used = plans[name]
+            if used & indexes:
+                print(f"ok    {name}: {', '.join(sorted(used & indexes))}")
+            else:
+                ok = False
+                print(f"FAIL  {name}: expected {' or '.join(sorted(indexes))}, plan uses {sorted(used) or 'no index'}")
+    await engine.dispose()
+    return ok
+
+
+if __name__ == "__main__":
+    import sys
+    import asyncio
+
+    if "--explain" in sys.argv:
+        asyncio.run(explain_hot_queries())
+    elif "--check" in sys.argv:
+        sys.exit(0 if asyncio.run(check_hot_queries()) else 1)
+    else:
+        from app.database import init_db, close_db
+
+        async def main():
+            await init_db()
+            await close_db()
+
+        asyncio.run(main())
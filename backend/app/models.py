@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import List, Optional
-from sqlalchemy import String, Text, Integer, DateTime, ForeignKey, JSON, Enum as SQLEnum
+from sqlalchemy import String, Text, Integer, BigInteger, Boolean, DateTime, ForeignKey, JSON, Index, text, Enum as SQLEnum
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 import enum
 
@@ -22,6 +22,9 @@ class RecipientStatus(str, enum.Enum):
 
 class Campaign(Base):
     __tablename__ = "campaigns"
+    __table_args__ = (
+        Index("ix_campaigns_created_at", "created_at"),
+    )
 
     id: Mapped[str] = mapped_column(String(50), primary_key=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -65,9 +68,38 @@ class Campaign(Base):
             "logs": [l.to_dict() for l in self.logs]
         }
 
+    def to_summary_dict(self, recipient_counts: Optional[dict] = None):
+        """Campaign columns plus recipient counts by status, without loading children"""
+        counts = {"total": 0, "pending": 0, "sent": 0, "failed": 0}
+        counts.update(recipient_counts or {})
+        return {
+            "id": self.id,
+            "name": self.name,
+            "description": self.description,
+            "subject": self.subject,
+            "template": self.template,
+            "tone": self.tone,
+            "type": self.type,
+            "status": self.status,
+            "sent": self.sent,
+            "opened": self.opened,
+            "clicked": self.clicked,
+            "failed": self.failed,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "recipient_counts": counts
+        }
+
 
 class Recipient(Base):
     __tablename__ = "recipients"
+    __table_args__ = (
+        # Per-campaign pages, counts by status and bulk deletes
+        Index("ix_recipients_campaign_id_id", "campaign_id", "id"),
+        Index("ix_recipients_campaign_id_status", "campaign_id", "status"),
+        # Send-queue claims scan pending rows in id order
+        Index("ix_recipients_pending", "id", postgresql_where=text("status = 'pending'")),
+        Index("ix_recipients_lease_owner", "lease_owner", postgresql_where=text("lease_owner IS NOT NULL")),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     campaign_id: Mapped[str] = mapped_column(String(50), ForeignKey("campaigns.id"), nullable=False)
@@ -76,6 +108,11 @@ class Recipient(Base):
     status: Mapped[str] = mapped_column(String(20), default="pending")
     sent_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # Send-queue lease: the worker that claimed this row and until when
+    lease_owner: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    lease_expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
 
     # Relationship
     campaign: Mapped["Campaign"] = relationship("Campaign", back_populates="recipients")
@@ -92,6 +129,9 @@ class Recipient(Base):
 
 class CampaignLog(Base):
     __tablename__ = "campaign_logs"
+    __table_args__ = (
+        Index("ix_campaign_logs_campaign_id_id", "campaign_id", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     campaign_id: Mapped[str] = mapped_column(String(50), ForeignKey("campaigns.id"), nullable=False)
@@ -111,6 +151,9 @@ class CampaignLog(Base):
 class ChatSession(Base):
     """Model for chat sessions/conversations"""
     __tablename__ = "chat_sessions"
+    __table_args__ = (
+        Index("ix_chat_sessions_updated_at", "updated_at"),
+    )
 
     id: Mapped[str] = mapped_column(String(50), primary_key=True)
     title: Mapped[str] = mapped_column(String(255), default="New Chat")
@@ -129,6 +172,10 @@ class ChatSession(Base):
 class ChatMessage(Base):
     """Model for persisting chat history"""
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        Index("ix_chat_messages_session_id_timestamp", "session_id", "timestamp"),
+        Index("ix_chat_messages_timestamp", "timestamp"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     session_id: Mapped[Optional[str]] = mapped_column(String(50), ForeignKey("chat_sessions.id"), nullable=True)
@@ -147,6 +194,35 @@ class ChatMessage(Base):
 
 
 
+class ChatSessionState(Base):
+    """Conversation state of a chat session (last viewed email, compose draft, mode)"""
+    __tablename__ = "chat_session_states"
+
+    session_id: Mapped[str] = mapped_column(String(50), primary_key=True)
+    data: Mapped[str] = mapped_column(Text, nullable=False)  # JSON
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class GmailCredentials(Base):
+    """OAuth credentials of the connected Gmail account, shared by every worker"""
+    __tablename__ = "gmail_credentials"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    data: Mapped[str] = mapped_column(Text, nullable=False)  # Credentials.to_json()
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class AgentStatus(Base):
+    """Last reported status of a dashboard agent, shared by every worker"""
+    __tablename__ = "agent_statuses"
+
+    agent_id: Mapped[str] = mapped_column(String(50), primary_key=True)
+    status: Mapped[str] = mapped_column(String(20), nullable=False)
+    progress: Mapped[int] = mapped_column(Integer, default=0)
+    current_task: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class UserSettings(Base):
     """Model for storing user settings including name"""
     __tablename__ = "user_settings"
@@ -184,3 +260,85 @@ class SentEmail(Base):
             "reply_content": self.reply_content,
             "sent_at": self.sent_at.isoformat() if self.sent_at else None
         }
+
+
+class GmailMessage(Base):
+    """Local copy of inbox messages, kept current via Gmail history sync"""
+    __tablename__ = "gmail_messages"
+    __table_args__ = (
+        Index("ix_gmail_messages_internal_date", "internal_date"),
+    )
+
+    id: Mapped[str] = mapped_column(String(255), primary_key=True)  # Gmail message ID
+    thread_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    # RFC 822 Message-ID header, for In-Reply-To when replying
+    message_id_header: Mapped[Optional[str]] = mapped_column(String(1000), nullable=True)
+    subject: Mapped[Optional[str]] = mapped_column(String(1000), nullable=True)
+    sender: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    date: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    snippet: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    body: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    category: Mapped[str] = mapped_column(String(50), default="personal")
+    priority: Mapped[str] = mapped_column(String(20), default="medium")
+    unread: Mapped[bool] = mapped_column(Boolean, default=False)
+    internal_date: Mapped[int] = mapped_column(BigInteger, default=0)  # ms since epoch, used for ordering
+    synced_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @classmethod
+    def from_email(cls, email: dict) -> "GmailMessage":
+        return cls(
+            id=email["id"],
+            thread_id=email.get("thread_id"),
+            message_id_header=email.get("message_id"),
+            subject=email.get("subject"),
+            sender=email.get("from"),
+            date=email.get("date"),
+            snippet=email.get("snippet"),
+            body=email.get("body"),
+            category=email.get("category", "personal"),
+            priority=email.get("priority", "medium"),
+            unread=email.get("unread", False),
+            internal_date=email.get("internal_date", 0)
+        )
+
+    def to_dict(self):
+        # Same shape as GmailService.fetch_emails
+        return {
+            "id": self.id,
+            "thread_id": self.thread_id,
+            "message_id": self.message_id_header,
+            "internal_date": self.internal_date,
+            "subject": self.subject,
+            "from": self.sender,
+            "date": self.date,
+            "snippet": self.snippet,
+            "category": self.category,
+            "priority": self.priority,
+            "unread": self.unread,
+            "body": self.body
+        }
+
+
+class CompletionCacheEntry(Base):
+    """Persistent tier of the LLM completion cache"""
+    __tablename__ = "completion_cache"
+    __table_args__ = (
+        Index("ix_completion_cache_created_at", "created_at"),
+    )
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)  # sha256 of the normalized payload
+    value: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class PrefetchedDraft(Base):
+    """Reply draft written ahead of time by the draft prefetcher, shared by every worker"""
+    __tablename__ = "prefetched_drafts"
+    __table_args__ = (
+        Index("ix_prefetched_drafts_created_at", "created_at"),
+    )
+
+    email_id: Mapped[str] = mapped_column(String(255), primary_key=True)  # Gmail message ID
+    tone: Mapped[str] = mapped_column(String(50), primary_key=True)
+    draft: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
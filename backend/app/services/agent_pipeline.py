@@ -0,0 +1,316 @@
+"""
+Agent Pipeline - The dashboard agents as real processing stages.
+
+    coordinator -> email-reader -> summarizer -> reply-writer
+
+The coordinator lists the inbox and queues message ids in chunks, the email
+reader fetches each chunk with one batch request, the summarizer summarizes
+every email and the reply writer drafts replies to the ones that need one
+(stored with the prefetched drafts, see draft_prefetcher).
+Each stage is a pool of asyncio workers (PIPELINE_<STAGE>_CONCURRENCY) fed by
+a bounded queue (PIPELINE_QUEUE_SIZE), so a slow stage makes the stage before
+it wait instead of piling work up in memory.
+
+While jobs are running, each agent's dashboard status is derived from its
+stage's queue depth, busy workers and throughput.
+"""
+import os
+import time
+import uuid
+import asyncio
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.ai_service import ai_service
+from app.services.gmail_service import gmail_service, GMAIL_BATCH_SIZE
+from app.services.agent_status_service import agent_status_service
+from app.services.event_bus import event_bus
+from app.services.draft_prefetcher import draft_prefetcher, NO_REPLY_CATEGORIES
+
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "100"))
+PIPELINE_MAX_EMAILS = int(os.getenv("PIPELINE_MAX_EMAILS", "1000"))
+# Jobs kept for GET /agents/pipeline/jobs/{id}
+PIPELINE_MAX_JOBS = int(os.getenv("PIPELINE_MAX_JOBS", "10"))
+PIPELINE_STATUS_INTERVAL = float(os.getenv("PIPELINE_STATUS_INTERVAL", "1"))
+# Seconds over which stage throughput is measured
+THROUGHPUT_WINDOW = 60
+
+
+class PipelineJob:
+    def __init__(self, max_emails: int, tone: str, draft_replies: bool):
+        self.id = uuid.uuid4().hex[:12]
+        self.max_emails = max_emails
+        self.tone = tone
+        self.draft_replies = draft_replies
+        # Unknown until the coordinator has listed the inbox
+        self.total: Optional[int] = None
+        self.fetched = 0
+        self.summarized = 0
+        self.drafted = 0
+        self.done = 0
+        self.failed = 0
+        self.error: Optional[str] = None
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.started_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+
+    @property
+    def running(self) -> bool:
+        return self.finished_at is None
+
+    def to_dict(self, include_results: bool = False) -> Dict[str, Any]:
+        data = {
+            "id": self.id,
+            "status": "running" if self.running else ("failed" if self.error else "completed"),
+            "total": self.total,
+            "fetched": self.fetched,
+            "summarized": self.summarized,
+            "drafted": self.drafted,
+            "done": self.done,
+            "failed": self.failed,
+            "error": self.error,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+        if include_results:
+            data["results"] = list(self.results.values())
+        return data
+
+
+class Stage:
+    """A pool of workers taking (job, item) pairs from one bounded queue"""
+
+    def __init__(self, agent_id: str, concurrency: int, handler, on_error, item_size=lambda item: 1):
+        self.agent_id = agent_id
+        self.concurrency = concurrency
+        self.handler = handler
+        self.on_error = on_error
+        self.item_size = item_size
+        self.queue: asyncio.Queue = asyncio.Queue(PIPELINE_QUEUE_SIZE)
+        self.busy = 0
+        self.processed = 0
+        self.failed = 0
+        # (finished at, emails) for throughput
+        self._finished: deque = deque()
+        self._workers: List[asyncio.Task] = []
+
+    def start(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _work(self):
+        while True:
+            job, item = await self.queue.get()
+            self.busy += 1
+            try:
+                await self.handler(job, item)
+                self.processed += self.item_size(item)
+            except Exception as e:
+                print(f"Pipeline {self.agent_id} error: {e}")
+                self.failed += self.item_size(item)
+                self.on_error(job, item, self.item_size(item))
+            finally:
+                self.busy -= 1
+                self._finished.append((time.monotonic(), self.item_size(item)))
+                self.queue.task_done()
+
+    def throughput(self) -> float:
+        """Emails per second over the last THROUGHPUT_WINDOW seconds"""
+        cutoff = time.monotonic() - THROUGHPUT_WINDOW
+        while self._finished and self._finished[0][0] < cutoff:
+            self._finished.popleft()
+        return sum(n for _, n in self._finished) / THROUGHPUT_WINDOW
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "queued": self.queue.qsize(),
+            "busy": self.busy,
+            "processed": self.processed,
+            "failed": self.failed,
+            "per_second": round(self.throughput(), 2)
+        }
+
+
+class AgentPipeline:
+    def __init__(self):
+        def failed(job, item, size):
+            self._finish(job, size, failed=True)
+
+        self.reader = Stage(
+            "email-reader", int(os.getenv("PIPELINE_READER_CONCURRENCY", "4")),
+            self._read, failed, item_size=len
+        )
+        self.summarizer = Stage(
+            "summarizer", int(os.getenv("PIPELINE_SUMMARIZER_CONCURRENCY", "8")), self._summarize, failed
+        )
+        self.writer = Stage(
+            "reply-writer", int(os.getenv("PIPELINE_WRITER_CONCURRENCY", "8")), self._draft, failed
+        )
+        self.stages = [self.reader, self.summarizer, self.writer]
+        self._jobs: "OrderedDict[str, PipelineJob]" = OrderedDict()
+        self._tasks = set()
+        self._reporter: Optional[asyncio.Task] = None
+
+    async def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    async def stop(self):
+        for task in list(self._tasks) + ([self._reporter] if self._reporter else []):
+            task.cancel()
+        for stage in self.stages:
+            await stage.stop()
+
+    async def submit(self, max_emails: int = 100, tone: str = "professional", draft_replies: bool = True) -> PipelineJob:
+        """Start processing the newest max_emails inbox emails; returns at once"""
+        await self.start()
+        job = PipelineJob(min(max_emails, PIPELINE_MAX_EMAILS), tone, draft_replies)
+        self._jobs[job.id] = job
+        while len(self._jobs) > PIPELINE_MAX_JOBS:
+            oldest = next((j for j in self._jobs.values() if not j.running), None)
+            if oldest is None:
+                break
+            del self._jobs[oldest.id]
+
+        task = asyncio.create_task(self._ingest(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        if self._reporter is None or self._reporter.done():
+            self._reporter = asyncio.create_task(self._report_status())
+        event_bus.publish("pipeline_started", "coordinator", {"job_id": job.id, "max_emails": job.max_emails})
+        return job
+
+    def get_job(self, job_id: str) -> Optional[PipelineJob]:
+        return self._jobs.get(job_id)
+
+    async def _ingest(self, job: PipelineJob):
+        """Coordinator: list the inbox and hand message ids to the reader in chunks"""
+        try:
+            await gmail_service.sync_shared_credentials()
+            if gmail_service.mock_mode:
+                message_ids = [e["id"] for e in await gmail_service.fetch_emails()][:job.max_emails]
+            elif await gmail_service.is_connected():
+                message_ids = await gmail_service.list_message_ids(max_results=job.max_emails)
+            else:
+                raise RuntimeError("Gmail is not connected")
+        except Exception as e:
+            print(f"Pipeline coordinator error: {e}")
+            job.error = str(e)
+            job.total = 0
+            self._finish(job, 0)
+            return
+
+        job.total = len(message_ids)
+        for i in range(0, len(message_ids), GMAIL_BATCH_SIZE):
+            # Waits here while the reader is behind
+            await self.reader.queue.put((job, message_ids[i:i + GMAIL_BATCH_SIZE]))
+        # An empty inbox finishes right away
+        self._finish(job, 0)
+
+    async def _read(self, job: PipelineJob, message_ids: List[str]):
+        await gmail_service.sync_shared_credentials()
+        if gmail_service.mock_mode:
+            emails = [e for e in await gmail_service.fetch_emails() if e["id"] in message_ids]
+        else:
+            emails = await gmail_service.fetch_messages(message_ids)
+        if len(emails) < len(message_ids):
+            self._finish(job, len(message_ids) - len(emails), failed=True)
+        job.fetched += len(emails)
+        for email in emails:
+            await self.summarizer.queue.put((job, email))
+
+    async def _summarize(self, job: PipelineJob, email: Dict[str, Any]):
+        summary = await ai_service.summarize_email(
+            email.get("subject", ""),
+            email.get("body") or email.get("snippet", ""),
+            email.get("from", "")
+        )
+        job.results[email["id"]] = {
+            "id": email["id"],
+            "subject": email.get("subject"),
+            "from": email.get("from"),
+            "category": email.get("category"),
+            "priority": email.get("priority"),
+            "summary": summary,
+            "draft": None
+        }
+        job.summarized += 1
+        if job.draft_replies and email.get("category") not in NO_REPLY_CATEGORIES:
+            await self.writer.queue.put((job, email))
+        else:
+            self._finish(job, 1)
+
+    async def _draft(self, job: PipelineJob, email: Dict[str, Any]):
+        job.results[email["id"]]["draft"] = await draft_prefetcher.get_or_generate(email, job.tone)
+        job.drafted += 1
+        self._finish(job, 1)
+
+    def _finish(self, job: PipelineJob, count: int, failed: bool = False):
+        """Record emails that left the pipeline; closes the job once all have"""
+        job.done += count
+        if failed:
+            job.failed += count
+        if job.running and job.total is not None and job.done >= job.total:
+            job.finished_at = datetime.utcnow()
+            event_bus.publish("pipeline_completed", "coordinator", job.to_dict())
+
+    def _derived_status(self) -> Dict[str, Tuple[str, str, int]]:
+        """(status, current task, progress) per agent, from the stages and running jobs"""
+        running = [job for job in self._jobs.values() if job.running]
+        total = sum(job.total or 0 for job in running)
+
+        def percent(count: int) -> int:
+            return int(100 * count / total) if total else 0
+
+        status = {
+            "coordinator": (
+                ("working", f"{len(running)} job(s) running", percent(sum(job.done for job in running)))
+                if running else ("idle", "Waiting for workflow", 0)
+            )
+        }
+        done_by_stage = {
+            "email-reader": sum(job.fetched for job in running),
+            "summarizer": sum(job.summarized for job in running),
+            "reply-writer": sum(job.drafted for job in running)
+        }
+        for stage in self.stages:
+            queued = stage.queue.qsize()
+            if stage.busy or queued:
+                status[stage.agent_id] = (
+                    "working",
+                    f"{stage.busy}/{stage.concurrency} busy, {queued} queued, {stage.throughput():.1f}/s",
+                    percent(done_by_stage[stage.agent_id])
+                )
+            else:
+                status[stage.agent_id] = ("idle", "Idle", percent(done_by_stage[stage.agent_id]))
+        return status
+
+    async def _report_status(self):
+        """Push derived agent status to the dashboard until no job is running"""
+        last: Dict[str, Tuple[str, str, int]] = {}
+        while True:
+            await asyncio.sleep(PIPELINE_STATUS_INTERVAL)
+            for agent_id, status in self._derived_status().items():
+                if last.get(agent_id) != status:
+                    last[agent_id] = status
+                    await agent_status_service.update(agent_id, *status)
+            if not any(job.running for job in self._jobs.values()):
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "stages": {stage.agent_id: stage.stats() for stage in self.stages},
+            "jobs": [job.to_dict() for job in reversed(self._jobs.values())]
+        }
+
+
+# Singleton instance
+agent_pipeline = AgentPipeline()
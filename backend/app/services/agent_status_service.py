@@ -0,0 +1,79 @@
+"""
+Agent Status Service - What each dashboard agent is doing right now.
+
+AGENT_STATUS_BACKEND=memory keeps status in this process. With
+AGENT_STATUS_BACKEND=db (the default when WEB_CONCURRENCY is above 1) every
+update is also written to the agent_statuses table, so /agents/status and the
+event stream show work done by any worker process.
+
+Every update is also published on the event bus as an "agent_status" event.
+"""
+import os
+import copy
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy import select
+
+from app.database import async_session_maker
+from app.models import AgentStatus
+from app.services.event_bus import event_bus
+
+DEFAULT_AGENTS = [
+    {"agent_id": "coordinator", "name": "Coordinator Agent", "role": "Orchestrator", "status": "idle", "progress": 0, "logs": [], "current_task": "Waiting for workflow"},
+    {"agent_id": "email-reader", "name": "Email Reader", "role": "Ingestion", "status": "idle", "progress": 0, "logs": [], "current_task": "Idle"},
+    {"agent_id": "summarizer", "name": "Summarizer Agent", "role": "Analysis", "status": "idle", "progress": 0, "logs": [], "current_task": "Idle"},
+    {"agent_id": "reply-writer", "name": "Reply Writer", "role": "Generation", "status": "idle", "progress": 0, "logs": [], "current_task": "Idle"},
+]
+
+
+class AgentStatusService:
+    def __init__(self):
+        default_backend = "db" if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 else "memory"
+        self.backend = os.getenv("AGENT_STATUS_BACKEND", default_backend).lower()
+        self._agents: Dict[str, Dict[str, Any]] = {
+            agent["agent_id"]: copy.deepcopy(agent) for agent in DEFAULT_AGENTS
+        }
+
+    async def update(self, agent_id: str, status: str, current_task: str, progress: int):
+        agent = self._agents[agent_id]
+        agent.update(status=status, current_task=current_task, progress=progress)
+        event_bus.publish("agent_status", agent_id, {
+            "agent_id": agent_id,
+            "status": status,
+            "current_task": current_task,
+            "progress": progress
+        })
+        if self.backend == "db":
+            try:
+                async with async_session_maker() as session:
+                    await session.merge(AgentStatus(
+                        agent_id=agent_id,
+                        status=status,
+                        progress=progress,
+                        current_task=current_task,
+                        updated_at=datetime.utcnow()
+                    ))
+                    await session.commit()
+            except Exception as e:
+                print(f"Error saving agent status: {e}")
+
+    async def list(self) -> List[Dict[str, Any]]:
+        if self.backend == "db":
+            try:
+                async with async_session_maker() as session:
+                    result = await session.execute(select(AgentStatus))
+                    for row in result.scalars().all():
+                        if row.agent_id in self._agents:
+                            self._agents[row.agent_id].update(
+                                status=row.status,
+                                progress=row.progress,
+                                current_task=row.current_task
+                            )
+            except Exception as e:
+                print(f"Error loading agent status: {e}")
+        return [copy.deepcopy(agent) for agent in self._agents.values()]
+
+
+# Singleton instance
+agent_status_service = AgentStatusService()
@@ -1,20 +1,248 @@
 import os
+import json
+import time
+import asyncio
 import aiohttp
-from typing import Optional
+from typing import Optional, Tuple, AsyncIterator
 from dotenv import load_dotenv
 
+from app.services.completion_cache import completion_cache
+from app.services.singleflight import SingleFlight
+from app.services.metrics import AdaptiveDeadline
+from app.services.circuit_breaker import CircuitBreaker
+
 load_dotenv()
 
+# Max open connections to the completions API (shared across all requests)
+AI_HTTP_POOL_SIZE = int(os.getenv("AI_HTTP_POOL_SIZE", "20"))
+# Seconds an idle keep-alive connection stays in the pool
+AI_HTTP_KEEPALIVE = float(os.getenv("AI_HTTP_KEEPALIVE", "60"))
+# Consecutive failures (timeouts, connection errors, 429/5xx) that open the circuit
+AI_BREAKER_FAILURES = int(os.getenv("AI_BREAKER_FAILURES", "5"))
+# Seconds the circuit stays open before one probe request is let through
+AI_BREAKER_RECOVERY = float(os.getenv("AI_BREAKER_RECOVERY", "30"))
+# Per-call deadlines adapt to AI_DEADLINE_FACTOR x p99 latency of that call,
+# kept within [AI_DEADLINE_MIN, AI_DEADLINE_MAX]; DEFAULT_DEADLINES apply
+# until enough calls have been seen
+AI_DEADLINE_MIN = float(os.getenv("AI_DEADLINE_MIN", "5"))
+AI_DEADLINE_MAX = float(os.getenv("AI_DEADLINE_MAX", "60"))
+AI_DEADLINE_FACTOR = float(os.getenv("AI_DEADLINE_FACTOR", "2"))
+DEFAULT_DEADLINES = {
+    "reply": 30,
+    "new_email": 30,
+    "summary": 15,
+    "plan": 30,
+    "chat": 30,
+    "chat_context": 45,
+    # Streaming: until the first token arrives
+    "first_token": 15
+}
+# Seconds a stream may go quiet between tokens
+AI_STREAM_IDLE_TIMEOUT = float(os.getenv("AI_STREAM_IDLE_TIMEOUT", "30"))
+
 class AIService:
     def __init__(self):
         self.api_key = os.getenv("ZAI_API_KEY")
-        self.base_url = "https://api.z.ai/api/coding/paas/v4"
+        self.base_url = os.getenv("ZAI_BASE_URL", "https://api.z.ai/api/coding/paas/v4")
         self.model = os.getenv("ZAI_MODEL", "GLM-4.7")
+        self._session: Optional[aiohttp.ClientSession] = None
+        # De-duplicates identical completions that are in flight at the same time
+        self._singleflight = SingleFlight()
+        # Fails fast (callers fall back to templates) while the API is down
+        self.breaker = CircuitBreaker("Z.AI", AI_BREAKER_FAILURES, AI_BREAKER_RECOVERY)
+        self.deadlines = {
+            method: AdaptiveDeadline(default, AI_DEADLINE_MIN, AI_DEADLINE_MAX, AI_DEADLINE_FACTOR)
+            for method, default in DEFAULT_DEADLINES.items()
+        }
+        # Time from request to first streamed token
+        self.ttft = self.deadlines["first_token"].latency
+        self.timeouts = 0
+
+    async def start(self):
+        """Open the shared HTTP session (called from the app lifespan)"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=AI_HTTP_POOL_SIZE,
+                keepalive_timeout=AI_HTTP_KEEPALIVE,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+
+    async def close(self):
+        """Close the shared HTTP session and its pooled connections"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def stats(self) -> dict:
+        return {
+            "cache": completion_cache.stats(),
+            "singleflight": self._singleflight.stats(),
+            "time_to_first_token": self.ttft.stats(),
+            "circuit": self.breaker.stats(),
+            "timeouts": self.timeouts,
+            "deadlines": {method: deadline.stats() for method, deadline in self.deadlines.items()}
+        }
+
+    async def _post_completion(self, payload: dict, method: str, cache: bool = False, regenerate: bool = False,
+                               coalesce: bool = False) -> Tuple[int, str]:
+        """POST to the chat completions endpoint over the pooled session.
+
+        method picks the adaptive deadline (see DEFAULT_DEADLINES). Raises
+        CircuitOpenError without calling the API while the circuit is open.
+
+        With cache=True, successful completions are served from and stored in
+        the completion cache; regenerate=True skips the lookup but still
+        refreshes the stored entry. With coalesce=True, concurrent identical
+        payloads share a single upstream call; regenerations only share one
+        with other regenerations.
+        """
+        if not cache and not coalesce:
+            return await self._request_completion(payload, method)
+        
+        key = completion_cache.make_key(payload)
+        if cache and not regenerate:
+            cached = await completion_cache.get(key)
+            if cached is not None:
+                return 200, cached
+        
+        async def request():
+            status, response_text = await self._request_completion(payload, method)
+            if cache and status == 200 and self._has_content(response_text):
+                await completion_cache.set(key, response_text)
+            return status, response_text
+        
+        if coalesce:
+            # A regeneration must not join a call started for the draft it replaces
+            return await self._singleflight.do(f"{key}:regenerate" if regenerate else key, request)
+        return await request()
+
+    @staticmethod
+    def _has_content(response_text: str) -> bool:
+        try:
+            data = json.loads(response_text)
+            return bool(data["choices"][0]["message"]["content"])
+        except (ValueError, KeyError, IndexError, TypeError):
+            return False
+
+    @staticmethod
+    def _upstream_failed(status: int) -> bool:
+        """Statuses that say the API is unhealthy, rather than the request bad"""
+        return status == 429 or status >= 500
+
+    async def _request_completion(self, payload: dict, method: str) -> Tuple[int, str]:
+        if self._session is None or self._session.closed:
+            # Used outside the app lifespan (scripts, tests)
+            await self.start()
+        
+        self.breaker.before_call()
+        deadline = self.deadlines[method]
+        started = time.monotonic()
+        try:
+            async with self._session.post(
+                f"{self.base_url}/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=deadline.seconds())
+            ) as response:
+                status, response_text = response.status, await response.text()
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except asyncio.TimeoutError as e:
+            self.timeouts += 1
+            self.breaker.on_failure()
+            raise asyncio.TimeoutError(f"Z.AI {method} request timed out after {time.monotonic() - started:.1f}s") from e
+        except Exception:
+            self.breaker.on_failure()
+            raise
+        
+        if self._upstream_failed(status):
+            self.breaker.on_failure()
+        else:
+            self.breaker.on_success()
+            if status == 200:
+                deadline.observe(time.monotonic() - started)
+        return status, response_text
 
-    async def generate_email_reply(self, email_subject: str, email_body: str, sender: str, tone: str = "professional") -> str:
-        """Generate an AI reply to an email using Z.AI"""
+    async def _stream_completion(self, payload: dict) -> AsyncIterator[str]:
+        """Yield content deltas from the completions endpoint in stream mode"""
+        if self._session is None or self._session.closed:
+            await self.start()
         
-        # Extract sender's first name from email (e.g., "John Doe <john@example.com>" -> "John")
+        self.breaker.before_call()
+        first_token_deadline = self.deadlines["first_token"]
+        started = time.monotonic()
+        first_token = True
+        # Whether the breaker has been told how this call went
+        settled = False
+
+        def until_first_token() -> float:
+            # The first token's deadline counts from the request, headers included
+            return max(0.0, first_token_deadline.seconds() - (time.monotonic() - started))
+
+        try:
+            response = await asyncio.wait_for(self._session.post(
+                f"{self.base_url}/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={**payload, "stream": True},
+                timeout=aiohttp.ClientTimeout(total=None)
+            ), until_first_token())
+            async with response:
+                if response.status != 200:
+                    response_text = await asyncio.wait_for(response.text(), until_first_token())
+                    if not self._upstream_failed(response.status):
+                        self.breaker.on_success()
+                        settled = True
+                    raise RuntimeError(f"AI API Error: {response.status} - {response_text[:200]}")
+                
+                # Server-sent events: one "data: {...}" line per chunk
+                lines = response.content.__aiter__()
+                while True:
+                    timeout = until_first_token() if first_token else AI_STREAM_IDLE_TIMEOUT
+                    try:
+                        raw_line = await asyncio.wait_for(lines.__anext__(), timeout)
+                    except StopAsyncIteration:
+                        break
+                    line = raw_line.decode("utf-8").strip()
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    
+                    choices = json.loads(data).get("choices") or [{}]
+                    delta = choices[0].get("delta", {}).get("content")
+                    if delta:
+                        if first_token:
+                            first_token_deadline.observe(time.monotonic() - started)
+                            first_token = False
+                            self.breaker.on_success()
+                            settled = True
+                        yield delta
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.breaker.on_failure()
+            settled = True
+            raise RuntimeError("AI stream timed out " + ("before the first token" if first_token else "between tokens"))
+        except Exception:
+            if not settled:
+                self.breaker.on_failure()
+                settled = True
+            raise
+        finally:
+            if not settled:
+                # Finished without a token, or the consumer stopped listening
+                self.breaker.release()
+
+    def _sender_first_name(self, sender: str) -> str:
+        """Extract sender's first name from email (e.g., "John Doe <john@example.com>" -> "John")"""
         import re
         sender_name = "there"  # Default fallback
         
@@ -33,10 +261,12 @@ class AIService:
                 # Capitalize first letter of email prefix
                 sender_name = email_prefix.split('.')[0].capitalize()
         
-        # Tone-specific fallback templates
-        def get_fallback_response(tone: str) -> str:
-            templates = {
-                "professional": f"""Hi {sender_name},
+        return sender_name
+
+    def _fallback_reply(self, sender_name: str, email_subject: str, tone: str) -> str:
+        """Tone-specific fallback templates"""
+        templates = {
+            "professional": f"""Hi {sender_name},
 
 Thank you for your email regarding "{email_subject}". I have reviewed your message and appreciate you reaching out.
 
@@ -44,7 +274,7 @@ I will look into this matter and get back to you with a detailed response at my
 
 Best regards,
 Abhishek""",
-                "friendly": f"""Hey {sender_name}! 👋
+            "friendly": f"""Hey {sender_name}! 👋
 
 Thanks so much for your email about "{email_subject}"! Really appreciate you getting in touch.
 
@@ -52,7 +282,7 @@ I'm on it and will circle back to you soon with more details. Looking forward to
 
 Cheers,
 Abhishek""",
-                "urgent": f"""Hi {sender_name},
+            "urgent": f"""Hi {sender_name},
 
 I've received your urgent email regarding "{email_subject}" and understand the time-sensitive nature of this matter.
 
@@ -60,7 +290,7 @@ I am prioritizing this immediately and will respond with the necessary informati
 
 Best regards,
 Abhishek""",
-                "casual": f"""Hey {sender_name},
+            "casual": f"""Hey {sender_name},
 
 Got your email about "{email_subject}" - thanks for reaching out!
 
@@ -68,8 +298,26 @@ I'll take a look and get back to you soon. No worries!
 
 Talk soon,
 Abhishek"""
-            }
-            return templates.get(tone, templates["professional"])
+        }
+        return templates.get(tone, templates["professional"])
+
+    def _reply_payload(self, email_subject: str, email_body: str, sender: str, tone: str) -> dict:
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "user", "content": f"Write a short {tone} email reply to this email. From: {sender}, Subject: {email_subject}, Body: {email_body[:500]}. Sign as Abhishek. OUTPUT ONLY THE REPLY BODY. NO SUBJECT LINE. NO PLACEHOLDERS."}
+            ],
+            "temperature": 0.7,
+            "max_tokens": 2000
+        }
+
+    async def generate_email_reply(self, email_subject: str, email_body: str, sender: str, tone: str = "professional", regenerate: bool = False) -> str:
+        """Generate an AI reply to an email using Z.AI (cached unless regenerate=True)"""
+        
+        sender_name = self._sender_first_name(sender)
+        
+        def get_fallback_response(tone: str) -> str:
+            return self._fallback_reply(sender_name, email_subject, tone)
         
         if not self.api_key:
             return get_fallback_response(tone)
@@ -91,44 +339,34 @@ IMPORTANT: Output ONLY the email body. Do not include subject lines, placeholder
             print(f"Calling Z.AI API with model: {self.model}")
             print(f"API Key present: {bool(self.api_key)}")
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "messages": [
-                            {"role": "user", "content": f"Write a short {tone} email reply to this email. From: {sender}, Subject: {email_subject}, Body: {email_body[:500]}. Sign as Abhishek. OUTPUT ONLY THE REPLY BODY. NO SUBJECT LINE. NO PLACEHOLDERS."}
-                        ],
-                        "temperature": 0.7,
-                        "max_tokens": 2000
-                    }
-                ) as response:
-                    response_text = await response.text()
-                    print(f"Z.AI Response status: {response.status}")
-                    print(f"Z.AI Response body: {response_text[:500]}")
-                    
-                    if response.status == 200:
-                        import json
-                        data = json.loads(response_text)
-                        content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
-                        if content:
-                            return content.strip()
-                        else:
-                            print("WARNING: AI returned empty content, using fallback")
-                            return get_fallback_response(tone)
-                    else:
-                        print(f"AI API Error: {response.status} - {response_text[:200]}")
-                        return get_fallback_response(tone)
+            status, response_text = await self._post_completion(
+                self._reply_payload(email_subject, email_body, sender, tone), "reply",
+                cache=True, regenerate=regenerate, coalesce=True
+            )
+            print(f"Z.AI Response status: {status}")
+            print(f"Z.AI Response body: {response_text[:500]}")
+            
+            if status == 200:
+                data = json.loads(response_text)
+                content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
+                if content:
+                    return content.strip()
+                else:
+                    print("WARNING: AI returned empty content, using fallback")
+                    return get_fallback_response(tone)
+            else:
+                print(f"AI API Error: {status} - {response_text[:200]}")
+                return get_fallback_response(tone)
         except Exception as e:
             print(f"AI Generation Error: {e}")
             return get_fallback_response(tone)
 
-    async def generate_new_email(self, recipient: str, subject: str, context: str, tone: str = "professional") -> dict:
-        """Generate a new email draft (Subject + Body)"""
+    def is_fallback_reply(self, reply: str, email_subject: str, sender: str, tone: str = "professional") -> bool:
+        """Whether generate_email_reply gave its template because the model was unavailable"""
+        return reply == self._fallback_reply(self._sender_first_name(sender), email_subject, tone)
+
+    async def generate_new_email(self, recipient: str, subject: str, context: str, tone: str = "professional", regenerate: bool = False) -> dict:
+        """Generate a new email draft (Subject + Body), cached unless regenerate=True"""
         
         # Extract name if possible
         import re
@@ -150,31 +388,51 @@ IMPORTANT: Output ONLY the email body. Do not include subject lines, placeholder
              return fallback_response
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/chat/completions",
-                    headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
-                    json={
-                        "model": self.model,
-                        "messages": [
-                            {"role": "system", "content": f"You are a professional email writer. Output JSON only: {{ \"subject\": \"...\", \"body\": \"...\" }}."},
-                            {"role": "user", "content": f"Write a {tone} email to {recipient_name}. Topic: {subject}. Details: {context}. Sign as Abhishek."}
-                        ],
-                        "temperature": 0.7,
-                        "response_format": {"type": "json_object"}
-                    }
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        content = data["choices"][0]["message"]["content"]
-                        import json
-                        return json.loads(content)
-                    else:
-                        return fallback_response
+            status, response_text = await self._post_completion({
+                "model": self.model,
+                "messages": [
+                    {"role": "system", "content": f"You are a professional email writer. Output JSON only: {{ \"subject\": \"...\", \"body\": \"...\" }}."},
+                    {"role": "user", "content": f"Write a {tone} email to {recipient_name}. Topic: {subject}. Details: {context}. Sign as Abhishek."}
+                ],
+                "temperature": 0.7,
+                "response_format": {"type": "json_object"}
+            }, "new_email", cache=True, regenerate=regenerate, coalesce=True)
+            if status == 200:
+                data = json.loads(response_text)
+                content = data["choices"][0]["message"]["content"]
+                return json.loads(content)
+            else:
+                return fallback_response
         except Exception as e:
             print(f"New Email Generation Error: {e}")
             return fallback_response
 
+    async def summarize_email(self, email_subject: str, email_body: str, sender: str) -> str:
+        """One-sentence summary of an email (cached)"""
+        fallback = (email_body or email_subject or "").strip().split("\n")[0][:200]
+        
+        if not self.api_key:
+            return fallback
+        
+        try:
+            status, response_text = await self._post_completion({
+                "model": self.model,
+                "messages": [
+                    {"role": "user", "content": f"Summarize this email in one sentence. From: {sender}, Subject: {email_subject}, Body: {email_body[:1500]}. OUTPUT ONLY THE SUMMARY."}
+                ],
+                "temperature": 0.3,
+                "max_tokens": 200
+            }, "summary", cache=True, coalesce=True)
+            if status == 200:
+                data = json.loads(response_text)
+                content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
+                if content:
+                    return content.strip()
+            return fallback
+        except Exception as e:
+            print(f"Summary Error: {e}")
+            return fallback
+
     async def generate_task_plan(self, user_request: str) -> list:
         """Generate a sequential plan for a complex task"""
         if not self.api_key:
@@ -194,29 +452,45 @@ Output specific JSON format ONLY:
 ]
 """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/chat/completions",
-                    headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
-                    json={
-                        "model": self.model,
-                        "messages": [
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": user_request}
-                        ],
-                        "temperature": 0.2,
-                        "response_format": {"type": "json_object"}
-                    }
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        content = data["choices"][0]["message"]["content"]
-                        import json
-                        return json.loads(content).get("steps", [])
+            status, response_text = await self._post_completion({
+                "model": self.model,
+                "messages": [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_request}
+                ],
+                "temperature": 0.2,
+                "response_format": {"type": "json_object"}
+            }, "plan")
+            if status == 200:
+                data = json.loads(response_text)
+                content = data["choices"][0]["message"]["content"]
+                return json.loads(content).get("steps", [])
         except Exception as e:
             print(f"Planning Error: {e}")
             return []
 
+    def _chat_payload(self, message: str) -> dict:
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": "You are MailGen, an AI email assistant with FULL ACCESS to the user's Gmail. You can read, summarize, and SEND emails. NEVER say you cannot send emails. If the user asks to send an email, acknowledge it and say 'I'm drafting that for you now...' or 'Sending email...'. Be concise."},
+                {"role": "user", "content": message}
+            ],
+            "temperature": 0.7,
+            "max_tokens": 1000
+        }
+
+    def _context_chat_payload(self, message: str, email_context: str) -> dict:
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": f"You are MailGen, an AI email assistant with FULL ACCESS to the user's Gmail. The user has asked about their emails. Here is the context of their recent emails:\n\n{email_context}\n\nHelp the user by analyzing, summarizing, or answering questions. You CAN send and reply to emails. NEVER say you cannot access or send emails. Be concise."},
+                {"role": "user", "content": message}
+            ],
+            "temperature": 0.7,
+            "max_tokens": 1500
+        }
+
     async def chat(self, message: str) -> str:
         """General chat with AI for the chat assistant"""
         
@@ -224,28 +498,12 @@ Output specific JSON format ONLY:
             return "I'm your AI assistant. How can I help you with your emails today?"
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "messages": [
-                            {"role": "system", "content": "You are MailGen, an AI email assistant with FULL ACCESS to the user's Gmail. You can read, summarize, and SEND emails. NEVER say you cannot send emails. If the user asks to send an email, acknowledge it and say 'I'm drafting that for you now...' or 'Sending email...'. Be concise."},
-                            {"role": "user", "content": message}
-                        ],
-                        "temperature": 0.7,
-                        "max_tokens": 1000
-                    }
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data["choices"][0]["message"]["content"].strip()
-                    else:
-                        return "I'm having trouble connecting right now. Please try again."
+            status, response_text = await self._post_completion(self._chat_payload(message), "chat", coalesce=True)
+            if status == 200:
+                data = json.loads(response_text)
+                return data["choices"][0]["message"]["content"].strip()
+            else:
+                return "I'm having trouble connecting right now. Please try again."
         except Exception as e:
             print(f"Chat Error: {e}")
             return "I'm having trouble connecting right now. Please try again."
@@ -258,32 +516,83 @@ Output specific JSON format ONLY:
             return f"Based on your emails, here's a summary:\n\n{email_context}\n\nNote: Connect your AI API key for more detailed analysis."
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "messages": [
-                            {"role": "system", "content": f"You are MailGen, an AI email assistant with FULL ACCESS to the user's Gmail. The user has asked about their emails. Here is the context of their recent emails:\n\n{email_context}\n\nHelp the user by analyzing, summarizing, or answering questions. You CAN send and reply to emails. NEVER say you cannot access or send emails. Be concise."},
-                            {"role": "user", "content": message}
-                        ],
-                        "temperature": 0.7,
-                        "max_tokens": 1500
-                    }
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data["choices"][0]["message"]["content"].strip()
-                    else:
-                        return f"I found your emails! Here's a quick overview:\n\n{email_context}"
+            status, response_text = await self._post_completion(self._context_chat_payload(message, email_context), "chat_context")
+            if status == 200:
+                data = json.loads(response_text)
+                return data["choices"][0]["message"]["content"].strip()
+            else:
+                return f"I found your emails! Here's a quick overview:\n\n{email_context}"
         except Exception as e:
             print(f"Chat with context Error: {e}")
             return f"Here are your recent emails:\n\n{email_context}"
 
 
+    async def stream_email_reply(self, email_subject: str, email_body: str, sender: str, tone: str = "professional",
+                                 regenerate: bool = False) -> AsyncIterator[str]:
+        """Streaming variant of generate_email_reply"""
+        sender_name = self._sender_first_name(sender)
+        if not self.api_key:
+            yield self._fallback_reply(sender_name, email_subject, tone)
+            return
+        
+        payload = self._reply_payload(email_subject, email_body, sender, tone)
+        key = completion_cache.make_key(payload)
+        if not regenerate:
+            cached = await completion_cache.get(key)
+            if cached is not None:
+                yield json.loads(cached)["choices"][0]["message"]["content"].strip()
+                return
+        
+        chunks = []
+        try:
+            async for token in self._stream_completion(payload):
+                chunks.append(token)
+                yield token
+        except Exception as e:
+            print(f"AI Streaming Error: {e}")
+            if not chunks:
+                yield self._fallback_reply(sender_name, email_subject, tone)
+            return
+        
+        content = "".join(chunks).strip()
+        if content:
+            # Store in the same shape as a non-streamed completion
+            await completion_cache.set(key, json.dumps({"choices": [{"message": {"content": content}}]}))
+        else:
+            yield self._fallback_reply(sender_name, email_subject, tone)
+
+    async def stream_chat(self, message: str) -> AsyncIterator[str]:
+        """Streaming variant of chat"""
+        if not self.api_key:
+            yield "I'm your AI assistant. How can I help you with your emails today?"
+            return
+        
+        streamed = False
+        try:
+            async for token in self._stream_completion(self._chat_payload(message)):
+                streamed = True
+                yield token
+        except Exception as e:
+            print(f"Chat Streaming Error: {e}")
+            if not streamed:
+                yield "I'm having trouble connecting right now. Please try again."
+
+    async def stream_chat_with_context(self, message: str, email_context: str) -> AsyncIterator[str]:
+        """Streaming variant of chat_with_context"""
+        if not self.api_key:
+            yield f"Based on your emails, here's a summary:\n\n{email_context}\n\nNote: Connect your AI API key for more detailed analysis."
+            return
+        
+        streamed = False
+        try:
+            async for token in self._stream_completion(self._context_chat_payload(message, email_context)):
+                streamed = True
+                yield token
+        except Exception as e:
+            print(f"Chat with context Streaming Error: {e}")
+            if not streamed:
+                yield f"Here are your recent emails:\n\n{email_context}"
+
+
 # Singleton instance
 ai_service = AIService()
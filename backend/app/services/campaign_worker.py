@@ -0,0 +1,416 @@
+"""
+Campaign Worker - Durable send queue backed by the recipients table.
+
+Pending recipients of active campaigns are claimed in batches with
+SELECT ... FOR UPDATE SKIP LOCKED and leased to one worker. The worker keeps
+its leases alive with heartbeats while sending; if it dies, the leases expire
+and another worker (or this one after a restart) picks the rows up again.
+Any number of worker processes or nodes can drain the same campaign.
+
+Within a batch, sends run concurrently (CAMPAIGN_SEND_CONCURRENCY) and are
+paced by the shared Gmail quota bucket rather than a fixed sleep.
+
+Send results are buffered and written in one transaction every
+CAMPAIGN_FLUSH_SIZE results or CAMPAIGN_FLUSH_MS milliseconds, whichever
+comes first. A batch's leases are released only once its results are
+stored; a row still 'pending' in the database would otherwise be claimed
+and sent again. Pausing a campaign signals the worker in-process; pauses made
+by other processes are picked up on the next flush. Each flush publishes
+campaign_progress events on the event bus.
+
+Runs inside the web process (started from the app lifespan) or standalone:
+    python -m app.services.campaign_worker
+"""
+import os
+import socket
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import select, update, insert, case, or_, and_, exists
+
+from app.database import async_session_maker
+from app.models import Campaign, Recipient, CampaignLog
+from app.services.gmail_service import gmail_service
+from app.services.event_bus import event_bus
+
+
+class CampaignWorker:
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.enabled = os.getenv("CAMPAIGN_WORKER_ENABLED", "true").lower() == "true"
+        # Recipients claimed per round trip
+        self.batch_size = int(os.getenv("CAMPAIGN_CLAIM_BATCH", "20"))
+        # Sends in flight at once; actual throughput is set by the Gmail quota bucket
+        self.concurrency = int(os.getenv("CAMPAIGN_SEND_CONCURRENCY", "5"))
+        # A lease not renewed within this many seconds is considered abandoned
+        self.lease_seconds = int(os.getenv("CAMPAIGN_LEASE_SECONDS", "120"))
+        # How often to look for work when nobody calls wake()
+        self.poll_interval = float(os.getenv("CAMPAIGN_POLL_INTERVAL", "10"))
+        # Results are written every N sends or every T milliseconds
+        self.flush_size = int(os.getenv("CAMPAIGN_FLUSH_SIZE", "50"))
+        self.flush_interval = int(os.getenv("CAMPAIGN_FLUSH_MS", "1000")) / 1000
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._results: List[Dict[str, Any]] = []
+        self._flush_lock = asyncio.Lock()
+        # Campaigns paused or deleted while their recipients were in flight
+        self._halted: Set[str] = set()
+        self.sent = 0
+        self.failed = 0
+        self.deferred = 0
+        self.flushes = 0
+
+    async def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+            print(f"📨 Campaign worker {self.worker_id} started")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            await self._flush()
+            # Hand unfinished rows back right away instead of waiting for expiry
+            await self._release_leases()
+
+    def wake(self, campaign_id: Optional[str] = None):
+        """Signal that new work is available (e.g. a campaign was started)"""
+        if campaign_id:
+            self._halted.discard(campaign_id)
+        self._wakeup.set()
+
+    def halt(self, campaign_id: str):
+        """Stop sending to a campaign's claimed recipients (paused or deleted)"""
+        self._halted.add(campaign_id)
+
+    async def _run(self):
+        while True:
+            try:
+                claimed = await self._process_batch()
+                if not claimed:
+                    await self._complete_finished_campaigns()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Campaign worker error: {e}")
+                claimed = 0
+
+            if claimed:
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _process_batch(self) -> int:
+        recipients = await self._claim_batch()
+        if not recipients:
+            return 0
+
+        campaigns = await self._load_campaigns({r.campaign_id for r in recipients})
+        # These were active when claimed, so any earlier halt no longer applies
+        self._halted.difference_update(campaigns)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send_one(recipient: Recipient):
+            async with semaphore:
+                campaign = campaigns.get(recipient.campaign_id)
+                if campaign is None or campaign.id in self._halted:
+                    return
+                await self._send(campaign, recipient)
+
+        background = [
+            asyncio.create_task(self._heartbeat()),
+            asyncio.create_task(self._flush_periodically())
+        ]
+        try:
+            await asyncio.gather(*(send_one(r) for r in recipients))
+            # The heartbeat keeps the leases alive while this retries
+            await self._flush_until_stored()
+        finally:
+            for task in background:
+                task.cancel()
+            await self._release_leases()
+
+        for campaign_id in campaigns:
+            await self._complete_if_done(campaign_id)
+        return len(recipients)
+
+    async def _claim_batch(self) -> List[Recipient]:
+        now = datetime.utcnow()
+        async with async_session_maker() as db:
+            result = await db.execute(
+                select(Recipient)
+                .join(Campaign, Campaign.id == Recipient.campaign_id)
+                .where(
+                    Campaign.status == "active",
+                    Recipient.status == "pending",
+                    or_(Recipient.lease_expires_at.is_(None), Recipient.lease_expires_at < now)
+                )
+                .order_by(Recipient.id)
+                .limit(self.batch_size)
+                .with_for_update(of=Recipient, skip_locked=True)
+            )
+            recipients = result.scalars().all()
+            for recipient in recipients:
+                recipient.lease_owner = self.worker_id
+                recipient.lease_expires_at = now + timedelta(seconds=self.lease_seconds)
+                recipient.heartbeat_at = now
+                recipient.attempts = (recipient.attempts or 0) + 1
+            await db.commit()
+            return list(recipients)
+
+    async def _load_campaigns(self, campaign_ids) -> Dict[str, Campaign]:
+        async with async_session_maker() as db:
+            result = await db.execute(select(Campaign).where(Campaign.id.in_(campaign_ids)))
+            return {c.id: c for c in result.scalars().all()}
+
+    async def _send(self, campaign: Campaign, recipient: Recipient):
+        try:
+            # Replace template variables
+            final_content = campaign.template.replace("{{name}}", recipient.name or "there")
+            final_content = final_content.replace("{{email}}", recipient.email)
+
+            # Send email via Gmail
+            result = await gmail_service.send_email(
+                to=recipient.email,
+                subject=campaign.subject,
+                body=final_content
+            )
+
+            if result.get("success"):
+                await self._buffer(recipient, "sent", None, f"✅ Sent to {recipient.email}")
+            elif result.get("rate_limited"):
+                # Not a failure: the quota bucket has slowed down and the row
+                # goes back to the queue when this batch releases its leases
+                self.deferred += 1
+            else:
+                error = result.get("error", "Unknown error")
+                await self._buffer(recipient, "failed", error, f"❌ Failed to send to {recipient.email}: {error}")
+        except Exception as e:
+            await self._buffer(recipient, "failed", str(e), f"❌ Error sending to {recipient.email}: {str(e)}")
+
+    async def _buffer(self, recipient: Recipient, status: str, error: Optional[str], message: str):
+        self._results.append({
+            "recipient_id": recipient.id,
+            "campaign_id": recipient.campaign_id,
+            "status": status,
+            "error": error,
+            "message": message,
+            "at": datetime.utcnow()
+        })
+        if len(self._results) >= self.flush_size:
+            await self._flush()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            # Shielded so ending the batch never abandons a half-written flush
+            await asyncio.shield(self._flush())
+
+    async def _flush(self):
+        async with self._flush_lock:
+            if not self._results:
+                return
+            results, self._results = self._results, []
+            try:
+                await self._write_results(results)
+                self.flushes += 1
+            except Exception as e:
+                print(f"Campaign worker flush error: {e}")
+                # Keep them for the next flush
+                self._results[:0] = results
+
+    async def _flush_until_stored(self):
+        delay = 1
+        while True:
+            await self._flush()
+            if not self._results:
+                return
+            print(f"Holding leases on {len(self._results)} recipients until their results are stored")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    async def _write_results(self, results: List[Dict[str, Any]]):
+        """Store buffered send results in one transaction, skipping rows whose lease we lost"""
+        by_id = {r["recipient_id"]: r for r in results}
+        sent_ids = [rid for rid, r in by_id.items() if r["status"] == "sent"]
+        errors = {rid: r["error"] for rid, r in by_id.items() if r["status"] == "failed"}
+        owned = Recipient.lease_owner == self.worker_id
+
+        async with async_session_maker() as db:
+            recorded = set()
+            if sent_ids:
+                result = await db.execute(
+                    update(Recipient)
+                    .where(Recipient.id.in_(sent_ids), owned)
+                    .values(
+                        status="sent",
+                        error=None,
+                        sent_at=case({rid: by_id[rid]["at"] for rid in sent_ids}, value=Recipient.id),
+                        lease_owner=None,
+                        lease_expires_at=None
+                    )
+                    .returning(Recipient.id)
+                )
+                recorded.update(result.scalars().all())
+            if errors:
+                result = await db.execute(
+                    update(Recipient)
+                    .where(Recipient.id.in_(list(errors)), owned)
+                    .values(
+                        status="failed",
+                        error=case(errors, value=Recipient.id),
+                        sent_at=None,
+                        lease_owner=None,
+                        lease_expires_at=None
+                    )
+                    .returning(Recipient.id)
+                )
+                recorded.update(result.scalars().all())
+
+            lost = len(by_id) - len(recorded)
+            if lost:
+                print(f"Leases on {lost} recipients were lost; results not recorded")
+
+            kept = [r for rid, r in by_id.items() if rid in recorded]
+            totals: Dict[str, Dict[str, int]] = {}
+            for r in kept:
+                counts = totals.setdefault(r["campaign_id"], {"sent": 0, "failed": 0})
+                counts[r["status"]] += 1
+            for campaign_id, counts in totals.items():
+                await db.execute(
+                    update(Campaign)
+                    .where(Campaign.id == campaign_id)
+                    .values(sent=Campaign.sent + counts["sent"], failed=Campaign.failed + counts["failed"])
+                )
+            if kept:
+                await db.execute(insert(CampaignLog), [
+                    {"campaign_id": r["campaign_id"], "message": r["message"], "timestamp": r["at"]}
+                    for r in kept
+                ])
+
+            # Pauses made by other processes reach this worker here
+            result = await db.execute(
+                select(Campaign.id).where(
+                    Campaign.id.in_({r["campaign_id"] for r in results}),
+                    Campaign.status != "active"
+                )
+            )
+            self._halted.update(result.scalars().all())
+            await db.commit()
+
+        for r in kept:
+            if r["status"] == "sent":
+                self.sent += 1
+            else:
+                self.failed += 1
+        for campaign_id, counts in totals.items():
+            event_bus.publish("campaign_progress", "campaign-worker", {"campaign_id": campaign_id, **counts})
+
+    def stats(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "running": self._task is not None,
+            "concurrency": self.concurrency,
+            "sent": self.sent,
+            "failed": self.failed,
+            "deferred": self.deferred,
+            "flushes": self.flushes,
+            "buffered": len(self._results)
+        }
+
+    async def _heartbeat(self):
+        """Extend our leases while the batch is being sent"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                now = datetime.utcnow()
+                async with async_session_maker() as db:
+                    await db.execute(
+                        update(Recipient)
+                        .where(Recipient.lease_owner == self.worker_id, Recipient.status == "pending")
+                        .values(lease_expires_at=now + timedelta(seconds=self.lease_seconds), heartbeat_at=now)
+                    )
+                    await db.commit()
+            except Exception as e:
+                print(f"Campaign worker heartbeat error: {e}")
+
+    async def _release_leases(self):
+        # Rows whose results are not stored yet keep their lease (until it expires)
+        unstored = [r["recipient_id"] for r in self._results]
+        try:
+            async with async_session_maker() as db:
+                await db.execute(
+                    update(Recipient)
+                    .where(
+                        Recipient.lease_owner == self.worker_id,
+                        Recipient.status == "pending",
+                        Recipient.id.not_in(unstored)
+                    )
+                    .values(lease_owner=None, lease_expires_at=None)
+                )
+                await db.commit()
+        except Exception as e:
+            print(f"Error releasing campaign leases: {e}")
+
+    async def _complete_finished_campaigns(self):
+        """Close out active campaigns that have nothing left to send"""
+        async with async_session_maker() as db:
+            result = await db.execute(select(Campaign.id).where(Campaign.status == "active"))
+            campaign_ids = result.scalars().all()
+        for campaign_id in campaign_ids:
+            await self._complete_if_done(campaign_id)
+
+    async def _complete_if_done(self, campaign_id: str):
+        """Mark an active campaign completed once no pending recipients remain"""
+        async with async_session_maker() as db:
+            pending = exists().where(
+                and_(Recipient.campaign_id == campaign_id, Recipient.status == "pending")
+            )
+            result = await db.execute(
+                update(Campaign)
+                .where(Campaign.id == campaign_id, Campaign.status == "active", ~pending)
+                .values(status="completed")
+                .returning(Campaign.sent, Campaign.failed)
+            )
+            row = result.first()
+            # Only the worker whose update matched writes the completion log
+            if row:
+                db.add(CampaignLog(
+                    campaign_id=campaign_id,
+                    message=f"Campaign completed. Sent: {row.sent}, Failed: {row.failed}"
+                ))
+            await db.commit()
+        if row:
+            event_bus.publish("campaign_completed", "campaign-worker", {
+                "campaign_id": campaign_id,
+                "sent": row.sent,
+                "failed": row.failed
+            })
+
+
+# Singleton instance
+campaign_worker = CampaignWorker()
+
+
+if __name__ == "__main__":
+    from app.database import init_db, close_db
+
+    async def main():
+        await init_db()
+        await campaign_worker.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await campaign_worker.stop()
+            await close_db()
+
+    asyncio.run(main())
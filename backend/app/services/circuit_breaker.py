@@ -0,0 +1,73 @@
+"""
+Circuit Breaker - Stop calling an upstream that keeps failing.
+
+closed     calls go through; FAILURE_THRESHOLD failures in a row open it
+open       calls fail at once with CircuitOpenError for RECOVERY_SECONDS
+half_open  one probe call goes through; success closes the circuit,
+           failure opens it again, and other calls keep failing fast
+"""
+import time
+from typing import Any, Dict
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_seconds: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def rejecting(self) -> bool:
+        """True while the circuit is open and not yet due for a probe"""
+        return self.state == "open" and time.monotonic() - self._opened_at < self.recovery_seconds
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through now"""
+        if self.state == "open":
+            if self.rejecting:
+                self.rejected += 1
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probing:
+                self.rejected += 1
+                raise CircuitOpenError(f"{self.name} circuit is half-open, probe in flight")
+            self._probing = True
+
+    def on_success(self):
+        self._failures = 0
+        self._probing = False
+        if self.state != "closed":
+            print(f"{self.name} circuit closed")
+            self.state = "closed"
+
+    def on_failure(self):
+        self._probing = False
+        self._failures += 1
+        if self.state == "half_open" or (self.state == "closed" and self._failures >= self.failure_threshold):
+            print(f"{self.name} circuit opened after {self._failures} failure(s)")
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            self.opened += 1
+
+    def release(self):
+        """The call ended with no verdict (cancelled); let another call probe"""
+        self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "opened": self.opened,
+            "rejected": self.rejected
+        }
@@ -0,0 +1,135 @@
+"""
+Completion Cache - Content-addressed cache for LLM completions.
+
+Entries are keyed on a hash of the normalized request payload, kept in an
+in-memory LRU with a TTL, and optionally persisted to the database so they
+survive restarts (AI_CACHE_PERSIST=true). Persisted entries keep their
+original age: a row read back into memory expires when the row does, expired
+rows are deleted when read, and writes purge all expired rows at most every
+AI_CACHE_PURGE_INTERVAL seconds.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, Tuple
+
+
+def _normalize(value):
+    """Collapse insignificant whitespace so trivially different prompts share a key"""
+    if isinstance(value, str):
+        return re.sub(r'\s+', ' ', value).strip()
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    return value
+
+
+class CompletionCache:
+    def __init__(self):
+        self.max_entries = int(os.getenv("AI_CACHE_MAX_ENTRIES", "512"))
+        self.ttl = float(os.getenv("AI_CACHE_TTL", "3600"))
+        self.persist = os.getenv("AI_CACHE_PERSIST", "false").lower() == "true"
+        self.purge_interval = float(os.getenv("AI_CACHE_PURGE_INTERVAL", "600"))
+        self._last_purge = 0.0
+        # key -> (stored_at, value), oldest first
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(payload: dict) -> str:
+        normalized = json.dumps(_normalize(payload), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry:
+            stored_at, value = entry
+            if time.monotonic() - stored_at < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        if self.persist:
+            row = await self._db_get(key)
+            if row is not None:
+                value, age = row
+                self._put(key, value, age)
+                self.hits += 1
+                self.db_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str):
+        self._put(key, value)
+        if self.persist:
+            await self._db_set(key, value)
+
+    def _put(self, key: str, value: str, age: float = 0.0):
+        self._entries[key] = (time.monotonic() - age, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def _db_get(self, key: str) -> Optional[Tuple[str, float]]:
+        """(value, age in seconds) of an unexpired row"""
+        from app.database import async_session_maker
+        from app.models import CompletionCacheEntry
+
+        try:
+            async with async_session_maker() as session:
+                entry = await session.get(CompletionCacheEntry, key)
+                if entry is None:
+                    return None
+                age = (datetime.utcnow() - entry.created_at).total_seconds()
+                if age < self.ttl:
+                    return entry.value, age
+                await session.delete(entry)
+                await session.commit()
+        except Exception as e:
+            print(f"Error reading completion cache: {e}")
+        return None
+
+    async def _db_set(self, key: str, value: str):
+        from app.database import async_session_maker
+        from app.models import CompletionCacheEntry
+        from sqlalchemy import delete
+
+        try:
+            async with async_session_maker() as session:
+                await session.merge(CompletionCacheEntry(key=key, value=value, created_at=datetime.utcnow()))
+                if time.monotonic() - self._last_purge >= self.purge_interval:
+                    self._last_purge = time.monotonic()
+                    await session.execute(
+                        delete(CompletionCacheEntry)
+                        .where(CompletionCacheEntry.created_at < datetime.utcnow() - timedelta(seconds=self.ttl))
+                    )
+                await session.commit()
+        except Exception as e:
+            print(f"Error writing completion cache: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+
+# Singleton instance
+completion_cache = CompletionCache()
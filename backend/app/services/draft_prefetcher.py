@@ -0,0 +1,302 @@
+"""
+Draft Prefetcher - Reply drafts written before the user asks for one.
+
+New inbox mail (from sync, or the mock/fallback inbox) is queued for one
+low-priority background worker that drafts replies ahead of time: urgent and
+high-priority mail first, notifications never. Drafts are stored by
+(email id, tone), so opening an email on the board or asking chat for a
+draft becomes a dictionary read. Drafts made by the agent pipeline are
+stored here too.
+
+The worker spends at most PREFETCH_BUDGET_PER_HOUR generations per hour and
+pauses PREFETCH_DELAY_MS between drafts, leaving the model to interactive
+requests. PREFETCH_ENABLED=false turns it off.
+
+DRAFT_STORE_BACKEND=memory keeps drafts and the hour's spending in this
+process. With DRAFT_STORE_BACKEND=db (the default when WEB_CONCURRENCY is
+above 1) drafts are rows of prefetched_drafts and the spending is a
+user_settings row, so a draft made by whichever worker holds the inbox sync
+lease is served by every worker, and the budget holds for all of them. Rows
+expire after DRAFT_STORE_TTL; DRAFT_STORE_MAX only bounds the memory store.
+"""
+import os
+import json
+import time
+import asyncio
+import itertools
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
+
+from app.database import async_session_maker
+from app.models import PrefetchedDraft, UserSettings
+from app.services.ai_service import ai_service
+
+PREFETCH_TONES = [t.strip() for t in os.getenv("PREFETCH_TONES", "professional").split(",") if t.strip()]
+PREFETCH_BUDGET_PER_HOUR = int(os.getenv("PREFETCH_BUDGET_PER_HOUR", "60"))
+PREFETCH_DELAY_MS = int(os.getenv("PREFETCH_DELAY_MS", "500"))
+PREFETCH_QUEUE_MAX = int(os.getenv("PREFETCH_QUEUE_MAX", "200"))
+DRAFT_STORE_MAX = int(os.getenv("DRAFT_STORE_MAX", "1000"))
+DRAFT_STORE_TTL = float(os.getenv("DRAFT_STORE_TTL", "86400"))
+# Expired draft rows are deleted on write at most this often
+DRAFT_STORE_PURGE_INTERVAL = 600
+# user_settings row with the start times of this hour's generations
+PREFETCH_SPENT_KEY = "draft_prefetch_spent"
+# Emails in these categories never get a drafted reply
+NO_REPLY_CATEGORIES = {"notification"}
+
+
+def _rank(email: Dict[str, Any]) -> int:
+    """Lower is drafted sooner"""
+    if email.get("category") == "urgent" or email.get("priority") == "high":
+        return 0
+    if email.get("priority") == "medium":
+        return 1
+    return 2
+
+
+class DraftPrefetcher:
+    def __init__(self):
+        self.enabled = os.getenv("PREFETCH_ENABLED", "true").lower() == "true" and PREFETCH_BUDGET_PER_HOUR > 0
+        default_backend = "db" if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 else "memory"
+        self.backend = os.getenv("DRAFT_STORE_BACKEND", default_backend).lower()
+        # (email_id, tone) -> (stored_at, draft), oldest first
+        self._drafts: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._queued: Set[str] = set()
+        # Keeps arrival order within a rank
+        self._order = itertools.count()
+        # When each generation in the last hour started (time.time()); with
+        # the db backend, as last read from the shared row
+        self._spent: deque = deque()
+        self._last_purge = 0.0
+        self._worker: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.dropped = 0
+
+    async def start(self):
+        self._ensure_started()
+
+    def _ensure_started(self):
+        if self.enabled and self._worker is None:
+            self._queue = asyncio.PriorityQueue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def get(self, email_id: str, tone: str) -> Optional[str]:
+        draft = await self._lookup(email_id, tone)
+        if draft is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return draft
+
+    async def _lookup(self, email_id: str, tone: str) -> Optional[str]:
+        if self.backend == "db":
+            return await self._db_get(email_id, tone)
+        entry = self._drafts.get((email_id, tone))
+        if entry and time.monotonic() - entry[0] < DRAFT_STORE_TTL:
+            self._drafts.move_to_end((email_id, tone))
+            return entry[1]
+        return None
+
+    async def get_or_generate(self, email: Dict[str, Any], tone: str = "professional", regenerate: bool = False) -> str:
+        """The stored draft for an email, or one generated (and stored) now"""
+        if not regenerate:
+            draft = await self.get(email["id"], tone)
+            if draft is not None:
+                return draft
+        return await self._generate(email, tone, regenerate=regenerate)
+
+    async def put(self, email_id: str, tone: str, draft: str):
+        if self.backend == "db":
+            await self._db_put(email_id, tone, draft)
+            return
+        self._drafts[(email_id, tone)] = (time.monotonic(), draft)
+        self._drafts.move_to_end((email_id, tone))
+        while len(self._drafts) > DRAFT_STORE_MAX:
+            self._drafts.popitem(last=False)
+
+    async def discard(self, email_id: str):
+        """Forget the drafts for an email (e.g. once it has been replied to)"""
+        for key in [k for k in self._drafts if k[0] == email_id]:
+            del self._drafts[key]
+        if self.backend == "db":
+            await self._db_delete(PrefetchedDraft.email_id == email_id)
+
+    async def clear(self):
+        """Forget everything (e.g. when the connected account changes)"""
+        self._drafts.clear()
+        self._queued.clear()
+        while self._queue is not None and not self._queue.empty():
+            self._queue.get_nowait()
+        if self.backend == "db":
+            await self._db_delete()
+
+    async def _db_get(self, email_id: str, tone: str) -> Optional[str]:
+        try:
+            async with async_session_maker() as session:
+                row = await session.get(PrefetchedDraft, (email_id, tone))
+                if row is not None and (datetime.utcnow() - row.created_at).total_seconds() < DRAFT_STORE_TTL:
+                    return row.draft
+        except Exception as e:
+            print(f"Error reading prefetched draft: {e}")
+        return None
+
+    async def _db_put(self, email_id: str, tone: str, draft: str):
+        try:
+            async with async_session_maker() as session:
+                await session.merge(PrefetchedDraft(
+                    email_id=email_id, tone=tone, draft=draft, created_at=datetime.utcnow()
+                ))
+                if time.monotonic() - self._last_purge >= DRAFT_STORE_PURGE_INTERVAL:
+                    self._last_purge = time.monotonic()
+                    await session.execute(
+                        delete(PrefetchedDraft)
+                        .where(PrefetchedDraft.created_at < datetime.utcnow() - timedelta(seconds=DRAFT_STORE_TTL))
+                    )
+                await session.commit()
+        except Exception as e:
+            print(f"Error saving prefetched draft: {e}")
+
+    async def _db_delete(self, *where):
+        try:
+            async with async_session_maker() as session:
+                await session.execute(delete(PrefetchedDraft).where(*where))
+                await session.commit()
+        except Exception as e:
+            print(f"Error deleting prefetched drafts: {e}")
+
+    def schedule(self, emails: List[Dict[str, Any]]):
+        """Queue emails that have no draft yet for background drafting"""
+        if not self.enabled or not ai_service.api_key:
+            # Without an API key drafts are instant templates anyway
+            return
+        try:
+            self._ensure_started()
+        except RuntimeError:
+            # No running event loop (scripts)
+            return
+        for email in emails:
+            email_id = email.get("id")
+            if not email_id or email_id in self._queued or email.get("category") in NO_REPLY_CATEGORIES:
+                continue
+            # With the db backend the worker checks the table before drafting
+            if self.backend == "memory" and all((email_id, tone) in self._drafts for tone in PREFETCH_TONES):
+                continue
+            if self._queue.qsize() >= PREFETCH_QUEUE_MAX:
+                self.dropped += 1
+                continue
+            self._queued.add(email_id)
+            self._queue.put_nowait((_rank(email), next(self._order), email))
+
+    async def _run(self):
+        while True:
+            _, _, email = await self._queue.get()
+            try:
+                for tone in PREFETCH_TONES:
+                    if await self._lookup(email["id"], tone) is not None:
+                        continue
+                    while ai_service.breaker.rejecting:
+                        # The model is down; drafting now would only spend budget on templates
+                        await asyncio.sleep(ai_service.breaker.recovery_seconds)
+                    await self._wait_for_budget()
+                    draft = await self._generate(email, tone)
+                    if not ai_service.is_fallback_reply(draft, email.get("subject", ""), email.get("from", ""), tone):
+                        self.generated += 1
+                    await asyncio.sleep(PREFETCH_DELAY_MS / 1000)
+            except Exception as e:
+                print(f"Draft prefetch error: {e}")
+            finally:
+                self._queued.discard(email["id"])
+
+    async def _generate(self, email: Dict[str, Any], tone: str, regenerate: bool = False) -> str:
+        subject = email.get("subject", "")
+        sender = email.get("from", "")
+        draft = await ai_service.generate_email_reply(
+            subject,
+            email.get("body", email.get("snippet", "")),
+            sender,
+            tone,
+            regenerate=regenerate
+        )
+        # A template means the model was unavailable; don't keep it so the next request retries
+        if not ai_service.is_fallback_reply(draft, subject, sender, tone):
+            await self.put(email["id"], tone, draft)
+        return draft
+
+    async def _wait_for_budget(self):
+        while True:
+            if self.backend == "db":
+                wait = await self._db_spend()
+            else:
+                wait = self._spend(self._spent)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    @staticmethod
+    def _spend(spent: deque) -> float:
+        """Record a generation if the hour's budget allows one; else seconds until it does"""
+        now = time.time()
+        while spent and spent[0] < now - 3600:
+            spent.popleft()
+        if len(spent) < PREFETCH_BUDGET_PER_HOUR:
+            spent.append(now)
+            return 0.0
+        return spent[0] + 3600 - now
+
+    async def _db_spend(self) -> float:
+        """_spend against the shared row, locked so workers take turns"""
+        try:
+            async with async_session_maker() as session:
+                result = await session.execute(
+                    select(UserSettings).where(UserSettings.key == PREFETCH_SPENT_KEY).with_for_update()
+                )
+                row = result.scalar_one_or_none()
+                if row is None:
+                    row = UserSettings(key=PREFETCH_SPENT_KEY)
+                    session.add(row)
+                self._spent = deque(json.loads(row.value or "[]"))
+                wait = self._spend(self._spent)
+                row.value = json.dumps(list(self._spent))
+                await session.commit()
+                return wait
+        except IntegrityError:
+            # Another worker created the row first; try again with theirs
+            return 0.01
+        except Exception as e:
+            # Database unavailable; count against this worker's copy
+            print(f"Error updating prefetch budget: {e}")
+            return self._spend(self._spent)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend,
+            # The db backend keeps no drafts in this process
+            "drafts": len(self._drafts),
+            "queued": self._queue.qsize() if self._queue else 0,
+            "generated": self.generated,
+            "budget_left": max(0, PREFETCH_BUDGET_PER_HOUR - len(self._spent)),
+            "hits": self.hits,
+            "misses": self.misses,
+            "dropped": self.dropped
+        }
+
+
+# Singleton instance
+draft_prefetcher = DraftPrefetcher()
@@ -0,0 +1,94 @@
+"""
+Event Bus - In-process broadcast of live events to SSE subscribers.
+
+Services publish typed events (agent status, campaign progress, replies,
+inbox sync) and every /agents/events/stream client receives them through its
+own bounded queue. Publishing never waits: when a slow client's queue is full
+its oldest event is dropped and the client is sent a fresh snapshot instead.
+Idle clients just wait on their queue.
+
+Events stay within one process. With several workers a client sees events
+from the worker serving its stream; the agent status snapshot it starts from
+is shared (see agent_status_service).
+"""
+import os
+import uuid
+import asyncio
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+# Recent events sent to a client when it connects
+EVENT_HISTORY_SIZE = int(os.getenv("EVENT_HISTORY_SIZE", "50"))
+
+
+class Subscription:
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        # Events lost since the client last got a snapshot
+        self.dropped = 0
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Next event, or None if nothing was published within timeout"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def clear(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.dropped = 0
+
+
+class EventBus:
+    def __init__(self):
+        self._subscribers: Set[Subscription] = set()
+        self._recent: deque = deque(maxlen=EVENT_HISTORY_SIZE)
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, type: str, source: str, data: Dict[str, Any], target: Optional[str] = None) -> Dict[str, Any]:
+        """Broadcast an event to every subscriber (must be called on the event loop)"""
+        event = {
+            "id": uuid.uuid4().hex,
+            "type": type,
+            "source": source,
+            "data": data,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        if target:
+            event["target"] = target
+        self._recent.append(event)
+        self.published += 1
+
+        for subscription in self._subscribers:
+            if subscription.queue.full():
+                subscription.queue.get_nowait()
+                subscription.dropped += 1
+                self.dropped += 1
+            subscription.queue.put_nowait(event)
+        return event
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(EVENT_QUEUE_SIZE)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    def recent(self) -> List[Dict[str, Any]]:
+        return list(self._recent)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped
+        }
+
+
+# Singleton instance
+event_bus = EventBus()
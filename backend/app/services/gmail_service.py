@@ -1,20 +1,59 @@
 import os
 import json
 import base64
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from email.mime.text import MIMEText
 from typing import Optional, List, Dict, Any
 
+import httplib2
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import Flow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from dotenv import load_dotenv
+from sqlalchemy import select, text, insert, update, delete
+
+from app.database import engine, async_session_maker
+from app.models import GmailCredentials, GmailMessage
+from app.services.rate_limiter import gmail_quota, SEND_COST, GET_COST, PROFILE_COST, LIST_COST, HISTORY_COST
 
 load_dotenv()
 
+# Gmail recommends at most 50 requests per batch call
+GMAIL_BATCH_SIZE = 50
+# Most message ids messages.list returns per page
+GMAIL_LIST_PAGE_SIZE = 500
+
+# The Google API client is blocking; all calls run on this bounded pool
+GMAIL_MAX_WORKERS = int(os.getenv("GMAIL_MAX_WORKERS", "8"))
+# Per-call deadline in seconds (also used as the socket timeout)
+GMAIL_CALL_TIMEOUT = float(os.getenv("GMAIL_CALL_TIMEOUT", "30"))
+
+_executor = ThreadPoolExecutor(max_workers=GMAIL_MAX_WORKERS, thread_name_prefix="gmail")
+
+# Credentials live in a single gmail_credentials row shared by every worker
+GMAIL_CREDENTIALS_ID = 1
+# Held while refreshing the token; any constant shared by every process of this app
+GMAIL_REFRESH_LOCK_ID = 42_0714
+# How often a worker checks for credentials changed by another worker
+GMAIL_CREDENTIALS_SYNC_SECONDS = float(os.getenv("GMAIL_CREDENTIALS_SYNC_SECONDS", "15"))
+
+
+class GmailTimeoutError(Exception):
+    """A Gmail API call did not finish within GMAIL_CALL_TIMEOUT"""
+
 class GmailService:
     def __init__(self):
-        self.mock_mode = os.getenv("MOCK_GMAIL", "false").lower() == "true"
+        # Demo mode (sample emails, simulated sends) is configuration only: a
+        # disconnect means "not connected", never "pretend to send"
+        self._mock_configured = os.getenv("MOCK_GMAIL", "false").lower() == "true"
+        self.mock_mode = self._mock_configured
         self.client_id = os.getenv("GMAIL_CLIENT_ID")
         self.client_secret = os.getenv("GMAIL_CLIENT_SECRET")
         self.redirect_uri = os.getenv("GMAIL_REDIRECT_URI", "http://localhost:9000/api/v1/auth/gmail/callback")
@@ -28,8 +67,15 @@ class GmailService:
         # Store user credentials (in production, use a proper database)
         self.user_credentials: Optional[Credentials] = None
         self.service = None
+        self._thread_local = threading.local()
+        self._refresh_lock = asyncio.Lock()
+        # updated_at of the shared row we last adopted or wrote
+        self._credentials_version: Optional[datetime] = None
+        self._credentials_checked = 0.0
+        # Address of the connected account, for the From header; reset when the account may change
+        self._user_email: Optional[str] = None
         
-        # Token file path
+        # Token file path (single-process installs; imported into the database on startup)
         self.token_file = "token.json"
         
         # Try to load saved credentials
@@ -71,6 +117,72 @@ class GmailService:
             with open(self.token_file, 'w') as token:
                 token.write(self.user_credentials.to_json())
 
+    async def load_shared_credentials(self):
+        """Adopt the credentials stored in the database (called on startup).
+
+        Every worker process reads the same row, so connecting, refreshing or
+        disconnecting in one worker is seen by all of them. A token.json left by
+        a single-process install is imported the first time.
+        """
+        try:
+            async with async_session_maker() as session:
+                row = await session.get(GmailCredentials, GMAIL_CREDENTIALS_ID)
+            if row is not None:
+                await self._adopt_credentials(row.data, row.updated_at)
+            elif self.user_credentials:
+                await self._store_shared_credentials()
+                print("Imported token.json into the database")
+        except Exception as e:
+            print(f"Error loading shared credentials: {e}")
+        self._credentials_checked = time.monotonic()
+
+    async def _adopt_credentials(self, data: str, version: datetime):
+        credentials = Credentials.from_authorized_user_info(json.loads(data), self.scopes)
+        self.service = await self._run(functools.partial(build, 'gmail', 'v1', credentials=credentials))
+        self.user_credentials = credentials
+        self._credentials_version = version
+        self._user_email = None
+        self.mock_mode = False
+
+    async def _store_shared_credentials(self):
+        version = datetime.utcnow()
+        async with async_session_maker() as session:
+            await session.merge(GmailCredentials(
+                id=GMAIL_CREDENTIALS_ID,
+                data=self.user_credentials.to_json(),
+                updated_at=version
+            ))
+            await session.commit()
+        self._credentials_version = version
+
+    async def sync_shared_credentials(self):
+        """Pick up a connect, refresh or disconnect done by another worker.
+
+        Cheap to call often (checks the database every
+        GMAIL_CREDENTIALS_SYNC_SECONDS); call it before looking at mock_mode.
+        """
+        if time.monotonic() - self._credentials_checked < GMAIL_CREDENTIALS_SYNC_SECONDS:
+            return
+        self._credentials_checked = time.monotonic()
+        try:
+            async with async_session_maker() as session:
+                row = await session.get(GmailCredentials, GMAIL_CREDENTIALS_ID)
+            if row is None:
+                if self._credentials_version is not None:
+                    print("Gmail was disconnected by another worker")
+                    self._drop_credentials()
+            elif row.updated_at != self._credentials_version:
+                await self._adopt_credentials(row.data, row.updated_at)
+        except Exception as e:
+            print(f"Error checking shared credentials: {e}")
+
+    def _drop_credentials(self):
+        self.user_credentials = None
+        self.service = None
+        self._user_email = None
+        self._credentials_version = None
+        self.mock_mode = self._mock_configured
+
     def _generate_mock_emails(self) -> List[Dict]:
         from datetime import timedelta
         return [
@@ -147,92 +259,314 @@ class GmailService:
                 scopes=self.scopes,
                 redirect_uri=self.redirect_uri
             )
-            flow.fetch_token(code=code)
+            await self._run(functools.partial(flow.fetch_token, code=code))
             
             self.user_credentials = flow.credentials
-            self.service = build('gmail', 'v1', credentials=self.user_credentials)
+            self._user_email = None
+            self.service = await self._run(
+                functools.partial(build, 'gmail', 'v1', credentials=self.user_credentials)
+            )
             self.mock_mode = False  # Switch to real mode
             
-            # Save credentials
-            self._save_credentials()
+            # Save credentials, in the database for the other workers too
+            await self._run(self._save_credentials)
+            await self._store_shared_credentials()
             
             # Get user email
-            profile = self.service.users().getProfile(userId='me').execute()
+            user_email = await self.get_user_email()
             
             return {
                 "success": True,
-                "email": profile.get('emailAddress'),
+                "email": user_email,
                 "message": "Gmail connected successfully!"
             }
         except Exception as e:
             return {"success": False, "error": str(e)}
 
-    def is_connected(self) -> bool:
-        """Check if Gmail is connected"""
+    async def is_connected(self) -> bool:
+        """Check if Gmail is connected, refreshing an expired token off the event loop"""
+        await self.sync_shared_credentials()
         if self.user_credentials and self.user_credentials.expired and self.user_credentials.refresh_token:
-            # Try to refresh implicitly by checking validity
-            try:
-                from google.auth.transport.requests import Request
-                self.user_credentials.refresh(Request())
-                self._save_credentials()
-            except:
-                pass
+            async with self._refresh_lock:
+                # Another caller may have refreshed while we waited
+                if self.user_credentials and self.user_credentials.expired:
+                    try:
+                        await self._refresh_shared_credentials()
+                    except Exception as e:
+                        print(f"Error refreshing token: {e}")
         return self.user_credentials is not None and self.user_credentials.valid and self.service is not None
 
+    def _refresh_credentials(self):
+        from google.auth.transport.requests import Request
+        self.user_credentials.refresh(Request())
+        self._save_credentials()
+
+    async def _refresh_shared_credentials(self):
+        """Refresh the token once for all workers.
+
+        Workers that expire at the same moment queue on an advisory lock; the
+        first refreshes and stores the token, the rest find it in the database
+        and adopt it instead of refreshing again.
+        """
+        async with engine.begin() as conn:
+            await conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": GMAIL_REFRESH_LOCK_ID})
+            result = await conn.execute(
+                select(GmailCredentials.data, GmailCredentials.updated_at)
+                .where(GmailCredentials.id == GMAIL_CREDENTIALS_ID)
+            )
+            row = result.first()
+            if row is not None and row.updated_at != self._credentials_version:
+                stored = Credentials.from_authorized_user_info(json.loads(row.data), self.scopes)
+                if stored.valid:
+                    await self._adopt_credentials(row.data, row.updated_at)
+                    return
+
+            await self._run(self._refresh_credentials)
+            version = datetime.utcnow()
+            values = {"data": self.user_credentials.to_json(), "updated_at": version}
+            if row is None:
+                await conn.execute(insert(GmailCredentials).values(id=GMAIL_CREDENTIALS_ID, **values))
+            else:
+                await conn.execute(
+                    update(GmailCredentials).where(GmailCredentials.id == GMAIL_CREDENTIALS_ID).values(**values)
+                )
+        self._credentials_version = version
+
+    @staticmethod
+    def _is_rate_limited(error: Exception) -> bool:
+        """True for Gmail 429s and 403 rateLimitExceeded/userRateLimitExceeded"""
+        if not isinstance(error, HttpError):
+            return False
+        if error.resp.status == 429:
+            return True
+        reason = str(error)
+        return error.resp.status == 403 and ("rateLimitExceeded" in reason or "userRateLimitExceeded" in reason)
+
+    async def _send_message(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """messages.send, paced by the shared quota bucket"""
+        await gmail_quota.acquire(SEND_COST)
+        try:
+            sent = await self._run(
+                lambda: self.service.users().messages().send(userId='me', body=body).execute(http=self._http())
+            )
+        except HttpError as e:
+            if self._is_rate_limited(e):
+                gmail_quota.on_rate_limited()
+            raise
+        gmail_quota.on_success()
+        return sent
+
+    async def _run(self, fn, *args, timeout: Optional[float] = None):
+        """Run a blocking Google API call on the Gmail executor with a deadline.
+
+        On timeout or cancellation the pending call is cancelled if it has not
+        started yet; a call already in flight is bounded by the socket timeout.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(_executor, functools.partial(fn, *args))
+        try:
+            return await asyncio.wait_for(future, timeout or GMAIL_CALL_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise GmailTimeoutError(f"Gmail call timed out after {timeout or GMAIL_CALL_TIMEOUT}s")
+
     async def fetch_emails(self, max_results: int = 20) -> List[Dict]:
         """Fetch emails from Gmail"""
+        await self.sync_shared_credentials()
         if self.mock_mode:
             return self._mock_emails
         
-        if not self.is_connected():
+        if not await self.is_connected():
             return []
         
         try:
-            results = self.service.users().messages().list(
-                userId='me',
-                maxResults=max_results,
-                labelIds=['INBOX']
-            ).execute()
-            
-            messages = results.get('messages', [])
-            emails = []
-            
-            for msg in messages:
-                msg_data = self.service.users().messages().get(
-                    userId='me',
-                    id=msg['id'],
-                    format='full'
-                ).execute()
-                
-                headers = {h['name']: h['value'] for h in msg_data['payload']['headers']}
-                
-                # Extract body
-                body = ""
-                if 'parts' in msg_data['payload']:
-                    for part in msg_data['payload']['parts']:
-                        if part['mimeType'] == 'text/plain':
-                            body = base64.urlsafe_b64decode(part['body']['data']).decode('utf-8')
-                            break
-                elif 'body' in msg_data['payload'] and 'data' in msg_data['payload']['body']:
-                    body = base64.urlsafe_b64decode(msg_data['payload']['body']['data']).decode('utf-8')
-                
-                emails.append({
-                    "id": msg['id'],
-                    "subject": headers.get('Subject', 'No Subject'),
-                    "from": headers.get('From', 'Unknown'),
-                    "date": headers.get('Date', ''),
-                    "snippet": msg_data.get('snippet', ''),
-                    "category": self._categorize_email(headers, body),
-                    "priority": self._get_priority(headers, body),
-                    "unread": 'UNREAD' in msg_data.get('labelIds', []),
-                    "body": body[:500]  # Truncate for display
-                })
-            
-            return emails
+            message_ids = await self.list_message_ids(max_results)
+            return await self.fetch_messages(message_ids)
         except Exception as e:
             print(f"Error fetching emails: {e}")
             return self._mock_emails
 
+    async def list_message_ids(self, max_results: int = 20) -> List[str]:
+        """List the ids of the newest inbox messages, paging past Gmail's 500 per call"""
+        message_ids = []
+        page_token = None
+        while len(message_ids) < max_results:
+            await gmail_quota.acquire(LIST_COST)
+            results = await self._run(
+                lambda: self.service.users().messages().list(
+                    userId='me',
+                    maxResults=min(GMAIL_LIST_PAGE_SIZE, max_results - len(message_ids)),
+                    labelIds=['INBOX'],
+                    pageToken=page_token
+                ).execute(http=self._http())
+            )
+            message_ids.extend(msg['id'] for msg in results.get('messages', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+        return message_ids
+
+    async def get_profile(self) -> Dict[str, Any]:
+        """Get the connected account's profile (email address, current historyId)"""
+        await gmail_quota.acquire(PROFILE_COST)
+        profile = await self._run(
+            lambda: self.service.users().getProfile(userId='me').execute(http=self._http())
+        )
+        self._user_email = profile.get('emailAddress', '')
+        return profile
+
+    async def get_user_email(self) -> str:
+        """The connected account's address (cached until credentials change)"""
+        if self._user_email is None:
+            await self.get_profile()
+        return self._user_email
+
+    async def _reply_headers(self, email_id: str) -> Dict[str, Optional[str]]:
+        """From, Subject, Message-ID and threadId of a message being replied to.
+
+        Read from the local message store when it has them; otherwise fetched
+        with format='metadata', which skips the body.
+        """
+        try:
+            async with async_session_maker() as session:
+                stored = await session.get(GmailMessage, email_id)
+            if stored is not None and stored.message_id_header:
+                return {
+                    "from": stored.sender or '',
+                    "subject": stored.subject or '',
+                    "message_id": stored.message_id_header,
+                    "thread_id": stored.thread_id
+                }
+        except Exception as e:
+            print(f"Error reading stored message {email_id}: {e}")
+
+        await gmail_quota.acquire(GET_COST)
+        original = await self._run(
+            lambda: self.service.users().messages().get(
+                userId='me',
+                id=email_id,
+                format='metadata',
+                metadataHeaders=['From', 'Subject', 'Message-ID']
+            ).execute(http=self._http())
+        )
+        headers = self._headers(original)
+        return {
+            "from": headers.get('from', ''),
+            "subject": headers.get('subject', ''),
+            "message_id": headers.get('message-id', ''),
+            "thread_id": original.get('threadId')
+        }
+
+    @staticmethod
+    def _headers(msg_data: Dict) -> Dict[str, str]:
+        """Message headers keyed by lower-cased name (Gmail mixes Message-ID and Message-Id)"""
+        return {h['name'].lower(): h['value'] for h in msg_data['payload'].get('headers', [])}
+
+    async def list_history(self, start_history_id: str) -> Dict[str, Any]:
+        """List inbox changes since start_history_id.
+
+        Returns all history records across pages plus the latest historyId.
+        Raises HttpError (404) if start_history_id is too old to be served.
+        """
+        def run():
+            records = []
+            page_token = None
+            latest_history_id = start_history_id
+            while True:
+                response = self.service.users().history().list(
+                    userId='me',
+                    startHistoryId=start_history_id,
+                    labelId='INBOX',
+                    historyTypes=['messageAdded', 'messageDeleted', 'labelAdded', 'labelRemoved'],
+                    pageToken=page_token
+                ).execute(http=self._http())
+                records.extend(response.get('history', []))
+                latest_history_id = response.get('historyId', latest_history_id)
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    return {"history": records, "historyId": latest_history_id}
+        
+        await gmail_quota.acquire(HISTORY_COST)
+        return await self._run(run)
+
+    async def fetch_messages(self, message_ids: List[str]) -> List[Dict]:
+        """Fetch full messages by id using Gmail batch requests, preserving order"""
+        if not message_ids:
+            return []
+        
+        chunks = [
+            message_ids[i:i + GMAIL_BATCH_SIZE]
+            for i in range(0, len(message_ids), GMAIL_BATCH_SIZE)
+        ]
+        async def fetch_chunk(chunk):
+            await gmail_quota.acquire(GET_COST * len(chunk))
+            return await self._run(self._fetch_batch, chunk)
+        
+        # Each chunk is one HTTP round trip; chunks run concurrently off the event loop
+        results = await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks))
+        
+        by_id = {}
+        for chunk_result in results:
+            by_id.update(chunk_result)
+        return [by_id[msg_id] for msg_id in message_ids if msg_id in by_id]
+
+    def _fetch_batch(self, message_ids: List[str]) -> Dict[str, Dict]:
+        """Fetch up to GMAIL_BATCH_SIZE messages in a single batch request (blocking)"""
+        responses = {}
+        
+        def on_response(request_id, response, exception):
+            if exception is not None:
+                print(f"Error fetching message {request_id}: {exception}")
+                return
+            responses[request_id] = response
+        
+        batch = self.service.new_batch_http_request(callback=on_response)
+        for msg_id in message_ids:
+            batch.add(
+                self.service.users().messages().get(userId='me', id=msg_id, format='full'),
+                request_id=msg_id
+            )
+        batch.execute(http=self._http())
+        
+        return {msg_id: self._parse_message(msg_data) for msg_id, msg_data in responses.items()}
+
+    def _http(self) -> AuthorizedHttp:
+        """Per-thread authorized HTTP transport (httplib2 is not thread-safe)"""
+        http = getattr(self._thread_local, "http", None)
+        if http is None or http.credentials is not self.user_credentials:
+            http = AuthorizedHttp(self.user_credentials, http=httplib2.Http(timeout=GMAIL_CALL_TIMEOUT))
+            self._thread_local.http = http
+        return http
+
+    def _parse_message(self, msg_data: Dict) -> Dict:
+        """Convert a Gmail API message resource into our email dict"""
+        headers = {h['name']: h['value'] for h in msg_data['payload']['headers']}
+        message_id = self._headers(msg_data).get('message-id', '')
+        
+        # Extract body
+        body = ""
+        if 'parts' in msg_data['payload']:
+            for part in msg_data['payload']['parts']:
+                if part['mimeType'] == 'text/plain':
+                    body = base64.urlsafe_b64decode(part['body']['data']).decode('utf-8')
+                    break
+        elif 'body' in msg_data['payload'] and 'data' in msg_data['payload']['body']:
+            body = base64.urlsafe_b64decode(msg_data['payload']['body']['data']).decode('utf-8')
+        
+        return {
+            "id": msg_data['id'],
+            "thread_id": msg_data.get('threadId'),
+            "message_id": message_id,
+            "internal_date": int(msg_data.get('internalDate', 0)),
+            "subject": headers.get('Subject', 'No Subject'),
+            "from": headers.get('From', 'Unknown'),
+            "date": headers.get('Date', ''),
+            "snippet": msg_data.get('snippet', ''),
+            "category": self._categorize_email(headers, body),
+            "priority": self._get_priority(headers, body),
+            "unread": 'UNREAD' in msg_data.get('labelIds', []),
+            "body": body[:500]  # Truncate for display
+        }
+
     def _categorize_email(self, headers: Dict, body: str) -> str:
         """Simple email categorization"""
         subject = headers.get('Subject', '').lower()
@@ -262,8 +596,8 @@ class GmailService:
         """Send a reply to an email"""
         print(f"Attempting to send reply to email {email_id}")
         
+        await self.sync_shared_credentials()
         if self.mock_mode:
-            import asyncio
             await asyncio.sleep(1)
             print("Mock mode: simulating reply sent")
             return {
@@ -272,39 +606,29 @@ class GmailService:
                 "message": "Reply sent (mock mode)"
             }
         
-        if not self.is_connected():
+        if not await self.is_connected():
             return {"success": False, "error": "Gmail is not connected. Please connect in Settings."}
         
         try:
-            # Get original message
-            original = self.service.users().messages().get(
-                userId='me',
-                id=email_id,
-                format='full'
-            ).execute()
-            
-            headers = {h['name']: h['value'] for h in original['payload']['headers']}
+            # Headers of the original message (local store first)
+            original = await self._reply_headers(email_id)
             
             # Get user's email address for 'from' header
-            profile = self.service.users().getProfile(userId='me').execute()
-            user_email = profile.get('emailAddress', '')
+            user_email = await self.get_user_email()
             
             # Create reply
             message = MIMEText(content)
             message['from'] = user_email
-            message['to'] = headers.get('From', '')
-            message['subject'] = f"Re: {headers.get('Subject', '')}"
-            message['In-Reply-To'] = headers.get('Message-ID', '')
-            message['References'] = headers.get('Message-ID', '')
+            message['to'] = original['from']
+            message['subject'] = f"Re: {original['subject']}"
+            message['In-Reply-To'] = original['message_id']
+            message['References'] = original['message_id']
             
             raw = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
             
-            print(f"Sending reply from {user_email} to {headers.get('From', '')}")
+            print(f"Sending reply from {user_email} to {original['from']}")
             
-            sent = self.service.users().messages().send(
-                userId='me',
-                body={'raw': raw, 'threadId': original.get('threadId')}
-            ).execute()
+            sent = await self._send_message({'raw': raw, 'threadId': original['thread_id']})
             
             print(f"Reply sent successfully with id: {sent['id']}")
             
@@ -315,15 +639,14 @@ class GmailService:
             }
         except Exception as e:
             print(f"Error sending reply: {e}")
-            return {"success": False, "error": str(e)}
+            return {"success": False, "error": str(e), "rate_limited": self._is_rate_limited(e)}
 
     async def send_email(self, to: str, subject: str, body: str) -> Dict[str, Any]:
         """Send a new email"""
         print(f"Attempting to send email to {to}")
         
+        await self.sync_shared_credentials()
         if self.mock_mode:
-            import asyncio
-            from datetime import datetime
             await asyncio.sleep(1)
             print("Mock mode: simulating email sent")
             return {
@@ -332,13 +655,12 @@ class GmailService:
                 "message": "Email sent (mock mode)"
             }
 
-        if not self.is_connected():
+        if not await self.is_connected():
             return {"success": False, "error": "Gmail is not connected. Please connect in Settings."}
             
         try:
             # Get user's email address
-            profile = self.service.users().getProfile(userId='me').execute()
-            user_email = profile.get('emailAddress', '')
+            user_email = await self.get_user_email()
             
             message = MIMEText(body)
             message['from'] = user_email
@@ -347,10 +669,7 @@ class GmailService:
             
             raw = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
             
-            sent = self.service.users().messages().send(
-                userId='me',
-                body={'raw': raw}
-            ).execute()
+            sent = await self._send_message({'raw': raw})
             
             return {
                 "success": True,
@@ -359,13 +678,20 @@ class GmailService:
             }
         except Exception as e:
             print(f"Error sending email: {e}")
-            return {"success": False, "error": str(e)}
+            return {"success": False, "error": str(e), "rate_limited": self._is_rate_limited(e)}
 
     async def disconnect(self):
-        """Disconnect Gmail account"""
-        self.user_credentials = None
-        self.service = None
-        self.mock_mode = True
+        """Disconnect Gmail account (in every worker)"""
+        self._drop_credentials()
+        # Otherwise a restarted worker would import it and reconnect everyone
+        if os.path.exists(self.token_file):
+            os.remove(self.token_file)
+        try:
+            async with async_session_maker() as session:
+                await session.execute(delete(GmailCredentials).where(GmailCredentials.id == GMAIL_CREDENTIALS_ID))
+                await session.commit()
+        except Exception as e:
+            print(f"Error removing shared credentials: {e}")
         return {"success": True, "message": "Disconnected from Gmail"}
 
 
@@ -0,0 +1,297 @@
+"""
+Gmail Sync Service - Keeps a local copy of the inbox in the database.
+
+The first sync downloads the newest inbox messages and remembers the account's
+historyId. Later syncs ask Gmail only for what changed since then
+(users().history().list), so steady-state reads cost O(changes), not O(inbox).
+
+With several worker processes only one syncs at a time: it takes a lease
+(a user_settings row) in a short transaction, calls Gmail with no database
+connection held, and writes the results in another short transaction. The
+others skip that round and read what it stored. A lease left by a worker
+that died expires after GMAIL_SYNC_LEASE_SECONDS.
+
+The store keeps the newest GMAIL_STORE_MAX_MESSAGES messages; older ones are
+fetched from Gmail when asked for.
+"""
+import os
+import time
+import socket
+import asyncio
+from typing import List, Dict, Optional
+
+from googleapiclient.errors import HttpError
+from sqlalchemy import select, delete, update
+from sqlalchemy.exc import IntegrityError
+
+from app.database import async_session_maker
+from app.models import GmailMessage, UserSettings
+from app.services.gmail_service import gmail_service
+from app.services.event_bus import event_bus
+from app.services.draft_prefetcher import draft_prefetcher
+
+HISTORY_ID_KEY = "gmail_history_id"
+# "<owner> <expires at, epoch seconds>" of the worker currently syncing
+SYNC_LEASE_KEY = "gmail_sync_lease"
+GMAIL_SYNC_LEASE_SECONDS = float(os.getenv("GMAIL_SYNC_LEASE_SECONDS", "120"))
+GMAIL_STORE_MAX_MESSAGES = int(os.getenv("GMAIL_STORE_MAX_MESSAGES", "1000"))
+
+
+class GmailSyncService:
+    def __init__(self):
+        # Number of inbox messages downloaded on a full sync
+        self.full_sync_size = int(os.getenv("GMAIL_SYNC_MAX_MESSAGES", "100"))
+        # Minimum seconds between two history checks
+        self.min_interval = float(os.getenv("GMAIL_SYNC_INTERVAL", "10"))
+        self._lock = asyncio.Lock()
+        self._last_sync = 0.0
+        self._owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    async def get_emails(self, max_results: int = 20) -> List[Dict]:
+        """Read the newest inbox messages from the local store (syncing first)"""
+        await gmail_service.sync_shared_credentials()
+        if gmail_service.mock_mode:
+            emails = await gmail_service.fetch_emails(max_results=max_results)
+            draft_prefetcher.schedule(emails)
+            return emails
+
+        if not await gmail_service.is_connected():
+            return []
+
+        try:
+            await self.sync()
+            async with async_session_maker() as session:
+                result = await session.execute(
+                    select(GmailMessage)
+                    .order_by(GmailMessage.internal_date.desc())
+                    .limit(max_results)
+                )
+                return [m.to_dict() for m in result.scalars().all()]
+        except Exception as e:
+            print(f"Error reading synced emails: {e}")
+            emails = await gmail_service.fetch_emails(max_results=max_results)
+            draft_prefetcher.schedule(emails)
+            return emails
+
+    async def get_email(self, email_id: str) -> Optional[Dict]:
+        """Look up a single message by id"""
+        await gmail_service.sync_shared_credentials()
+        if gmail_service.mock_mode or not await gmail_service.is_connected():
+            emails = await gmail_service.fetch_emails()
+            return next((e for e in emails if e["id"] == email_id), None)
+
+        try:
+            await self.sync()
+            async with async_session_maker() as session:
+                message = await session.get(GmailMessage, email_id)
+                if message:
+                    return message.to_dict()
+        except Exception as e:
+            print(f"Error reading synced email {email_id}: {e}")
+
+        # Not in the local window (older mail) - fetch it directly
+        try:
+            emails = await gmail_service.fetch_messages([email_id])
+            return emails[0] if emails else None
+        except Exception as e:
+            print(f"Error fetching email {email_id}: {e}")
+            return None
+
+    async def get_emails_by_id(self, email_ids: List[str]) -> Dict[str, Dict]:
+        """Look up many messages at once: one local query, then one batch fetch for the rest"""
+        await gmail_service.sync_shared_credentials()
+        if gmail_service.mock_mode or not await gmail_service.is_connected():
+            emails = await gmail_service.fetch_emails()
+            return {e["id"]: e for e in emails if e["id"] in email_ids}
+
+        found = {}
+        try:
+            await self.sync()
+            async with async_session_maker() as session:
+                result = await session.execute(select(GmailMessage).where(GmailMessage.id.in_(email_ids)))
+                found = {m.id: m.to_dict() for m in result.scalars().all()}
+        except Exception as e:
+            print(f"Error reading synced emails: {e}")
+
+        missing = [email_id for email_id in email_ids if email_id not in found]
+        if missing:
+            try:
+                found.update({e["id"]: e for e in await gmail_service.fetch_messages(missing)})
+            except Exception as e:
+                print(f"Error fetching emails: {e}")
+        return found
+
+    async def sync(self, force: bool = False):
+        """Bring the local store up to date with Gmail"""
+        async with self._lock:
+            if not force and time.monotonic() - self._last_sync < self.min_interval:
+                return
+
+            while not await self._acquire_lease():
+                if not force:
+                    # Another worker is syncing right now
+                    self._last_sync = time.monotonic()
+                    return
+                await asyncio.sleep(0.5)
+
+            try:
+                history_id = await self._get_history_id()
+                if history_id is None:
+                    await self._full_sync()
+                else:
+                    try:
+                        await self._incremental_sync(history_id)
+                    except HttpError as e:
+                        if e.resp.status != 404:
+                            raise
+                        # historyId expired (Gmail keeps roughly a week) - start over
+                        print("Gmail history expired, running full sync")
+                        await self._full_sync()
+            finally:
+                await self._release_lease()
+
+            self._last_sync = time.monotonic()
+
+    async def _acquire_lease(self) -> bool:
+        """Take the sync lease unless another worker holds an unexpired one"""
+        now = time.time()
+        try:
+            async with async_session_maker() as session:
+                result = await session.execute(
+                    select(UserSettings).where(UserSettings.key == SYNC_LEASE_KEY).with_for_update()
+                )
+                lease = result.scalar_one_or_none()
+                if lease is None:
+                    lease = UserSettings(key=SYNC_LEASE_KEY)
+                    session.add(lease)
+                elif lease.value:
+                    owner, expires = lease.value.rsplit(" ", 1)
+                    if owner != self._owner and float(expires) > now:
+                        return False
+                lease.value = f"{self._owner} {now + GMAIL_SYNC_LEASE_SECONDS}"
+                await session.commit()
+                return True
+        except IntegrityError:
+            # Another worker created the lease row first
+            return False
+
+    async def _release_lease(self):
+        try:
+            async with async_session_maker() as session:
+                await session.execute(
+                    update(UserSettings)
+                    .where(UserSettings.key == SYNC_LEASE_KEY, UserSettings.value.startswith(f"{self._owner} "))
+                    .values(value=None)
+                )
+                await session.commit()
+        except Exception as e:
+            print(f"Error releasing Gmail sync lease: {e}")
+
+    async def reset(self):
+        """Forget all synced state (e.g. when the connected account changes)"""
+        async with self._lock:
+            self._last_sync = 0.0
+            try:
+                async with async_session_maker() as session:
+                    await session.execute(delete(GmailMessage))
+                    await session.execute(delete(UserSettings).where(UserSettings.key == HISTORY_ID_KEY))
+                    await session.commit()
+            except Exception as e:
+                print(f"Error resetting Gmail sync state: {e}")
+
+    async def _full_sync(self):
+        # Read historyId before listing so changes made meanwhile are picked up next time
+        profile = await gmail_service.get_profile()
+        message_ids = await gmail_service.list_message_ids(max_results=self.full_sync_size)
+        emails = await gmail_service.fetch_messages(message_ids)
+
+        async with async_session_maker() as session:
+            await session.execute(delete(GmailMessage))
+            session.add_all([GmailMessage.from_email(e) for e in emails])
+            await self._save_history_id(session, profile["historyId"])
+            await session.commit()
+
+        print(f"Gmail full sync: stored {len(emails)} messages")
+        draft_prefetcher.schedule(emails)
+        event_bus.publish("inbox_synced", "email-reader", {"full": True, "stored": len(emails)})
+
+    async def _incremental_sync(self, history_id: str):
+        changes = await gmail_service.list_history(history_id)
+
+        added, removed, read_state = set(), set(), {}
+        for record in changes["history"]:
+            for item in record.get("messagesAdded", []):
+                if "INBOX" in item["message"].get("labelIds", []):
+                    added.add(item["message"]["id"])
+            for item in record.get("messagesDeleted", []):
+                removed.add(item["message"]["id"])
+            for item in record.get("labelsAdded", []):
+                msg_id = item["message"]["id"]
+                if "INBOX" in item["labelIds"]:
+                    added.add(msg_id)
+                if "UNREAD" in item["labelIds"]:
+                    read_state[msg_id] = True
+            for item in record.get("labelsRemoved", []):
+                msg_id = item["message"]["id"]
+                if "INBOX" in item["labelIds"]:
+                    removed.add(msg_id)
+                if "UNREAD" in item["labelIds"]:
+                    read_state[msg_id] = False
+
+        added -= removed
+        emails = await gmail_service.fetch_messages(list(added)) if added else []
+
+        async with async_session_maker() as session:
+            if removed:
+                await session.execute(delete(GmailMessage).where(GmailMessage.id.in_(removed)))
+            for email in emails:
+                await session.merge(GmailMessage.from_email(email))
+            for msg_id, unread in read_state.items():
+                if msg_id not in added and msg_id not in removed:
+                    await session.execute(
+                        update(GmailMessage).where(GmailMessage.id == msg_id).values(unread=unread)
+                    )
+            await self._trim(session)
+            await self._save_history_id(session, changes["historyId"])
+            await session.commit()
+
+        draft_prefetcher.schedule(emails)
+        if added or removed or read_state:
+            print(f"Gmail incremental sync: +{len(emails)} -{len(removed)} ~{len(read_state)}")
+            event_bus.publish("inbox_synced", "email-reader", {
+                "full": False,
+                "added": len(emails),
+                "removed": len(removed),
+                "read_state_changed": len(read_state)
+            })
+
+    async def _trim(self, session):
+        """Drop all but the newest GMAIL_STORE_MAX_MESSAGES messages"""
+        result = await session.execute(
+            select(GmailMessage.internal_date)
+            .order_by(GmailMessage.internal_date.desc())
+            .offset(GMAIL_STORE_MAX_MESSAGES - 1)
+            .limit(1)
+        )
+        oldest_kept = result.scalar_one_or_none()
+        if oldest_kept is not None:
+            await session.execute(delete(GmailMessage).where(GmailMessage.internal_date < oldest_kept))
+
+    async def _get_history_id(self) -> Optional[str]:
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(UserSettings.value).where(UserSettings.key == HISTORY_ID_KEY)
+            )
+            return result.scalar_one_or_none()
+
+    async def _save_history_id(self, session, history_id):
+        result = await session.execute(select(UserSettings).where(UserSettings.key == HISTORY_ID_KEY))
+        setting = result.scalar_one_or_none()
+        if setting:
+            setting.value = str(history_id)
+        else:
+            session.add(UserSettings(key=HISTORY_ID_KEY, value=str(history_id)))
+
+
+# Singleton instance
+gmail_sync_service = GmailSyncService()
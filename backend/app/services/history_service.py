@@ -1,89 +1,371 @@
 """
 History Service - Hybrid storage using both file and database
 For production, use database-only storage
+
+The file is an append-only JSONL log. The last HISTORY_MAX_MESSAGES messages
+are kept in memory, so saving is a single appended line and reads never parse
+the file. The log is compacted back down to that tail once it grows to twice
+the limit. Writers in other processes are safe: every write holds an
+exclusive flock, and each process catches up on lines it did not write.
+Inside the app the appends (flock, write, compaction fsync) run on a worker
+thread, so save_message never blocks the event loop; messages waiting to be
+written are already returned by load_history. Reads and clears from the app
+go through get_history() and clear(), which run on a worker thread too.
+
+The log is local to the machine. HISTORY_BACKEND=db (the default when
+WEB_CONCURRENCY is above 1) serves get_history() and get_recent_context()
+from the chat_messages table instead, so every worker and node reads the
+same history; this worker's messages still waiting for the write-behind are
+added to what the table returns.
+
+Database copies are written behind: messages are queued and inserted with
+multi-row INSERTs every HISTORY_DB_FLUSH_SIZE messages or HISTORY_DB_FLUSH_MS
+milliseconds. The queue is drained on shutdown (see stop()).
 """
 import json
 import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
 import asyncio
 
-HISTORY_FILE = "data/chat_history.json"
+from app.services.metrics import LatencyTracker
+
+try:
+    import fcntl
+except ImportError:  # Windows: only in-process locking
+    fcntl = None
+
+HISTORY_FILE = "data/chat_history.jsonl"
+# Pre-JSONL history, imported once on startup
+LEGACY_HISTORY_FILE = "data/chat_history.json"
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "500"))
+HISTORY_DB_FLUSH_SIZE = int(os.getenv("HISTORY_DB_FLUSH_SIZE", "100"))
+HISTORY_DB_FLUSH_MS = int(os.getenv("HISTORY_DB_FLUSH_MS", "500"))
+# Beyond this many unsaved messages the oldest are dropped from the DB queue
+HISTORY_DB_QUEUE_MAX = int(os.getenv("HISTORY_DB_QUEUE_MAX", "10000"))
 
 
 class HistoryService:
     def __init__(self):
         os.makedirs("data", exist_ok=True)
-        if not os.path.exists(HISTORY_FILE):
-            with open(HISTORY_FILE, "w") as f:
-                json.dump([], f)
+        default_backend = "db" if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 else "file"
+        self.backend = os.getenv("HISTORY_BACKEND", default_backend).lower()
+        self._lock = threading.Lock()
+        self._tail = deque(maxlen=HISTORY_MAX_MESSAGES)
+        # What we have read of the log so far
+        self._inode: Optional[int] = None
+        self._offset = 0
+        self._lines = 0
+        # Saved messages not yet appended to the log, and the thread appending them
+        self._unwritten: deque = deque()
+        self._writer: Optional[asyncio.Future] = None
+        # Write-behind queue of ChatMessage rows
+        self._pending: deque = deque()
+        self._flush_wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self.flush_latency = LatencyTracker()
+        self.db_saved = 0
+        self.db_dropped = 0
+        self.db_errors = 0
+
+        with self._locked_log() as f:
+            self._import_legacy(f)
+            self._sync(f)
+
+    async def start(self):
+        if self._flusher is None:
+            self._flush_wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flusher and write out everything still queued"""
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        while self._writer is not None:
+            await self._writer
+        if self._flush_lock is None:
+            return
+        while self._pending:
+            if not await self._flush():
+                print(f"Dropping {len(self._pending)} chat messages not saved to DB")
+                break
+
+    @contextmanager
+    def _locked_log(self):
+        """Open the log with an exclusive lock, retrying if it was compacted meanwhile"""
+        with self._lock:
+            while True:
+                f = open(HISTORY_FILE, "ab+")
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    if os.fstat(f.fileno()).st_ino == os.stat(HISTORY_FILE).st_ino:
+                        break
+                except FileNotFoundError:
+                    pass
+                f.close()
+            try:
+                yield f
+            finally:
+                f.close()  # also releases the flock
+
+    def _sync(self, f):
+        """Read lines appended (by any process) since our last read"""
+        st = os.fstat(f.fileno())
+        if st.st_ino != self._inode or st.st_size < self._offset:
+            # Compacted or cleared elsewhere: start over from the new file
+            self._tail.clear()
+            self._inode = st.st_ino
+            self._offset = 0
+            self._lines = 0
+        if st.st_size == self._offset:
+            return
+
+        f.seek(self._offset)
+        for line in f.read(st.st_size - self._offset).splitlines():
+            try:
+                self._tail.append(json.loads(line))
+                self._lines += 1
+            except ValueError:
+                continue
+        self._offset = st.st_size
+
+    def _is_current(self) -> bool:
+        try:
+            st = os.stat(HISTORY_FILE)
+        except FileNotFoundError:
+            return False
+        return st.st_ino == self._inode and st.st_size == self._offset
+
+    def _import_legacy(self, f):
+        if not os.path.exists(LEGACY_HISTORY_FILE) or os.fstat(f.fileno()).st_size > 0:
+            return
+        try:
+            with open(LEGACY_HISTORY_FILE, "r") as legacy:
+                messages = json.load(legacy)
+            f.write("".join(json.dumps(m) + "\n" for m in messages[-HISTORY_MAX_MESSAGES:]).encode())
+            f.flush()
+            os.replace(LEGACY_HISTORY_FILE, LEGACY_HISTORY_FILE + ".imported")
+            print(f"Imported {len(messages)} messages from {LEGACY_HISTORY_FILE}")
+        except Exception as e:
+            print(f"Error importing legacy history: {e}")
+
+    def _compact(self):
+        """Rewrite the log as just the in-memory tail (caller holds the lock)"""
+        tmp_path = HISTORY_FILE + ".tmp"
+        with open(tmp_path, "wb") as tmp:
+            tmp.write("".join(json.dumps(m) + "\n" for m in self._tail).encode())
+            tmp.flush()
+            os.fsync(tmp.fileno())
+            st = os.fstat(tmp.fileno())
+        os.replace(tmp_path, HISTORY_FILE)
+        self._inode = st.st_ino
+        self._offset = st.st_size
+        self._lines = len(self._tail)
 
     def load_history(self) -> List[Dict]:
-        """Load chat history from file (sync for backward compatibility)"""
+        """Load chat history (sync for backward compatibility)"""
         try:
-            with open(HISTORY_FILE, "r") as f:
-                return json.load(f)
+            if not self._is_current():
+                with self._locked_log() as f:
+                    self._sync(f)
+            with self._lock:
+                return (list(self._tail) + list(self._unwritten))[-HISTORY_MAX_MESSAGES:]
         except Exception as e:
             print(f"Error loading history: {e}")
-            return []
+            return list(self._tail)
+
+    async def get_history(self) -> List[Dict]:
+        """Chat history for callers on the event loop, from the configured backend"""
+        if self.backend == "db":
+            return await self.load_history_from_db()
+        return await asyncio.get_running_loop().run_in_executor(None, self.load_history)
 
     async def load_history_from_db(self) -> List[Dict]:
-        """Load chat history from database"""
+        """Load the last HISTORY_MAX_MESSAGES messages from the database"""
         from app.database import async_session_maker
         from app.models import ChatMessage
         from sqlalchemy import select
-        
+
+        # Taken before the query: a message flushed meanwhile is then in both,
+        # and dropped from these below
+        pending = [
+            {**m, "id": str(int(m["timestamp"].timestamp() * 1000)), "timestamp": m["timestamp"].isoformat()}
+            for m in list(self._pending)
+        ]
         try:
             async with async_session_maker() as session:
                 result = await session.execute(
-                    select(ChatMessage).order_by(ChatMessage.timestamp.asc()).limit(100)
+                    select(ChatMessage)
+                    .order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc())
+                    .limit(HISTORY_MAX_MESSAGES)
                 )
-                messages = result.scalars().all()
-                return [m.to_dict() for m in messages]
+                messages = [m.to_dict() for m in reversed(result.scalars().all())]
         except Exception as e:
             print(f"Error loading history from DB: {e}")
-            return self.load_history()  # Fallback to file
+            # Fallback to this machine's file
+            return await asyncio.get_running_loop().run_in_executor(None, self.load_history)
+        saved = {(m["session_id"], m["role"], m["content"], m["timestamp"]) for m in messages}
+        pending = [m for m in pending if (m["session_id"], m["role"], m["content"], m["timestamp"]) not in saved]
+        return (messages + pending)[-HISTORY_MAX_MESSAGES:]
 
     def save_message(self, role: str, content: str, session_id: str = None):
-        """Save a message to file (sync)"""
+        """Append a message to the log; on a worker thread when called from the event loop"""
+        self._unwritten.append({
+            "id": str(int(datetime.now().timestamp() * 1000)),
+            "role": role,
+            "content": content,
+            "session_id": session_id,
+            "timestamp": datetime.now().isoformat()
+        })
         try:
-            history = self.load_history()
-            history.append({
-                "id": str(int(datetime.now().timestamp() * 1000)),
-                "role": role,
-                "content": content,
-                "session_id": session_id,
-                "timestamp": datetime.now().isoformat()
-            })
-            
-            # Keep last 500 messages
-            if len(history) > 500:
-                history = history[-500:]
-            
-            with open(HISTORY_FILE, "w") as f:
-                json.dump(history, f, indent=2)
-                
-            # Also save to database async
-            asyncio.create_task(self._save_to_db(role, content, session_id))
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Scripts: write right away
+            self._write_unwritten()
+        else:
+            self._schedule_write(loop)
+
+        # Also save to database, written behind
+        self._queue_for_db(role, content, session_id)
+
+    def _schedule_write(self, loop: asyncio.AbstractEventLoop):
+        if self._writer is None:
+            self._writer = loop.run_in_executor(None, self._write_unwritten)
+            self._writer.add_done_callback(lambda _: self._write_done(loop))
+
+    def _write_done(self, loop: asyncio.AbstractEventLoop):
+        self._writer = None
+        # Saved while the last write was running
+        if self._unwritten:
+            self._schedule_write(loop)
+
+    def _write_unwritten(self):
+        """Append every unwritten message to the log in one write"""
+        try:
+            with self._locked_log() as f:
+                self._sync(f)
+                messages = [self._unwritten.popleft() for _ in range(len(self._unwritten))]
+                f.write("".join(json.dumps(m) + "\n" for m in messages).encode())
+                f.flush()
+                self._offset = f.tell()
+                self._tail.extend(messages)
+                self._lines += len(messages)
+                if self._lines >= 2 * HISTORY_MAX_MESSAGES:
+                    self._compact()
         except Exception as e:
-            print(f"Error saving history: {e}")
+            # Don't retry in a loop; these messages only reach the database
+            print(f"Error saving history, {len(self._unwritten)} message(s) not written: {e}")
+            self._unwritten.clear()
+
+    def _queue_for_db(self, role: str, content: str, session_id: str = None):
+        if len(self._pending) >= HISTORY_DB_QUEUE_MAX:
+            self._pending.popleft()
+            self.db_dropped += 1
+        self._pending.append({
+            "role": role,
+            "content": content,
+            "session_id": session_id,
+            "timestamp": datetime.utcnow()
+        })
+        if self._flusher is None:
+            # Outside the app lifespan (scripts); start on first use
+            try:
+                asyncio.get_running_loop().create_task(self.start())
+            except RuntimeError:
+                return
+        elif len(self._pending) >= HISTORY_DB_FLUSH_SIZE:
+            self._flush_wakeup.set()
 
-    async def _save_to_db(self, role: str, content: str, session_id: str = None):
-        """Save message to database"""
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), HISTORY_DB_FLUSH_MS / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            while self._pending:
+                # Shielded so shutdown never abandons a half-written batch
+                if not await asyncio.shield(self._flush()):
+                    # Database unavailable; keep the messages and back off
+                    await asyncio.sleep(5)
+                    break
+                if len(self._pending) < HISTORY_DB_FLUSH_SIZE:
+                    break
+
+    async def _flush(self) -> bool:
+        """Insert up to HISTORY_DB_FLUSH_SIZE queued messages in one statement"""
         from app.database import async_session_maker
         from app.models import ChatMessage
-        
-        try:
-            async with async_session_maker() as session:
-                message = ChatMessage(role=role, content=content, session_id=session_id)
-                session.add(message)
-                await session.commit()
-        except Exception as e:
-            print(f"Error saving to DB: {e}")
+        from sqlalchemy import insert
+        from sqlalchemy.exc import IntegrityError
 
-    def get_recent_context(self, limit: int = 5) -> str:
+        async with self._flush_lock:
+            batch = [self._pending.popleft() for _ in range(min(HISTORY_DB_FLUSH_SIZE, len(self._pending)))]
+            if not batch:
+                return True
+            started = time.perf_counter()
+            try:
+                async with async_session_maker() as session:
+                    await session.execute(insert(ChatMessage), batch)
+                    await session.commit()
+            except IntegrityError:
+                # e.g. a message for a session deleted meanwhile; save the rest one by one
+                batch = await self._insert_individually(batch)
+            except Exception as e:
+                print(f"Error saving to DB: {e}")
+                self.db_errors += 1
+                self._pending.extendleft(reversed(batch))
+                return False
+            self.flush_latency.observe(time.perf_counter() - started)
+            self.db_saved += len(batch)
+            return True
+
+    async def _insert_individually(self, batch: List[Dict]) -> List[Dict]:
+        from app.database import async_session_maker
+        from app.models import ChatMessage
+        from sqlalchemy import insert
+
+        saved = []
+        for row in batch:
+            try:
+                async with async_session_maker() as session:
+                    await session.execute(insert(ChatMessage), [row])
+                    await session.commit()
+                saved.append(row)
+            except Exception as e:
+                print(f"Error saving to DB: {e}")
+                self.db_dropped += 1
+        return saved
+
+    def discard_session(self, session_id: str):
+        """Forget queued DB writes for a session that is being deleted"""
+        self._pending = deque(m for m in self._pending if m["session_id"] != session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "db_queue_depth": len(self._pending),
+            "db_saved": self.db_saved,
+            "db_dropped": self.db_dropped,
+            "db_errors": self.db_errors,
+            "db_flush_latency": self.flush_latency.stats()
+        }
+
+    async def get_recent_context(self, limit: int = 5) -> str:
         """Get recent messages as context string"""
-        history = self.load_history()
+        history = await self.get_history()
         context = ""
         for msg in history[-limit:]:
             content = msg.get('content', '')
@@ -94,15 +376,27 @@ class HistoryService:
 
     def clear_history(self):
         """Clear chat history from file"""
-        with open(HISTORY_FILE, "w") as f:
-            json.dump([], f)
+        with self._locked_log() as f:
+            f.truncate(0)
+            self._unwritten.clear()
+            self._tail.clear()
+            self._offset = 0
+            self._lines = 0
+
+    async def clear(self):
+        """clear_history on a worker thread, for callers on the event loop"""
+        await asyncio.get_running_loop().run_in_executor(None, self.clear_history)
+        if self.backend == "db":
+            # Otherwise the history is still served from the table
+            await self.clear_history_db()
 
     async def clear_history_db(self):
         """Clear chat history from database"""
         from app.database import async_session_maker
         from app.models import ChatMessage
         from sqlalchemy import delete
-        
+
+        self._pending.clear()
         try:
             async with async_session_maker() as session:
                 await session.execute(delete(ChatMessage))
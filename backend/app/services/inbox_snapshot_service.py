@@ -0,0 +1,61 @@
+"""
+Inbox Snapshot Service - Short-lived per-session copies of the inbox for chat.
+
+A conversation refers to "the 1st email" across several turns, so each chat
+session keeps the list it was shown for CHAT_INBOX_TTL seconds. Numbering
+stays stable between turns and the inbox is not re-read on every message.
+Only chat handlers that actually need emails ask for one.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.services.gmail_sync_service import gmail_sync_service
+from app.services.singleflight import SingleFlight
+
+
+class InboxSnapshotService:
+    def __init__(self):
+        self.ttl = float(os.getenv("CHAT_INBOX_TTL", "60"))
+        self.max_sessions = int(os.getenv("CHAT_INBOX_MAX_SESSIONS", "256"))
+        self._snapshots: "OrderedDict[str, Tuple[float, List[Dict]]]" = OrderedDict()
+        self._singleflight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, session_id: Optional[str], max_results: int = 20) -> List[Dict]:
+        key = f"{session_id or ''}:{max_results}"
+        entry = self._snapshots.get(key)
+        if entry and time.monotonic() - entry[0] < self.ttl:
+            self._snapshots.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        emails = await self._singleflight.do(key, lambda: gmail_sync_service.get_emails(max_results=max_results))
+        self._snapshots[key] = (time.monotonic(), emails)
+        self._snapshots.move_to_end(key)
+        while len(self._snapshots) > self.max_sessions:
+            self._snapshots.popitem(last=False)
+        return emails
+
+    def invalidate(self, session_id: Optional[str] = None):
+        """Drop one session's snapshot, or all of them (e.g. on disconnect)"""
+        if session_id is None:
+            self._snapshots.clear()
+            return
+        prefix = f"{session_id}:"
+        for key in [k for k in self._snapshots if k.startswith(prefix)]:
+            del self._snapshots[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._snapshots),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# Singleton instance
+inbox_snapshot_service = InboxSnapshotService()
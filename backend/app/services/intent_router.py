@@ -0,0 +1,156 @@
+"""
+Intent Router - Declarative intent table for the chat endpoint.
+
+Intents are checked in priority order, so the precedence between them is
+spelled out in one place instead of being implied by a chain of
+if-statements. The table is compiled once into tuples of substrings plus
+precompiled whole-word patterns; evaluation stops at the first matching
+intent.
+
+Keywords match as substrings, like the original checks did. Wrap a keyword
+in \\b...\\b to match it as a whole word only.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+TONES = ["professional", "friendly", "casual", "formal", "urgent"]
+TASK_KEYWORDS = ("task", "sub task", "plan", "checklist", "workflow")
+SUMMARY_KEYWORDS = ("summarize", "summary")
+WHOLE_WORD = re.compile(r"^\\b(.+)\\b$")
+
+
+@dataclass(frozen=True)
+class Intent:
+    name: str
+    # Every group must have at least one keyword present
+    all_of: Tuple[FrozenSet[str], ...] = ()
+    # No keyword from here may be present
+    none_of: FrozenSet[str] = field(default_factory=frozenset)
+
+
+def _any(*keywords: str) -> FrozenSet[str]:
+    return frozenset(keywords)
+
+
+# Checked top to bottom; the first intent that matches wins
+INTENTS: List[Intent] = [
+    # "show me 1st email", "read email 2"
+    Intent("read_email", (
+        _any("read", "show", "open", "full"),
+        _any("1st", "2nd", "3rd", "first", "second", "third", "email 1", "email 2", "email 3",
+             "#1", "#2", "#3", "one", "two", "three"),
+    )),
+    # "send an email to bob@x.com about ...": an addressed new email, even
+    # though "send" and "email" would also satisfy send_reply below. It only
+    # takes messages from reply_draft and send_reply, never from the intents
+    # after them: its verbs rule out urgent, and none_of keeps tasks and
+    # summaries ("create a task plan to email the team") where they were
+    Intent("compose", (
+        _any(r"\bsend\b", r"\bwrite\b", r"\bcompose\b", "draft"),
+        _any("email", "mail", "message", "note"),
+        _any(" to ", "@"),
+    ), none_of=_any("reply", *TASK_KEYWORDS, *SUMMARY_KEYWORDS)),
+    # "send professional reply": a tone plus a send verb sends right away,
+    # even though "reply" alone would only draft
+    Intent("send_reply", (
+        _any(r"\bsend\b", r"\buse\b", r"\bconfirm\b", r"\bcontinue\b"),
+        _any(*TONES),
+    )),
+    Intent("reply_draft", (_any("reply", "draft", "respond", "write to", "answer"),)),
+    # "use friendly", "send it now". Whole words only, as this sends mail:
+    # "because it's used" must not match
+    Intent("send_reply", (
+        _any(r"\bsend\b", r"\bcontinue\b", r"\buse\b", r"\bconfirm\b", r"\byes\b"),
+        _any(*TONES, r"\bit\b", r"\bnow\b", "email", "reply", "draft", r"\byes\b", r"\bgood\b"),
+    )),
+    Intent("urgent", (
+        _any("urgent", "important", "priority", "critical"),
+    ), none_of=_any("send", "draft", "write", "reply", "compose")),
+    Intent("autonomous_task", (_any(*TASK_KEYWORDS),)),
+    # Before compose, because "emails" contains "mail"
+    Intent("summarize", (_any(*SUMMARY_KEYWORDS),)),
+    # "send email to ...", "mail John about ..."
+    Intent("compose", (
+        _any("send", "write", "draft", "compose", "create", r"\bmail\b"),
+        _any("email", "mail", "message", "note", " to ", r"\bmail\b"),
+    ), none_of=_any("reply")),
+    Intent("statistics", (_any("statistic", "stats"),)),
+    Intent("work_emails", (_any("work"), _any("find", "show"))),
+    Intent("web_search", (_any(
+        "job", "web", "google", "internet", "linkedin", "naukri", "indeed", "glassdoor",
+        "hiring", "vacancy", "platform", "online", "jon"
+    ),)),
+    Intent("search", (_any("find", "search"),)),
+    Intent("email_chat", (_any("email", "emails", "inbox", "mail", "unread"),)),
+]
+DEFAULT_INTENT = "chat"
+
+# "2nd", "#2", "email 2" ... -> index 1; bare digits only where allowed
+ORDINALS: Dict[str, int] = {}
+for _index, _words in enumerate([
+    ("1st", "first", "one", "#1", "email 1"),
+    ("2nd", "second", "two", "#2", "email 2"),
+    ("3rd", "third", "three", "#3", "email 3"),
+    ("4th", "fourth", "four", "#4", "email 4"),
+    ("5th", "fifth", "five", "#5", "email 5"),
+]):
+    for _word in _words:
+        ORDINALS[_word] = _index
+DIGIT_ORDINALS = {str(i + 1): i for i in range(5)}
+
+
+class _KeywordGroup:
+    """Substring keywords plus one compiled pattern for the whole-word ones"""
+
+    def __init__(self, keywords):
+        words = [WHOLE_WORD.match(k).group(1) for k in keywords if WHOLE_WORD.match(k)]
+        self.substrings = tuple(k for k in keywords if not WHOLE_WORD.match(k))
+        self.words = re.compile(r"\b(?:" + "|".join(map(re.escape, words)) + r")\b") if words else None
+
+    def found_in(self, text: str) -> bool:
+        for keyword in self.substrings:
+            if keyword in text:
+                return True
+        return bool(self.words and self.words.search(text))
+
+
+class IntentRouter:
+    def __init__(self, intents: List[Intent]):
+        self._rules = [
+            (
+                intent.name,
+                [_KeywordGroup(group) for group in intent.all_of],
+                _KeywordGroup(intent.none_of) if intent.none_of else None
+            )
+            for intent in intents
+        ]
+        # Ordinals in index order, so the first hit is the lowest index
+        self._ordinals = sorted(ORDINALS.items(), key=lambda item: item[1])
+        self._ordinals_with_digits = sorted({**ORDINALS, **DIGIT_ORDINALS}.items(), key=lambda item: item[1])
+
+    def classify(self, message: str) -> str:
+        text = message.lower()
+        for name, required, excluded in self._rules:
+            if all(group.found_in(text) for group in required) and not (excluded and excluded.found_in(text)):
+                return name
+        return DEFAULT_INTENT
+
+    def parse_ordinal(self, message: str, allow_digits: bool = False) -> Optional[int]:
+        """Zero-based email index mentioned in the message ("2nd", "#2", ...); lowest wins"""
+        message_lower = message.lower()
+        for word, index in (self._ordinals_with_digits if allow_digits else self._ordinals):
+            if word in message_lower:
+                return index
+        return None
+
+    def parse_tone(self, message: str, default: str = "professional") -> str:
+        message_lower = message.lower()
+        for tone in ("friendly", "casual", "urgent"):
+            if tone in message_lower:
+                return tone
+        return default
+
+
+# Singleton instance
+intent_router = IntentRouter(INTENTS)
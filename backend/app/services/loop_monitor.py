@@ -0,0 +1,64 @@
+"""
+Event Loop Monitor - Measures how long the asyncio event loop was blocked.
+
+A background task sleeps for a short interval and records how late it woke up.
+Any lateness is time the loop spent running something that did not yield
+(e.g. a synchronous HTTP call inside an async handler).
+"""
+import os
+import asyncio
+from typing import Optional, Dict, Any
+
+# Lateness below this is scheduling noise, not a blocked loop
+BLOCK_THRESHOLD = 0.01
+
+
+class LoopMonitor:
+    def __init__(self):
+        self.interval = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.1"))
+        self._task: Optional[asyncio.Task] = None
+        self.blocked_count = 0
+        self.blocked_seconds = 0.0
+        self.max_block = 0.0
+        self.last_block = 0.0
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = loop.time() - started - self.interval
+            if lag < BLOCK_THRESHOLD:
+                continue
+
+            self.blocked_count += 1
+            self.blocked_seconds += lag
+            self.last_block = lag
+            self.max_block = max(self.max_block, lag)
+            if lag >= 1.0:
+                print(f"⚠️ Event loop blocked for {lag:.2f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "blocked_count": self.blocked_count,
+            "blocked_ms_total": round(self.blocked_seconds * 1000, 1),
+            "blocked_ms_max": round(self.max_block * 1000, 1),
+            "blocked_ms_last": round(self.last_block * 1000, 1)
+        }
+
+
+# Singleton instance
+loop_monitor = LoopMonitor()
@@ -0,0 +1,63 @@
+"""
+Metrics helpers shared by the services.
+"""
+import math
+from collections import deque
+from typing import Dict, Any, Optional
+
+
+class LatencyTracker:
+    """Keeps a sliding window of latency samples (seconds) and reports percentiles"""
+
+    def __init__(self, window: int = 500):
+        self._samples = deque(maxlen=window)
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def stats(self) -> Dict[str, Any]:
+        def ms(value):
+            return round(value * 1000, 1) if value is not None else None
+
+        return {
+            "count": self.count,
+            "p50_ms": ms(self.percentile(50)),
+            "p95_ms": ms(self.percentile(95)),
+            "p99_ms": ms(self.percentile(99))
+        }
+
+
+class AdaptiveDeadline:
+    """A timeout that follows observed latency: factor x p99, within [minimum, maximum].
+
+    Uses the default until min_samples successful calls have been observed.
+    """
+
+    def __init__(self, default: float, minimum: float, maximum: float, factor: float = 2.0,
+                 min_samples: int = 20, window: int = 500):
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.min_samples = min_samples
+        self.latency = LatencyTracker(window)
+
+    def observe(self, seconds: float):
+        self.latency.observe(seconds)
+
+    def seconds(self) -> float:
+        if self.latency.count < self.min_samples:
+            return self.default
+        return min(self.maximum, max(self.minimum, self.factor * self.latency.percentile(99)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"deadline_s": round(self.seconds(), 2), **self.latency.stats()}
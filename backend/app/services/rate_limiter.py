@@ -0,0 +1,82 @@
+"""
+Rate Limiter - Token bucket measured in Gmail API quota units.
+
+Gmail allows 250 quota units per user per second; messages.send costs 100
+units, messages.get/list 5, history.list 2 and getProfile 1. The bucket
+halves its rate whenever Gmail answers 429 / rateLimitExceeded and climbs
+back gradually on success (additive increase, multiplicative decrease).
+
+The quota is per Gmail user, not per process, so with WEB_CONCURRENCY worker
+processes each one gets an equal share of it.
+"""
+import os
+import time
+import asyncio
+from typing import Dict, Any
+
+# Quota cost per Gmail API method
+SEND_COST = 100
+GET_COST = 5
+LIST_COST = 5
+HISTORY_COST = 2
+PROFILE_COST = 1
+
+# Worker processes sharing the account's quota (uvicorn and gunicorn read this too)
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+
+class AdaptiveTokenBucket:
+    def __init__(self, rate: float, capacity: float, min_rate: float):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        # Serializes waiters so they are served in arrival order
+        self._lock = asyncio.Lock()
+        self.throttled = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, units: float):
+        # A request larger than the bucket would otherwise wait forever
+        units = min(units, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= units:
+                    self._tokens -= units
+                    return
+                await asyncio.sleep((units - self._tokens) / self.rate)
+
+    def on_rate_limited(self):
+        self._refill()
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._tokens = 0
+        self.throttled += 1
+        print(f"⚠️ Gmail rate limit hit, slowing to {self.rate:.0f} units/s")
+
+    def on_success(self):
+        if self.rate < self.max_rate:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.02)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate_units_per_sec": round(self.rate, 1),
+            "max_rate_units_per_sec": self.max_rate,
+            "throttled": self.throttled
+        }
+
+
+# Shared by every Gmail call made by this process
+gmail_quota = AdaptiveTokenBucket(
+    rate=float(os.getenv("GMAIL_QUOTA_UNITS_PER_SEC", "250")) / WEB_CONCURRENCY,
+    # A send (100 units) must still fit in one worker's bucket
+    capacity=max(float(SEND_COST), float(os.getenv("GMAIL_QUOTA_BURST", "250")) / WEB_CONCURRENCY),
+    min_rate=float(os.getenv("GMAIL_QUOTA_MIN_UNITS_PER_SEC", "10")) / WEB_CONCURRENCY
+)
@@ -0,0 +1,119 @@
+"""
+Recipient Importer - Streams a CSV upload into the recipients table.
+
+The upload is parsed a batch of rows at a time in a worker thread, so memory
+stays flat regardless of list size and the event loop is not blocked.
+Addresses are validated per batch, deduplicated case-insensitively against a
+set of 64-bit hashes, and written with multi-row INSERTs. The campaign's old
+recipients are removed with a single DELETE in the same transaction.
+"""
+import os
+import io
+import re
+import csv
+import time
+import asyncio
+import hashlib
+import itertools
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import UploadFile
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Recipient
+
+EMAIL_RE = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+
+
+class RecipientImporter:
+    def __init__(self):
+        # Rows parsed per trip to the worker thread
+        self.batch_size = int(os.getenv("RECIPIENT_IMPORT_BATCH", "5000"))
+
+    async def import_csv(self, db: AsyncSession, campaign_id: str, upload: UploadFile) -> Dict[str, int]:
+        """
+        Replace a campaign's recipients with the contents of a CSV upload.
+        The caller commits. Raises ValueError if the file is not usable.
+        """
+        started = time.perf_counter()
+        text = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        reader = csv.reader(text)
+        counts = {"imported": 0, "duplicates": 0, "invalid": 0}
+        seen: Set[int] = set()
+
+        try:
+            header = await asyncio.to_thread(next, reader, None)
+            email_col, name_col = self._columns(header or [])
+            if email_col is None:
+                raise ValueError("CSV must have an 'email' column")
+
+            await db.execute(delete(Recipient).where(Recipient.campaign_id == campaign_id))
+
+            while True:
+                rows, parsed = await asyncio.to_thread(
+                    self._parse_batch, reader, campaign_id, email_col, name_col, seen, counts
+                )
+                if not parsed:
+                    break
+                if rows:
+                    await db.execute(insert(Recipient), rows)
+                    counts["imported"] += len(rows)
+        except UnicodeDecodeError:
+            raise ValueError("CSV file must be UTF-8 encoded")
+        except csv.Error as e:
+            raise ValueError(f"Could not parse CSV: {e}")
+        finally:
+            # Leave the upload's file open; FastAPI closes it
+            text.detach()
+
+        elapsed = time.perf_counter() - started
+        print(f"📥 Imported {counts['imported']} recipients in {elapsed:.2f}s "
+              f"({counts['imported'] / max(elapsed, 1e-6):.0f} rows/s)")
+        return counts
+
+    @staticmethod
+    def _columns(header: List[str]) -> Tuple[Optional[int], Optional[int]]:
+        names = [h.strip().lower() for h in header]
+        email_col = names.index("email") if "email" in names else None
+        name_col = names.index("name") if "name" in names else None
+        return email_col, name_col
+
+    def _parse_batch(
+        self,
+        reader,
+        campaign_id: str,
+        email_col: int,
+        name_col: Optional[int],
+        seen: Set[int],
+        counts: Dict[str, int]
+    ) -> Tuple[List[dict], int]:
+        """Read up to batch_size rows; returns the rows to insert and how many were read"""
+        batch = list(itertools.islice(reader, self.batch_size))
+        rows = []
+        for row in batch:
+            email = row[email_col].strip() if len(row) > email_col else ""
+            if not email:
+                continue
+            if not EMAIL_RE.fullmatch(email):
+                counts["invalid"] += 1
+                continue
+
+            key = int.from_bytes(hashlib.blake2b(email.lower().encode(), digest_size=8).digest(), "big")
+            if key in seen:
+                counts["duplicates"] += 1
+                continue
+            seen.add(key)
+
+            name = row[name_col].strip() if name_col is not None and len(row) > name_col else ""
+            rows.append({
+                "campaign_id": campaign_id,
+                "email": email,
+                "name": name or email.split('@')[0].capitalize(),
+                "status": "pending"
+            })
+        return rows, len(batch)
+
+
+# Singleton instance
+recipient_importer = RecipientImporter()
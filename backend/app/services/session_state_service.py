@@ -0,0 +1,114 @@
+"""
+Session State Service - Per-session conversation state for chat.
+
+Holds what a chat session is in the middle of: the email it last viewed, the
+new email being composed and whether "send" means reply or compose. State is
+keyed by ChatSession.id; requests without a session share one default slot.
+
+SESSION_STATE_BACKEND=memory keeps state in an in-process LRU with a TTL,
+which is enough for a single worker. SESSION_STATE_BACKEND=db stores it in
+the chat_session_states table so every worker process and node sees the same
+state; the in-memory tier then only serves as a fallback if the database is
+unavailable. It is the default when WEB_CONCURRENCY is above 1.
+"""
+import os
+import json
+import time
+import copy
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from app.database import async_session_maker
+from app.models import ChatSessionState
+
+DEFAULT_SESSION = "default"
+
+
+def new_state() -> Dict[str, Any]:
+    return {
+        # Email last viewed or replied to, and its position in the inbox
+        "last_email": None,
+        "last_email_index": 0,
+        # Draft of a new email: to, subject, body, tone
+        "compose": {},
+        # What "send" refers to: "reply" or "compose"
+        "mode": "reply"
+    }
+
+
+class SessionStateService:
+    def __init__(self):
+        default_backend = "db" if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 else "memory"
+        self.backend = os.getenv("SESSION_STATE_BACKEND", default_backend).lower()
+        self.ttl = float(os.getenv("SESSION_STATE_TTL", "3600"))
+        self.max_sessions = int(os.getenv("SESSION_STATE_MAX_SESSIONS", "1000"))
+        self._local: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    async def get(self, session_id: Optional[str]) -> Dict[str, Any]:
+        """Return a copy of the session's state; call save() to keep changes"""
+        key = session_id or DEFAULT_SESSION
+        if self.backend == "db":
+            try:
+                return await self._load_db(key)
+            except Exception as e:
+                print(f"Error loading session state: {e}")
+
+        entry = self._local.get(key)
+        if entry and time.monotonic() - entry[0] < self.ttl:
+            self._local.move_to_end(key)
+            return copy.deepcopy(entry[1])
+        return new_state()
+
+    async def save(self, session_id: Optional[str], state: Dict[str, Any]):
+        key = session_id or DEFAULT_SESSION
+        self._remember(key, state)
+        if self.backend == "db":
+            try:
+                async with async_session_maker() as session:
+                    await session.merge(ChatSessionState(
+                        session_id=key,
+                        data=json.dumps(state),
+                        updated_at=datetime.utcnow()
+                    ))
+                    await session.commit()
+            except Exception as e:
+                print(f"Error saving session state: {e}")
+
+    async def clear(self, session_id: Optional[str]):
+        key = session_id or DEFAULT_SESSION
+        self._local.pop(key, None)
+        if self.backend == "db":
+            try:
+                async with async_session_maker() as session:
+                    row = await session.get(ChatSessionState, key)
+                    if row:
+                        await session.delete(row)
+                        await session.commit()
+            except Exception as e:
+                print(f"Error clearing session state: {e}")
+
+    async def _load_db(self, key: str) -> Dict[str, Any]:
+        async with async_session_maker() as session:
+            row = await session.get(ChatSessionState, key)
+        if row is None or row.updated_at < datetime.utcnow() - timedelta(seconds=self.ttl):
+            return new_state()
+        state = {**new_state(), **json.loads(row.data)}
+        self._remember(key, state)
+        return state
+
+    def _remember(self, key: str, state: Dict[str, Any]):
+        self._local[key] = (time.monotonic(), copy.deepcopy(state))
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_sessions:
+            self._local.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "local_sessions": len(self._local)
+        }
+
+
+# Singleton instance
+session_state_service = SessionStateService()
@@ -0,0 +1,160 @@
+"""
+Intent routing benchmark - time per message for intent_router.classify,
+compared with the if/elif chain dispatch_chat used before the intent table,
+and with a single-pass combined regex built from the same table.
+
+The combined regex finds every keyword of INTENTS in one scan (one
+lookahead alternation for the substrings, plus one pattern for the
+whole-word keywords) and then evaluates the rules on the set found, so it
+must agree with classify; that is checked on the corpus and on --agreement
+messages made of random keywords from the table. The old chain is kept only
+for timing: the corpus entries marked "fixed" in tests/test_intent_router.py
+route differently under it on purpose.
+
+Messages are the golden corpus from tests/test_intent_router.py, plus one
+pasted email thread of --paste-bytes that matches no intent, so every rule
+is evaluated.
+
+Run from backend/:
+    python -m benchmarks.intent_router [--repeat 200] [--paste-bytes 2300] [--agreement 20000]
+"""
+import re
+import time
+import random
+import argparse
+
+from app.services.intent_router import INTENTS, DEFAULT_INTENT, WHOLE_WORD, intent_router
+
+PASTE_LINE = "Thanks for the notes from Tuesday; the venue has been booked for the offsite and catering is sorted. "
+
+
+def previous_chain(message: str) -> str:
+    """dispatch_chat's keyword cascade before the intent table, returning the intent it routed to"""
+    message_lower = message.lower()
+    if any(word in message_lower for word in ["read", "show", "open", "full"]) and any(word in message_lower for word in ["1st", "2nd", "3rd", "first", "second", "third", "email 1", "email 2", "email 3", "#1", "#2", "#3", "one", "two", "three"]):
+        return "read_email"
+    reply_triggers = ["reply", "draft", "respond", "write to", "answer"]
+    if any(trigger in message_lower for trigger in reply_triggers):
+        return "reply_draft"
+    send_triggers = ["send", "continue", "use", "confirm", "yes"]
+    if any(t in message_lower for t in send_triggers):
+        has_tone = any(tone in message_lower for tone in ["professional", "friendly", "casual", "formal", "urgent"])
+        is_confirmation = any(c in message_lower for c in ["it", "now", "email", "reply", "draft", "yes", "good"])
+        if has_tone or is_confirmation:
+            return "send_reply"
+    if any(k in message_lower for k in ["urgent", "important", "priority", "critical"]) and not any(k in message_lower for k in ["send", "draft", "write", "reply", "compose"]):
+        return "urgent"
+    if any(k in message_lower for k in ["task", "sub task", "plan", "checklist", "workflow"]):
+        return "autonomous_task"
+    if "summarize" in message_lower or "summary" in message_lower:
+        return "summarize"
+    is_mail_verb = bool(re.search(r'\bmail\b', message_lower))
+    compose_keywords = ["send", "write", "draft", "compose", "create"]
+    noun_keywords = ["email", "mail", "message", "note"]
+    has_compose_verb = any(k in message_lower for k in compose_keywords) or is_mail_verb
+    if has_compose_verb and (
+        any(n in message_lower for n in noun_keywords) or " to " in message_lower or is_mail_verb
+    ):
+        if "reply" not in message_lower:
+            return "compose"
+    if "statistic" in message_lower or "stats" in message_lower:
+        return "statistics"
+    elif "work" in message_lower and ("find" in message_lower or "show" in message_lower):
+        return "work_emails"
+    web_keywords = ["job", "web", "google", "internet", "linkedin", "naukri", "indeed", "glassdoor", "hiring", "vacancy", "platform", "online", "jon"]
+    if any(k in message_lower for k in web_keywords):
+        return "web_search"
+    elif "find" in message_lower or "search" in message_lower:
+        return "search"
+    elif any(keyword in message_lower for keyword in ["email", "emails", "inbox", "mail", "unread"]):
+        return "email_chat"
+    return DEFAULT_INTENT
+
+
+class CombinedRegex:
+    """Every keyword of the table found in one regex scan, then the rules checked on that set"""
+
+    def __init__(self, intents):
+        keywords = {k for intent in intents for group in (*intent.all_of, intent.none_of) for k in group}
+        substrings = sorted((k for k in keywords if not WHOLE_WORD.match(k)), key=len, reverse=True)
+        words = sorted(WHOLE_WORD.match(k).group(1) for k in keywords if WHOLE_WORD.match(k))
+        # Longest keyword starting at each position; the others starting there are its prefixes
+        self.substrings = re.compile("(?=(" + "|".join(map(re.escape, substrings)) + "))")
+        self.prefixes = {k: frozenset(p for p in substrings if k.startswith(p)) for k in substrings}
+        self.words = re.compile(r"\b(?:" + "|".join(map(re.escape, words)) + r")\b")
+        self.rules = [(intent.name, intent.all_of, intent.none_of) for intent in intents]
+
+    def classify(self, message: str) -> str:
+        text = message.lower()
+        found = {f"\\b{word}\\b" for word in self.words.findall(text)}
+        for match in self.substrings.finditer(text):
+            found |= self.prefixes[match.group(1)]
+        for name, required, excluded in self.rules:
+            if all(group & found for group in required) and not excluded & found:
+                return name
+        return DEFAULT_INTENT
+
+
+def random_messages(count: int) -> list:
+    """Messages of 1-4 table keywords between filler words, some whole words glued to their neighbours"""
+    rng = random.Random(0)
+    keywords = sorted({
+        (WHOLE_WORD.match(k).group(1) if WHOLE_WORD.match(k) else k).strip()
+        for intent in INTENTS for group in (*intent.all_of, intent.none_of) for k in group
+    })
+    fillers = ["the", "to", "please", "bob@example.com", "about", "lunch", "2", "it's", "used"]
+    messages = []
+    for _ in range(count):
+        parts = rng.sample(keywords, rng.randint(1, 4)) + rng.sample(fillers, rng.randint(0, 3))
+        rng.shuffle(parts)
+        messages.append(rng.choice([" ", "", " ", " to "]).join(parts).capitalize())
+    return messages
+
+
+def per_message(classify, messages, repeat: int) -> float:
+    """Best of 5 runs, in seconds per message"""
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for message in messages:
+                classify(message)
+        best = min(best, (time.perf_counter() - start) / (repeat * len(messages)))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="passes over the messages per timed run")
+    parser.add_argument("--paste-bytes", type=int, default=2300, help="length of the pasted thread")
+    parser.add_argument("--agreement", type=int, default=20000, help="random messages to check the regex on")
+    args = parser.parse_args()
+
+    # Imported here: the corpus lives with the tests, which are run from backend/
+    from tests.test_intent_router import CORPUS
+
+    corpus = [message for message, _ in CORPUS]
+    paste = (PASTE_LINE * (args.paste_bytes // len(PASTE_LINE) + 1))[:args.paste_bytes]
+    combined = CombinedRegex(INTENTS)
+
+    assert intent_router.classify(paste) == DEFAULT_INTENT
+    disagree = [
+        m for m in corpus + [paste] + random_messages(args.agreement)
+        if combined.classify(m) != intent_router.classify(m)
+    ]
+    if disagree:
+        raise SystemExit(f"combined regex disagrees with classify on {len(disagree)} messages, e.g. {disagree[:5]}")
+    changed = sum(1 for m in corpus if previous_chain(m) != intent_router.classify(m))
+
+    print(f"{len(corpus)} corpus messages (old chain routes {changed} of them differently), "
+          f"{len(paste)} byte paste; combined regex agrees with classify on {args.agreement} random messages")
+    for name, classify in (("previous if/elif chain", previous_chain),
+                           ("intent_router.classify", intent_router.classify),
+                           ("combined regex", combined.classify)):
+        corpus_us = per_message(classify, corpus, args.repeat) * 1e6
+        paste_us = per_message(classify, [paste], args.repeat) * 1e6
+        print(f"  {name:24s} corpus {corpus_us:7.2f} us/message   paste {paste_us:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
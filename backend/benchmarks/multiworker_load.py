@@ -0,0 +1,277 @@
+"""
+Multi-worker load test - throughput from 1 to N worker processes, and checks
+that shared state holds when consecutive requests land on different workers.
+
+Starts the app once per worker count (uvicorn --workers k, WEB_CONCURRENCY=k,
+MOCK_GMAIL=true so nothing is really sent) against the DATABASE_URL in the
+environment, runs a fixed request mix for --duration seconds, then checks:
+
+- every worker served requests (worker id from /metrics)
+- chat session state: a reply drafted on one connection is sent to the same
+  email from a new connection, which usually reaches another worker
+- an agent status update made by one worker is reported by every worker
+- /chat/history reads the same from every worker
+
+Run from backend/ with a Postgres DATABASE_URL (and ZAI_* pointing at a model
+or a stub, for the drafts):
+    python -m benchmarks.multiworker_load --workers 1,2,4
+    python -m benchmarks.multiworker_load --url http://localhost:9000 --workers 4
+
+Exits 1 if a check fails or throughput at N workers is below
+--min-efficiency x N x the single-worker rate.
+"""
+import os
+import sys
+import time
+import uuid
+import socket
+import signal
+import asyncio
+import argparse
+import subprocess
+from collections import defaultdict
+
+import aiohttp
+
+from app.services.metrics import LatencyTracker
+
+API = "/api/v1"
+
+# (label, method, path, json body); session ids are filled in per request
+REQUEST_MIX = [
+    ("inbox", "GET", f"{API}/integrations/gmail/emails", None),
+    ("agent status", "GET", f"{API}/agents/status", None),
+    ("chat sessions", "GET", f"{API}/chat/sessions", None),
+    ("chat statistics", "POST", f"{API}/chat/", {"message": "show email statistics"}),
+    ("chat history", "GET", f"{API}/chat/history", None),
+]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_until_healthy(url: str, process: subprocess.Popen = None, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            if process is not None and process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {process.returncode} during startup")
+            try:
+                async with session.get(f"{url}/health") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"Server at {url} did not become healthy within {timeout:.0f}s")
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    env = {**os.environ, "WEB_CONCURRENCY": str(workers), "MOCK_GMAIL": "true"}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--no-access-log", "--log-level", "warning"],
+        env=env,
+        # Own process group, so the workers are stopped with the supervisor
+        start_new_session=True
+    )
+
+
+def stop_server(process: subprocess.Popen):
+    if process.poll() is not None:
+        return
+    os.killpg(process.pid, signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+
+
+async def run_load(url: str, duration: float, concurrency: int) -> dict:
+    """Send the request mix from `concurrency` clients for `duration` seconds"""
+    latency = defaultdict(LatencyTracker)
+    errors = defaultdict(int)
+    deadline = time.monotonic() + duration
+
+    async def client(index: int, session: aiohttp.ClientSession):
+        session_id = f"load-{uuid.uuid4().hex[:8]}"
+        turn = index
+        while time.monotonic() < deadline:
+            label, method, path, body = REQUEST_MIX[turn % len(REQUEST_MIX)]
+            turn += 1
+            if body is not None:
+                body = {**body, "session_id": session_id}
+            start = time.perf_counter()
+            try:
+                async with session.request(method, f"{url}{path}", json=body) as response:
+                    await response.read()
+                    if response.status >= 400:
+                        errors[label] += 1
+                        continue
+            except aiohttp.ClientError:
+                errors[label] += 1
+                continue
+            latency[label].observe(time.perf_counter() - start)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(i, session) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    completed = sum(tracker.count for tracker in latency.values())
+    return {
+        "rps": completed / elapsed,
+        "completed": completed,
+        "errors": dict(errors),
+        "endpoints": {label: tracker.stats() for label, tracker in latency.items()}
+    }
+
+
+async def fresh_get(url: str, path: str) -> dict:
+    """GET on a new connection, so consecutive calls can reach different workers"""
+    connector = aiohttp.TCPConnector(force_close=True)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async with session.get(f"{url}{path}") as response:
+            response.raise_for_status()
+            return await response.json()
+
+
+async def fresh_post(url: str, path: str, body: dict) -> dict:
+    connector = aiohttp.TCPConnector(force_close=True)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async with session.post(f"{url}{path}", json=body) as response:
+            response.raise_for_status()
+            return await response.json()
+
+
+async def seen_workers(url: str, probes: int) -> set:
+    results = await asyncio.gather(*(fresh_get(url, "/metrics") for _ in range(probes)))
+    return {result["campaign_worker"]["worker_id"] for result in results}
+
+
+async def check_session_state(url: str, sessions: int) -> list:
+    """Draft a reply to the 3rd email, then send it from another connection"""
+    inbox = await fresh_get(url, f"{API}/integrations/gmail/emails")
+    if not inbox.get("mock_mode") or len(inbox["emails"]) < 3:
+        # Outside mock mode the check would send real replies
+        print("  skipped the session state check: needs MOCK_GMAIL=true on the server")
+        return []
+
+    async def one(index: int):
+        session_id = f"state-{uuid.uuid4().hex[:8]}"
+        draft = await fresh_post(url, f"{API}/chat/", {"message": "reply to the third email", "session_id": session_id})
+        subject = draft["response"].split("**📌 Replying to:** ", 1)[1].split("\n", 1)[0]
+        sent = await fresh_post(url, f"{API}/chat/", {"message": "use friendly", "session_id": session_id})
+        if f"Subject:** Re: {subject}\n" not in sent["response"]:
+            return f"session {session_id}: drafted a reply to '{subject}' but the send went elsewhere"
+
+    results = await asyncio.gather(*(one(i) for i in range(sessions)))
+    return [result for result in results if result]
+
+
+async def check_agent_status(url: str, probes: int) -> list:
+    """One worker generates a reply; every worker must then report it"""
+    await fresh_post(url, f"{API}/agents/reply/generate", {
+        "email_subject": "Load test", "email_body": "Checking agent status", "sender": "load@example.com"
+    })
+    bodies = await asyncio.gather(*(fresh_get(url, f"{API}/agents/status") for _ in range(probes)))
+    stale = sum(
+        1 for body in bodies
+        if next(a for a in body["agents"] if a["agent_id"] == "reply-writer")["current_task"] != "Reply generated"
+    )
+    if stale:
+        return [f"/agents/status: {stale} of {probes} answers missed the reply-writer update"]
+    return []
+
+
+async def check_same_everywhere(url: str, path: str, probes: int, key=lambda body: body) -> list:
+    bodies = await asyncio.gather(*(fresh_get(url, path) for _ in range(probes)))
+    distinct = {repr(key(body)) for body in bodies}
+    if len(distinct) > 1:
+        return [f"{path}: {len(distinct)} different answers from {probes} requests"]
+    return []
+
+
+async def measure(url: str, workers: int, args) -> dict:
+    # Warm up connections, caches and the inbox snapshot before timing
+    await run_load(url, min(3.0, args.duration), args.concurrency)
+    result = await run_load(url, args.duration, args.concurrency)
+
+    probes = max(20, 10 * workers)
+    result["workers_seen"] = len(await seen_workers(url, probes))
+    failures = []
+    if result["workers_seen"] < workers:
+        failures.append(f"only {result['workers_seen']} of {workers} workers answered {probes} requests")
+    failures += await check_session_state(url, args.sessions)
+    # Chat history is appended in the background; let the last writes land
+    await asyncio.sleep(1.0)
+    failures += await check_agent_status(url, probes)
+    failures += await check_same_everywhere(url, f"{API}/chat/history", probes, key=lambda body: body[-20:])
+    result["failures"] = failures
+    return result
+
+
+def report(workers: int, result: dict, single_rps: float = None):
+    scaling = ""
+    if single_rps:
+        scaling = f"  {result['rps'] / single_rps:4.2f}x ({result['rps'] / (single_rps * workers):.0%} of linear)"
+    print(f"\n{workers} worker(s): {result['rps']:8.1f} req/s, {result['completed']} requests{scaling}")
+    for label, stats in result["endpoints"].items():
+        print(f"  {label:16s} p50 {stats['p50_ms']:7.1f} ms  p95 {stats['p95_ms']:7.1f} ms  "
+              f"p99 {stats['p99_ms']:7.1f} ms  errors {result['errors'].get(label, 0)}")
+    print(f"  workers answering: {result['workers_seen']}")
+    for failure in result["failures"]:
+        print(f"  FAIL {failure}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4",
+                        help="worker counts to start, or with --url the count the server runs")
+    parser.add_argument("--url", help="test a running server instead of starting one")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of load per worker count")
+    parser.add_argument("--concurrency", type=int, default=64, help="concurrent clients")
+    parser.add_argument("--sessions", type=int, default=20, help="chat sessions in the state check")
+    parser.add_argument("--min-efficiency", type=float, default=0.6,
+                        help="lowest acceptable rate at N workers, as a fraction of N x the 1-worker rate")
+    args = parser.parse_args()
+    counts = [int(count) for count in args.workers.split(",")]
+
+    results = {}
+    if args.url:
+        await wait_until_healthy(args.url)
+        results[counts[0]] = await measure(args.url, counts[0], args)
+        report(counts[0], results[counts[0]])
+    else:
+        if not os.getenv("DATABASE_URL", "").startswith(("postgres://", "postgresql://")):
+            parser.error("DATABASE_URL must point at Postgres: workers share state through it")
+        for workers in counts:
+            port = free_port()
+            process = start_server(workers, port)
+            try:
+                url = f"http://127.0.0.1:{port}"
+                await wait_until_healthy(url, process)
+                results[workers] = await measure(url, workers, args)
+            finally:
+                stop_server(process)
+            report(workers, results[workers], results.get(1, {}).get("rps"))
+
+    failed = any(result["failures"] for result in results.values())
+    if 1 in results and len(results) > 1:
+        most = max(results)
+        efficiency = results[most]["rps"] / (results[1]["rps"] * most)
+        if efficiency < args.min_efficiency:
+            print(f"\nFAIL {most} workers reached {efficiency:.0%} of linear scaling "
+                  f"(minimum {args.min_efficiency:.0%})")
+            failed = True
+    print("\nFAILED" if failed else "\nOK")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -6,6 +6,17 @@ from dotenv import load_dotenv
 
 from app.api.api import api_router
 from app.database import init_db, close_db
+from app.services.loop_monitor import loop_monitor
+from app.services.ai_service import ai_service
+from app.services.gmail_service import gmail_service
+from app.services.campaign_worker import campaign_worker
+from app.services.agent_pipeline import agent_pipeline
+from app.services.draft_prefetcher import draft_prefetcher
+from app.services.history_service import history_service
+from app.services.inbox_snapshot_service import inbox_snapshot_service
+from app.services.session_state_service import session_state_service
+from app.services.rate_limiter import gmail_quota
+from app.services.event_bus import event_bus
 
 # Load environment variables
 load_dotenv()
@@ -18,9 +29,25 @@ async def lifespan(app: FastAPI):
     print("🚀 Starting up...")
     await init_db()
     print("✅ Database initialized")
+    # Credentials are shared through the database by every worker process
+    await gmail_service.load_shared_credentials()
+    await loop_monitor.start()
+    await ai_service.start()
+    await history_service.start()
+    # Resumes any campaign left active by a previous run
+    await campaign_worker.start()
+    await agent_pipeline.start()
+    await draft_prefetcher.start()
     yield
     # Shutdown
     print("🛑 Shutting down...")
+    await campaign_worker.stop()
+    await agent_pipeline.stop()
+    await draft_prefetcher.stop()
+    await loop_monitor.stop()
+    await ai_service.close()
+    # Write out queued chat messages before the pool goes away
+    await history_service.stop()
     await close_db()
     print("✅ Database connections closed")
 
@@ -51,7 +78,34 @@ def health_check():
     return {"status": "ok", "service": "ai-workflow-backend"}
 
 
+@app.get("/metrics")
+def metrics():
+    return {
+        "event_loop": loop_monitor.stats(),
+        "ai": ai_service.stats(),
+        "campaign_worker": campaign_worker.stats(),
+        "agent_pipeline": agent_pipeline.stats()["stages"],
+        "chat_history": history_service.stats(),
+        "chat_inbox": inbox_snapshot_service.stats(),
+        "reply_drafts": draft_prefetcher.stats(),
+        "session_state": session_state_service.stats(),
+        "event_bus": event_bus.stats(),
+        "gmail_quota": gmail_quota.stats()
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=9000, reload=True)
+
+    # WEB_CONCURRENCY worker processes; gunicorn -k uvicorn.workers.UvicornWorker reads it too.
+    # Shared state (credentials, chat state, agent status) then lives in the database.
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "9000")),
+        # Auto-reload only works with a single process
+        reload=workers == 1,
+        workers=workers
+    )
 
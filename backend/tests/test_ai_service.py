@@ -0,0 +1,68 @@
+"""
+AIService request coalescing and fallback reporting, with the completions
+endpoint replaced by a local stand-in that answers each call with a new draft.
+"""
+import asyncio
+import json
+
+from app.services.ai_service import AIService
+
+
+def make_service(monkeypatch):
+    service = AIService()
+    calls = []
+
+    async def request_completion(payload, method):
+        calls.append(payload)
+        content = f"draft {len(calls)}"
+        await asyncio.sleep(0.01)
+        return 200, json.dumps({"choices": [{"message": {"content": content}}]})
+
+    monkeypatch.setattr(service, "_request_completion", request_completion)
+    return service, calls
+
+
+def content(result):
+    return json.loads(result[1])["choices"][0]["message"]["content"]
+
+
+def test_identical_calls_share_one_request(monkeypatch):
+    service, calls = make_service(monkeypatch)
+    payload = {"messages": [{"role": "user", "content": "Reply to Ann"}]}
+
+    async def run():
+        return await asyncio.gather(*(service._post_completion(payload, "reply", coalesce=True) for _ in range(3)))
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert {content(result) for result in results} == {"draft 1"}
+
+
+def test_regenerate_does_not_join_the_draft_it_replaces(monkeypatch):
+    service, calls = make_service(monkeypatch)
+    payload = {"messages": [{"role": "user", "content": "Reply to Ann"}]}
+
+    async def run():
+        first = asyncio.ensure_future(service._post_completion(payload, "reply", cache=True, coalesce=True))
+        await asyncio.sleep(0)
+        regenerated = await service._post_completion(payload, "reply", cache=True, regenerate=True, coalesce=True)
+        return await first, regenerated
+
+    first, regenerated = asyncio.run(run())
+
+    assert len(calls) == 2
+    assert content(first) != content(regenerated)
+
+
+def test_fallback_reply_is_reported(monkeypatch):
+    service, calls = make_service(monkeypatch)
+    email = ("Invoice 42", "Please confirm the invoice.", "Ann Lee <ann@example.com>")
+
+    service.api_key = "test"
+    drafted = asyncio.run(service.generate_email_reply(*email, tone="friendly"))
+    service.api_key = None
+    template = asyncio.run(service.generate_email_reply(*email, tone="friendly"))
+
+    assert not service.is_fallback_reply(drafted, "Invoice 42", email[2], "friendly")
+    assert service.is_fallback_reply(template, "Invoice 42", email[2], "friendly")
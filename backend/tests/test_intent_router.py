@@ -0,0 +1,111 @@
+"""
+Golden corpus for the chat intent table: sample messages and the handler
+each must reach. Entries marked "fixed" route differently from the original
+if-chain on purpose; every other entry routes as it always did.
+"""
+import pytest
+
+from app.services.intent_router import intent_router
+
+CORPUS = [
+    # read_email
+    ("show me 1st email", "read_email"),
+    ("read email 2", "read_email"),
+    ("open the third one", "read_email"),
+    ("show full #3", "read_email"),
+
+    # reply_draft
+    ("reply to the first email", "reply_draft"),
+    ("draft a response to John", "reply_draft"),
+    ("help me respond to my manager", "reply_draft"),
+    ("answer the lunch invite", "reply_draft"),
+    ("write to bob", "reply_draft"),
+
+    # send_reply
+    ("send it now", "send_reply"),
+    ("yes, send it", "send_reply"),
+    ("use friendly", "send_reply"),
+    ("continue with casual", "send_reply"),
+    ("confirm, looks good", "send_reply"),
+    ("send professional reply", "send_reply"),  # fixed: used to only draft
+    ("use the friendly reply", "send_reply"),  # fixed: used to only draft
+
+    # compose
+    ("send an email to bob@example.com about lunch", "compose"),  # fixed: used to send a reply
+    ("draft an email to alice@example.com", "compose"),  # fixed: used to draft a reply
+    ("write a message to the team about friday", "compose"),
+    ("compose a note to hr@company.com", "compose"),
+    ("mail john about the meeting", "compose"),
+    ("create an email for the client", "compose"),
+    ("create an urgent email to bob@example.com", "urgent"),
+
+    # urgent
+    ("show urgent emails", "urgent"),
+    ("what's important today?", "urgent"),
+    ("any critical alerts?", "urgent"),
+    ("high priority messages", "urgent"),
+
+    # autonomous_task
+    ("create a task plan to email the team", "autonomous_task"),
+    ("make a checklist for onboarding", "autonomous_task"),
+    ("plan my workflow for the launch", "autonomous_task"),
+
+    # summarize
+    ("summarize my inbox", "summarize"),
+    ("give me a summary of today's emails", "summarize"),
+    ("write a summary of the launch to my manager", "summarize"),
+
+    # statistics / work_emails
+    ("show inbox statistics", "statistics"),
+    ("email stats please", "statistics"),
+    ("find work emails", "work_emails"),
+    ("show me messages from work", "work_emails"),
+
+    # web_search
+    ("find python jobs on linkedin", "web_search"),
+    ("search google for react hiring", "web_search"),
+    ("any vacancy at glassdoor?", "web_search"),
+
+    # search
+    ("find emails from alice", "search"),
+    ("search for invoice", "search"),
+
+    # email_chat
+    ("how many unread emails do I have?", "email_chat"),
+    ("what's in my inbox", "email_chat"),
+    ("check my gmail", "email_chat"),
+
+    # chat
+    ("hello", "chat"),
+    ("what can you do?", "chat"),
+    ("because it's used a lot", "chat"),  # fixed: "use"/"it" inside words used to send mail
+    ("thanks!", "chat"),
+]
+
+
+@pytest.mark.parametrize("message,expected", CORPUS)
+def test_classify(message, expected):
+    assert intent_router.classify(message) == expected
+
+
+@pytest.mark.parametrize("message,allow_digits,expected", [
+    ("show me 1st email", False, 0),
+    ("read email 2", False, 1),
+    ("reply to #3", False, 2),
+    ("reply to 2", False, None),
+    ("reply to 2", True, 1),
+    ("the second or first one", False, 0),
+    ("hello", True, None),
+])
+def test_parse_ordinal(message, allow_digits, expected):
+    assert intent_router.parse_ordinal(message, allow_digits=allow_digits) == expected
+
+
+@pytest.mark.parametrize("message,expected", [
+    ("use friendly", "friendly"),
+    ("send it casual", "casual"),
+    ("urgent reply please", "urgent"),
+    ("send it", "professional"),
+])
+def test_parse_tone(message, expected):
+    assert intent_router.parse_tone(message) == expected
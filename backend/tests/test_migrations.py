@@ -0,0 +1,78 @@
+"""
+Static checks of the migration list and the hot-query index map. The plans
+themselves need Postgres: they are checked when TEST_DATABASE_URL points at a
+scratch database, which gets the app's tables and migrations.
+"""
+import os
+import re
+import asyncio
+
+import pytest
+
+from app.migrations import MIGRATIONS, HOT_QUERIES, _plan_indexes, hot_query_indexes, run_migrations
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "")
+
+
+def test_versions_are_consecutive():
+    assert [version for version, _, _ in MIGRATIONS] == list(range(1, len(MIGRATIONS) + 1))
+
+
+def test_statements_are_idempotent():
+    for _, _, statements in MIGRATIONS:
+        for statement in statements:
+            assert "IF NOT EXISTS" in statement, statement
+
+
+def test_hot_query_indexes_are_created_by_a_migration():
+    created = {
+        match.group(1)
+        for _, _, statements in MIGRATIONS
+        for statement in statements
+        for match in [re.search(r"CREATE INDEX IF NOT EXISTS (\w+)", statement)]
+        if match
+    }
+    for name, (_, indexes) in HOT_QUERIES.items():
+        assert indexes <= created, name
+
+
+def test_plan_indexes_walks_nested_plans():
+    plan = {
+        "Node Type": "Limit",
+        "Plans": [{
+            "Node Type": "Nested Loop",
+            "Plans": [
+                {"Node Type": "Index Scan", "Index Name": "ix_recipients_pending"},
+                {"Node Type": "Bitmap Heap Scan", "Plans": [
+                    {"Node Type": "Bitmap Index Scan", "Index Name": "campaigns_pkey"}
+                ]}
+            ]
+        }]
+    }
+    assert _plan_indexes(plan) == {"ix_recipients_pending", "campaigns_pkey"}
+    assert _plan_indexes({"Node Type": "Seq Scan"}) == set()
+
+
+@pytest.mark.skipif(
+    not TEST_DATABASE_URL.startswith(("postgres://", "postgresql://")),
+    reason="needs TEST_DATABASE_URL pointing at a Postgres database"
+)
+def test_hot_queries_use_their_indexes():
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from app.database import Base
+    import app.models  # noqa: F401 - registers the tables on Base
+
+    async def plans():
+        engine = create_async_engine(re.sub(r"^postgres(ql)?://", "postgresql+asyncpg://", TEST_DATABASE_URL))
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+                await run_migrations(conn)
+            async with engine.connect() as conn:
+                return await hot_query_indexes(conn)
+        finally:
+            await engine.dispose()
+
+    used = asyncio.run(plans())
+    for name, (_, indexes) in HOT_QUERIES.items():
+        assert used[name] & indexes, f"{name}: expected {' or '.join(sorted(indexes))}, plan uses {sorted(used[name])}"
@@ -0,0 +1,148 @@
+"""
+POST /integrations/gmail/reply/batch against local stand-ins for the inbox,
+the drafter and Gmail sends. Checks that generation and sends stay within
+their concurrency limits, that originals load once, and that one failed item
+does not affect the rest.
+"""
+import asyncio
+import json
+
+from app.api.endpoints import gmail
+from app.api.endpoints.gmail import BatchReplyItem, BatchReplyRequest
+
+
+class InFlight:
+    """Counts concurrent entries and remembers the peak"""
+
+    def __init__(self):
+        self.now = 0
+        self.peak = 0
+
+    async def hold(self, seconds: float):
+        self.now += 1
+        self.peak = max(self.peak, self.now)
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self.now -= 1
+
+
+class StandIns:
+    def __init__(self, monkeypatch, inbox, fail_sends=(), fail_drafts=()):
+        self.generating = InFlight()
+        self.sending = InFlight()
+        self.loads = []
+        self.drafted = []
+        self.recorded = []
+
+        async def get_emails_by_id(email_ids):
+            self.loads.append(list(email_ids))
+            return {email_id: inbox[email_id] for email_id in email_ids if email_id in inbox}
+
+        async def get_or_generate(email, tone="professional", regenerate=False):
+            await self.generating.hold(0.01)
+            if email["id"] in fail_drafts:
+                raise RuntimeError("model unavailable")
+            self.drafted.append(email["id"])
+            return f"{tone} reply to {email['subject']}"
+
+        async def send_reply(email_id, content):
+            await self.sending.hold(0.005)
+            if email_id in fail_sends:
+                return {"success": False, "error": "rateLimitExceeded", "rate_limited": True}
+            return {"success": True}
+
+        async def record_sent(rows):
+            self.recorded.append(rows)
+
+        monkeypatch.setattr(gmail.gmail_sync_service, "get_emails_by_id", get_emails_by_id)
+        monkeypatch.setattr(gmail.draft_prefetcher, "get_or_generate", get_or_generate)
+        monkeypatch.setattr(gmail.gmail_service, "send_reply", send_reply)
+        monkeypatch.setattr(gmail, "_record_sent", record_sent)
+
+
+def make_inbox(count):
+    return {
+        f"m{i}": {"id": f"m{i}", "from": f"sender{i}@example.com", "subject": f"Subject {i}"}
+        for i in range(count)
+    }
+
+
+def run_batch(request):
+    async def consume():
+        response = await gmail.reply_batch(request)
+        events = [event async for event in response.body_iterator]
+        return [(event["event"], json.loads(event["data"])) for event in events]
+
+    return asyncio.run(consume())
+
+
+def test_batch_stays_within_concurrency_limits(monkeypatch):
+    inbox = make_inbox(100)
+    stand_ins = StandIns(monkeypatch, inbox)
+    items = [BatchReplyItem(email_id=email_id) for email_id in inbox]
+
+    events = run_batch(BatchReplyRequest(items=items + items[:10]))
+
+    assert stand_ins.generating.peak == gmail.REPLY_BATCH_LLM_CONCURRENCY
+    assert stand_ins.sending.peak == gmail.REPLY_BATCH_SEND_CONCURRENCY
+    # Originals load once, without the duplicated ids
+    assert stand_ins.loads == [list(inbox)]
+    assert sorted(stand_ins.drafted) == sorted(inbox)
+
+    results = [data for event, data in events if event == "result"]
+    assert sorted(result["email_id"] for result in results) == sorted(inbox)
+    assert all(result["status"] == "sent" for result in results)
+    assert events[-1] == ("done", {"sent": 100, "failed": 0})
+    assert len(stand_ins.recorded) == 1
+    assert sorted(row["email_id"] for row in stand_ins.recorded[0]) == sorted(inbox)
+
+
+def test_failed_items_do_not_affect_the_rest(monkeypatch):
+    inbox = make_inbox(20)
+    stand_ins = StandIns(monkeypatch, inbox, fail_sends={"m1", "m2"}, fail_drafts={"m3"})
+    items = [BatchReplyItem(email_id=email_id) for email_id in [*inbox, "missing"]]
+
+    events = run_batch(BatchReplyRequest(items=items))
+
+    results = {data["email_id"]: data for event, data in events if event == "result"}
+    assert results["m1"]["status"] == "failed" and results["m1"]["rate_limited"]
+    assert results["m3"] == {"email_id": "m3", "status": "failed", "error": "model unavailable"}
+    assert results["missing"]["error"] == "Email not found"
+    assert events[-1] == ("done", {"sent": 17, "failed": 4})
+    recorded = {row["email_id"] for row in stand_ins.recorded[0]}
+    assert recorded == set(inbox) - {"m1", "m2", "m3"}
+
+
+def test_supplied_content_is_sent_without_generating(monkeypatch):
+    inbox = make_inbox(3)
+    stand_ins = StandIns(monkeypatch, inbox)
+    items = [
+        BatchReplyItem(email_id="m0", content="Thanks, see you Monday"),
+        BatchReplyItem(email_id="m1", tone="friendly"),
+        BatchReplyItem(email_id="m2")
+    ]
+
+    events = run_batch(BatchReplyRequest(items=items, tone="formal"))
+
+    assert sorted(stand_ins.drafted) == ["m1", "m2"]
+    replies = {data["email_id"]: data["reply_content"] for event, data in events if event == "result"}
+    assert replies == {
+        "m0": "Thanks, see you Monday",
+        "m1": "friendly reply to Subject 1",
+        "m2": "formal reply to Subject 2"
+    }
+
+
+def test_items_are_failed_when_originals_cannot_load(monkeypatch):
+    StandIns(monkeypatch, {})
+
+    async def unavailable(email_ids):
+        raise ConnectionError("Gmail unavailable")
+
+    monkeypatch.setattr(gmail.gmail_sync_service, "get_emails_by_id", unavailable)
+    items = [BatchReplyItem(email_id=f"m{i}") for i in range(5)]
+
+    events = run_batch(BatchReplyRequest(items=items))
+
+    assert events == [("done", {"sent": 0, "failed": 5})]
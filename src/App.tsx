@@ -17,6 +17,9 @@ import EmailModal from "./components/EmailModal";
 import ChatAssistant from "./components/ChatAssistant";
 import { API_BASE_URL } from "./config";
 
+// Events kept for the log viewer
+const MAX_EVENTS = 100;
+
 interface AgentState {
   agent_id: string;
   name: string;
@@ -97,6 +100,8 @@ function App() {
         if (data.type === "init" || data.type === "status") {
           setSystemState(data.data);
           setIsConnected(true);
+        } else if (data.type === "event") {
+          applyEvent(data.data);
         } else if (data.type === "heartbeat") {
           setIsConnected(true);
         }
@@ -116,6 +121,24 @@ function App() {
     setEventSource(es);
   };
 
+  // Merge a single published event into the snapshot from "init"/"status"
+  const applyEvent = (event: any) => {
+    setSystemState((prev) => {
+      if (!prev || !prev.agents) return prev;
+      if ((prev.events || []).some((e) => e.id === event.id)) return prev;
+      const agents =
+        event.type === "agent_status"
+          ? prev.agents.map((agent) =>
+              agent.agent_id === event.data.agent_id
+                ? { ...agent, ...event.data }
+                : agent
+            )
+          : prev.agents;
+      const events = [...(prev.events || []), event].slice(-MAX_EVENTS);
+      return { ...prev, agents, events };
+    });
+  };
+
   const fetchInitialState = async () => {
     try {
       const response = await fetch(`${API_BASE_URL}/agents/status`);
@@ -22,12 +22,16 @@ import {
 import "./CampaignManager.css";
 import { API_BASE_URL } from "../config";
 
-interface Recipient {
-  email: string;
-  name: string;
-  status: "pending" | "sent" | "failed";
-  sent_at?: string;
-  error?: string;
+interface RecipientCounts {
+  total: number;
+  pending: number;
+  sent: number;
+  failed: number;
+}
+
+interface CampaignLog {
+  timestamp: string;
+  message: string;
 }
 
 interface Campaign {
@@ -39,13 +43,12 @@ interface Campaign {
   tone: string;
   status: "draft" | "active" | "paused" | "completed";
   type: string;
-  recipients: Recipient[];
+  recipient_counts: RecipientCounts;
   sent: number;
   opened: number;
   clicked: number;
   failed: number;
   created_at: string;
-  logs: { timestamp: string; message: string }[];
 }
 
 const CampaignManager: React.FC = () => {
@@ -55,6 +58,8 @@ const CampaignManager: React.FC = () => {
   >("all");
   const [showCreateModal, setShowCreateModal] = useState(false);
   const [showLogsModal, setShowLogsModal] = useState<string | null>(null);
+  const [logs, setLogs] = useState<CampaignLog[]>([]);
+  const [logsCursor, setLogsCursor] = useState<number | null>(null);
   const [isLoading, setIsLoading] = useState(true);
   const [uploadingCampaign, setUploadingCampaign] = useState<string | null>(
     null,
@@ -84,6 +89,35 @@ const CampaignManager: React.FC = () => {
     }
   }, []);
 
+  const fetchLogs = useCallback(
+    async (campaignId: string, after: number = 0) => {
+      try {
+        const response = await fetch(
+          `${API_BASE_URL}/campaigns/${campaignId}/logs?after=${after}`,
+        );
+        if (response.ok) {
+          const data = await response.json();
+          setLogs((prev) =>
+            after === 0 ? data.logs || [] : [...prev, ...(data.logs || [])],
+          );
+          setLogsCursor(data.next_after ?? null);
+        }
+      } catch (error) {
+        console.error("Error fetching campaign logs:", error);
+      }
+    },
+    [],
+  );
+
+  useEffect(() => {
+    if (showLogsModal) {
+      fetchLogs(showLogsModal);
+    } else {
+      setLogs([]);
+      setLogsCursor(null);
+    }
+  }, [showLogsModal, fetchLogs]);
+
   useEffect(() => {
     fetchCampaigns();
     // Poll for updates every 3 seconds if any campaign is active
@@ -394,7 +428,7 @@ const CampaignManager: React.FC = () => {
               <div className="campaign-metrics">
                 <div className="metric">
                   <Users size={14} />
-                  <span>{campaign.recipients.length} recipients</span>
+                  <span>{campaign.recipient_counts.total} recipients</span>
                 </div>
                 <div className="metric">
                   <Mail size={14} />
@@ -403,11 +437,7 @@ const CampaignManager: React.FC = () => {
                 <div className="metric success">
                   <CheckCircle2 size={14} />
                   <span>
-                    {
-                      campaign.recipients.filter((r) => r.status === "sent")
-                        .length
-                    }{" "}
-                    delivered
+                    {campaign.recipient_counts.sent} delivered
                   </span>
                 </div>
                 <div className="metric error">
@@ -417,19 +447,19 @@ const CampaignManager: React.FC = () => {
               </div>
 
               {/* Progress bar for active campaigns */}
-              {campaign.recipients.length > 0 && (
+              {campaign.recipient_counts.total > 0 && (
                 <div className="campaign-progress">
                   <div className="progress-bar">
                     <div
                       className="progress-fill"
                       style={{
-                        width: `${((campaign.sent + campaign.failed) / campaign.recipients.length) * 100}%`,
+                        width: `${((campaign.sent + campaign.failed) / campaign.recipient_counts.total) * 100}%`,
                       }}
                     />
                   </div>
                   <span className="progress-text">
                     {campaign.sent + campaign.failed} /{" "}
-                    {campaign.recipients.length} processed
+                    {campaign.recipient_counts.total} processed
                   </span>
                 </div>
               )}
@@ -478,7 +508,7 @@ const CampaignManager: React.FC = () => {
 
                   {/* Start/Pause */}
                   {campaign.status !== "completed" &&
-                    campaign.recipients.length > 0 && (
+                    campaign.recipient_counts.total > 0 && (
                       <button
                         className={`action-btn ${campaign.status === "active" ? "pause" : "play"}`}
                         onClick={() =>
@@ -639,20 +669,25 @@ const CampaignManager: React.FC = () => {
               </button>
             </div>
             <div className="logs-content">
-              {campaigns.find((c) => c.id === showLogsModal)?.logs.length ===
-              0 ? (
+              {logs.length === 0 ? (
                 <p className="no-logs">No logs yet</p>
               ) : (
-                campaigns
-                  .find((c) => c.id === showLogsModal)
-                  ?.logs.map((log, i) => (
-                    <div key={i} className="log-entry">
-                      <span className="log-time">
-                        {new Date(log.timestamp).toLocaleTimeString()}
-                      </span>
-                      <span className="log-message">{log.message}</span>
-                    </div>
-                  ))
+                logs.map((log, i) => (
+                  <div key={i} className="log-entry">
+                    <span className="log-time">
+                      {new Date(log.timestamp).toLocaleTimeString()}
+                    </span>
+                    <span className="log-message">{log.message}</span>
+                  </div>
+                ))
+              )}
+              {logsCursor !== null && (
+                <button
+                  className="load-more-logs"
+                  onClick={() => fetchLogs(showLogsModal, logsCursor)}
+                >
+                  Load more
+                </button>
               )}
             </div>
           </div>
@@ -253,7 +253,7 @@ const ChatAssistant: React.FC<ChatAssistantProps> = ({ theme }) => {
     abortControllerRef.current = controller;
 
     try {
-      const response = await fetch(`${API_BASE_URL}/chat`, {
+      const response = await fetch(`${API_BASE_URL}/chat/stream`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -269,15 +269,45 @@ const ChatAssistant: React.FC<ChatAssistantProps> = ({ theme }) => {
         }),
       });
 
-      if (response.ok) {
-        const data = await response.json();
-        const assistantMessage: Message = {
-          id: (Date.now() + 1).toString(),
-          role: "assistant",
-          content: data.response,
-          timestamp: new Date(),
-        };
-        setMessages((prev) => [...prev, assistantMessage]);
+      if (response.ok && response.body) {
+        const assistantId = (Date.now() + 1).toString();
+        setMessages((prev) => [
+          ...prev,
+          {
+            id: assistantId,
+            role: "assistant",
+            content: "",
+            timestamp: new Date(),
+          },
+        ]);
+
+        // Read server-sent events: "token" chunks, then a final "done"
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        let content = "";
+        while (true) {
+          const { done, value } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true });
+          const events = buffer.split(/\r?\n\r?\n/);
+          buffer = events.pop() || "";
+          for (const rawEvent of events) {
+            const dataLine = rawEvent
+              .split(/\r?\n/)
+              .find((line) => line.startsWith("data:"));
+            if (!dataLine) continue;
+            const data = JSON.parse(dataLine.slice(5).trim());
+            if (data.token !== undefined) {
+              content += data.token;
+            } else if (data.response !== undefined) {
+              content = data.response;
+            }
+            setMessages((prev) =>
+              prev.map((m) => (m.id === assistantId ? { ...m, content } : m)),
+            );
+          }
+        }
 
         // Rename session if it's "New Chat"
         const currentSession = sessions.find((s) => s.id === currentSessionId);